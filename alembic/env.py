@@ -23,7 +23,7 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from app.db.database import Base
-from app.models import user, event, permission, event_version, notification  # import your models explicitly
+from app.models import user, event, permission, event_version, notification, scheduler_lease, event_day_rollup, refresh_token, shard_directory, id_block, event_change, group, group_member, group_permission, archived_event, archived_event_grant, sent_reminder  # import your models explicitly
 target_metadata = Base.metadata
 
 
@@ -0,0 +1,80 @@
+"""add groups, group members and event group permissions
+
+Revision ID: 0a6c5e9d7f21
+Revises: f3b7d21c8e46
+Create Date: 2026-10-20 09:41:17.602913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a6c5e9d7f21'
+down_revision: Union[str, None] = 'f3b7d21c8e46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('groups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_groups_id'), 'groups', ['id'], unique=False)
+    op.create_index(op.f('ix_groups_owner_id'), 'groups', ['owner_id'], unique=False)
+    op.create_table('group_members',
+    sa.Column('group_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('added_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('group_id', 'user_id')
+    )
+    op.create_index(op.f('ix_group_members_user_id'), 'group_members', ['user_id'], unique=False)
+    op.create_table('event_group_permissions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('group_id', sa.Integer(), nullable=False),
+    sa.Column('role', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('event_id', 'group_id', name='_event_group_uc')
+    )
+    op.create_index(op.f('ix_event_group_permissions_id'), 'event_group_permissions', ['id'], unique=False)
+    op.create_index('ix_event_group_permissions_group_id_event_id', 'event_group_permissions', ['group_id', 'event_id'], unique=False)
+
+    # Changes and notifications addressed to a whole group: one row instead of one per member
+    with op.batch_alter_table('event_changes') as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.add_column(sa.Column('group_id', sa.Integer(), nullable=True))
+    op.create_index('ix_event_changes_group_id_id', 'event_changes', ['group_id', 'id'], unique=False)
+    # On PostgreSQL both statements propagate to every monthly partition
+    op.add_column('notifications', sa.Column('group_id', sa.Integer(), nullable=True))
+    op.create_index('ix_notifications_group_id_timestamp', 'notifications', ['group_id', 'timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_notifications_group_id_timestamp', table_name='notifications')
+    op.drop_column('notifications', 'group_id')
+    op.drop_index('ix_event_changes_group_id_id', table_name='event_changes')
+    op.execute("DELETE FROM event_changes WHERE user_id IS NULL")
+    with op.batch_alter_table('event_changes') as batch_op:
+        batch_op.drop_column('group_id')
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+    op.drop_index('ix_event_group_permissions_group_id_event_id', table_name='event_group_permissions')
+    op.drop_index(op.f('ix_event_group_permissions_id'), table_name='event_group_permissions')
+    op.drop_table('event_group_permissions')
+    op.drop_index(op.f('ix_group_members_user_id'), table_name='group_members')
+    op.drop_table('group_members')
+    op.drop_index(op.f('ix_groups_owner_id'), table_name='groups')
+    op.drop_index(op.f('ix_groups_id'), table_name='groups')
+    op.drop_table('groups')
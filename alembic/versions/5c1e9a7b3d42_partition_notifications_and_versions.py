@@ -0,0 +1,164 @@
+"""partition notifications and event_versions by month
+
+Revision ID: 5c1e9a7b3d42
+Revises: dae6058c7741
+Create Date: 2026-10-19 15:30:12.418207
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e9a7b3d42'
+down_revision: Union[str, None] = 'dae6058c7741'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months of partitions created ahead of the current one
+PREMAKE_MONTHS = 3
+
+# Notifications outlive the events they mention (e.g. "event deleted"), so the
+# partitioned table nulls event_id instead of blocking the delete.
+
+NOTIFICATIONS_COLUMNS = """
+    id integer NOT NULL DEFAULT nextval('notifications_id_seq'::regclass),
+    user_id integer CONSTRAINT notifications_user_id_fkey REFERENCES users (id),
+    event_id integer CONSTRAINT notifications_event_id_fkey REFERENCES events (id) {on_delete},
+    message varchar NOT NULL,
+    seen boolean,
+    "timestamp" timestamp without time zone NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+"""
+
+EVENT_VERSIONS_COLUMNS = """
+    id integer NOT NULL DEFAULT nextval('event_versions_id_seq'::regclass),
+    event_id integer CONSTRAINT event_versions_event_id_fkey REFERENCES events (id) ON DELETE CASCADE,
+    title varchar,
+    description text,
+    start_time timestamp without time zone,
+    end_time timestamp without time zone,
+    location varchar,
+    is_recurring boolean,
+    recurrence_pattern varchar,
+    updated_at timestamp without time zone NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    updated_by integer CONSTRAINT event_versions_updated_by_fkey REFERENCES users (id)
+"""
+
+TABLES = {
+    'notifications': {
+        'key': 'timestamp',
+        'columns': NOTIFICATIONS_COLUMNS,
+        'copy': ['id', 'user_id', 'event_id', 'message', 'seen', 'timestamp'],
+        'id_index': True,
+        'indexes': {
+            'ix_notifications_id': '(id)',
+            'ix_notifications_user_id_timestamp': '(user_id, "timestamp")',
+            'ix_notifications_event_id': '(event_id)',
+        },
+    },
+    'event_versions': {
+        'key': 'updated_at',
+        'columns': EVENT_VERSIONS_COLUMNS,
+        'copy': ['id', 'event_id', 'title', 'description', 'start_time', 'end_time', 'location',
+                 'is_recurring', 'recurrence_pattern', 'updated_at', 'updated_by'],
+        'id_index': False,
+        'indexes': {
+            'ix_event_versions_event_id_updated_at': '(event_id, updated_at)',
+        },
+    },
+}
+
+
+def _add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _columns(spec, backfill_key=False):
+    """Quoted column list for INSERT ... SELECT, optionally backfilling NULL partition keys."""
+    columns = []
+    for name in spec['copy']:
+        if backfill_key and name == spec['key']:
+            columns.append(f"COALESCE(\"{name}\", now() AT TIME ZONE 'utc')")
+        else:
+            columns.append(f'"{name}"')
+    return ', '.join(columns)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # Range partitioning is Postgres-only; other backends keep heap tables
+        return
+
+    now = datetime.utcnow()
+    current = datetime(now.year, now.month, 1)
+
+    for table, spec in TABLES.items():
+        key = spec['key']
+        legacy = f'{table}_legacy'
+
+        op.execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+        op.execute(f'ALTER TABLE {legacy} RENAME CONSTRAINT {table}_pkey TO {legacy}_pkey')
+        op.execute(f'DROP INDEX IF EXISTS ix_{table}_id')
+        op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY NONE')
+
+        op.execute(
+            f'CREATE TABLE {table} ({spec["columns"].format(on_delete="ON DELETE SET NULL")}, PRIMARY KEY (id, "{key}")) '
+            f'PARTITION BY RANGE ("{key}")'
+        )
+        for name, columns in spec['indexes'].items():
+            op.execute(f'CREATE INDEX {name} ON {table} {columns}')
+
+        # Cover every legacy row, including ones dated beyond the premade months
+        oldest, newest = bind.execute(sa.text(f'SELECT min("{key}"), max("{key}") FROM {legacy}')).one()
+        month = datetime(oldest.year, oldest.month, 1) if oldest and oldest < current else current
+        last = _add_months(current, PREMAKE_MONTHS)
+        if newest and newest > last:
+            last = datetime(newest.year, newest.month, 1)
+        while month <= last:
+            upper = _add_months(month, 1)
+            op.execute(
+                f'CREATE TABLE {table}_y{month.year:04d}m{month.month:02d} PARTITION OF {table} '
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+            )
+            month = upper
+        # Catches rows of months without a partition, e.g. once a long-running
+        # process outlives the premade ones
+        op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+        op.execute(
+            f'INSERT INTO {table} ({_columns(spec)}) '
+            f'SELECT {_columns(spec, backfill_key=True)} FROM {legacy}'
+        )
+        op.execute(f'DROP TABLE {legacy}')
+        op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    for table, spec in TABLES.items():
+        partitioned = f'{table}_partitioned'
+
+        op.execute(f'ALTER TABLE {table} RENAME TO {partitioned}')
+        op.execute(f'ALTER TABLE {partitioned} RENAME CONSTRAINT {table}_pkey TO {partitioned}_pkey')
+        for name in spec['indexes']:
+            op.execute(f'DROP INDEX IF EXISTS {name}')
+        op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY NONE')
+
+        op.execute(f'CREATE TABLE {table} ({spec["columns"].format(on_delete="")}, PRIMARY KEY (id))')
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN "{spec["key"]}" DROP NOT NULL')
+        if spec['id_index']:
+            op.execute(f'CREATE INDEX ix_{table}_id ON {table} (id)')
+        op.execute(f'INSERT INTO {table} ({_columns(spec)}) SELECT {_columns(spec)} FROM {partitioned}')
+
+        op.execute(f'DROP TABLE {partitioned} CASCADE')
+        op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
@@ -0,0 +1,66 @@
+"""add archived_events and archived_event_grants
+
+Revision ID: 7d3e5b9a1c60
+Revises: 0a6c5e9d7f21
+Create Date: 2026-10-20 15:12:48.310275
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3e5b9a1c60'
+down_revision: Union[str, None] = '0a6c5e9d7f21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('archived_events',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('end_time', sa.DateTime(), nullable=False),
+    sa.Column('location', sa.String(), nullable=True),
+    sa.Column('is_recurring', sa.Boolean(), nullable=True),
+    sa.Column('recurrence_pattern', sa.String(), nullable=True),
+    sa.Column('owner_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.Column('versions', sa.LargeBinary(), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_archived_events_owner_id'), 'archived_events', ['owner_id'], unique=False)
+    op.create_table('archived_event_grants',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('group_id', sa.Integer(), nullable=True),
+    sa.Column('role', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['archived_events.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_archived_event_grants_event_id'), 'archived_event_grants', ['event_id'], unique=False)
+    op.create_index('ix_archived_event_grants_user_id_event_id', 'archived_event_grants', ['user_id', 'event_id'], unique=False)
+    op.create_index('ix_archived_event_grants_group_id_event_id', 'archived_event_grants', ['group_id', 'event_id'], unique=False)
+    # The mover looks for old, non-recurring events by end time
+    op.create_index('ix_events_end_time', 'events', ['end_time'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_events_end_time', table_name='events')
+    op.drop_index('ix_archived_event_grants_group_id_event_id', table_name='archived_event_grants')
+    op.drop_index('ix_archived_event_grants_user_id_event_id', table_name='archived_event_grants')
+    op.drop_index(op.f('ix_archived_event_grants_event_id'), table_name='archived_event_grants')
+    op.drop_table('archived_event_grants')
+    op.drop_index(op.f('ix_archived_events_owner_id'), table_name='archived_events')
+    op.drop_table('archived_events')
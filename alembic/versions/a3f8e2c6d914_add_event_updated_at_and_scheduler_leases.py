@@ -0,0 +1,40 @@
+"""add events.updated_at and scheduler_leases
+
+Revision ID: a3f8e2c6d914
+Revises: 5c1e9a7b3d42
+Create Date: 2026-10-19 17:05:41.902316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f8e2c6d914'
+down_revision: Union[str, None] = '5c1e9a7b3d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('events', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE events SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)")
+    op.create_index(op.f('ix_events_updated_at'), 'events', ['updated_at'], unique=False)
+
+    op.create_table('scheduler_leases',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('holder', sa.String(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.Column('watermark', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('scheduler_leases')
+    op.drop_index(op.f('ix_events_updated_at'), table_name='events')
+    op.drop_column('events', 'updated_at')
@@ -0,0 +1,43 @@
+"""add shard_directory and id_blocks
+
+Revision ID: c4a9e1f7b2d3
+Revises: b6d2f48e1a07
+Create Date: 2026-10-19 21:14:09.530217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a9e1f7b2d3'
+down_revision: Union[str, None] = 'b6d2f48e1a07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('shard_directory',
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.String(length=64), nullable=False),
+    sa.Column('frozen', sa.Boolean(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('owner_id')
+    )
+    # Rows are created lazily, above the largest id on any shard, the first time
+    # sharding hands out an id
+    op.create_table('id_blocks',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('next_id', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('id_blocks')
+    op.drop_table('shard_directory')
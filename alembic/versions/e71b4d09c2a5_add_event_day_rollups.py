@@ -0,0 +1,36 @@
+"""add event_day_rollups
+
+Revision ID: e71b4d09c2a5
+Revises: a3f8e2c6d914
+Create Date: 2026-10-19 18:12:07.553190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e71b4d09c2a5'
+down_revision: Union[str, None] = 'a3f8e2c6d914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('event_day_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('event_count', sa.Integer(), nullable=False),
+    sa.Column('busy_minutes', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+    # Existing events are counted by `python -m app.services.calendar rebuild`
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('event_day_rollups')
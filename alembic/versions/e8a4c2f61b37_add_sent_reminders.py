@@ -0,0 +1,40 @@
+"""add sent_reminders, drop scheduler_leases.watermark
+
+Revision ID: e8a4c2f61b37
+Revises: 7d3e5b9a1c60
+Create Date: 2026-10-21 10:24:17.583921
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a4c2f61b37'
+down_revision: Union[str, None] = '7d3e5b9a1c60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('sent_reminders',
+    sa.Column('event_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('occurrence', sa.DateTime(), nullable=False),
+    sa.Column('lead_minutes', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('event_id', 'occurrence', 'lead_minutes')
+    )
+    # Reminders are now deduplicated per (event, occurrence, lead); a reminder
+    # already sent under the old watermark may be sent once more after upgrading
+    with op.batch_alter_table('scheduler_leases') as batch_op:
+        batch_op.drop_column('watermark')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('scheduler_leases') as batch_op:
+        batch_op.add_column(sa.Column('watermark', sa.DateTime(), nullable=True))
+    op.drop_table('sent_reminders')
@@ -0,0 +1,40 @@
+"""add event_changes
+
+Revision ID: f3b7d21c8e46
+Revises: c4a9e1f7b2d3
+Create Date: 2026-10-19 23:02:41.118254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b7d21c8e46'
+down_revision: Union[str, None] = 'c4a9e1f7b2d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('event_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_event_changes_user_id_id', 'event_changes', ['user_id', 'id'], unique=False)
+    op.create_index(op.f('ix_event_changes_changed_at'), 'event_changes', ['changed_at'], unique=False)
+    # Existing clients have no token yet; their first sync is a full one
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_event_changes_changed_at'), table_name='event_changes')
+    op.drop_index('ix_event_changes_user_id_id', table_name='event_changes')
+    op.drop_table('event_changes')
@@ -0,0 +1,235 @@
+import asyncio
+import math
+import os
+import re
+import time
+from collections import deque
+from typing import Optional
+
+from dotenv import load_dotenv
+from starlette.responses import JSONResponse
+
+from app.core.metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_OVERLOADED,
+    ADMISSION_QUEUE_WAIT,
+    ADMISSION_QUEUED,
+    ADMISSION_SHED,
+)
+
+# Load environment variables
+load_dotenv()
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Requests run at once per worker, across all classes; keep it at or below the
+# threadpool size (40 by default) so admitted requests never queue for a thread
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", 40))
+# Part of ADMISSION_CONCURRENCY only priority requests may use
+ADMISSION_PRIORITY_RESERVE = int(os.getenv("ADMISSION_PRIORITY_RESERVE", 8))
+# Per-class caps, as class=limit pairs; priority is only bounded by ADMISSION_CONCURRENCY
+ADMISSION_LIMITS = {
+    name.strip(): int(limit)
+    for name, limit in (item.split("=", 1) for item in os.getenv("ADMISSION_LIMITS", "auth=8,reads=32,writes=16,batch=4").split(",") if item.strip())
+}
+# A class whose queued requests waited longer than the target for a whole
+# interval is overloaded: until a request gets through faster again, arrivals
+# that cannot start right away are shed instead of queued
+ADMISSION_QUEUE_TARGET_MS = float(os.getenv("ADMISSION_QUEUE_TARGET_MS", 50))
+ADMISSION_QUEUE_INTERVAL_MS = float(os.getenv("ADMISSION_QUEUE_INTERVAL_MS", 500))
+# Longest a request may wait for a slot before it is shed
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", 1000))
+ADMISSION_PRIORITY_TIMEOUT_MS = float(os.getenv("ADMISSION_PRIORITY_TIMEOUT_MS", 5000))
+ADMISSION_RETRY_AFTER = float(os.getenv("ADMISSION_RETRY_AFTER", 1))
+
+PRIORITY = "priority"
+
+# Cheap reads kept flowing during overload: single events and notifications
+PRIORITY_ROUTES = [
+    ("GET", re.compile(r"^/api/events/\d+$")),
+    ("GET", re.compile(r"^/api/notifications$")),
+]
+
+# Slots freed by a finished request go to waiting classes in this order
+DISPATCH_ORDER = [PRIORITY, "auth", "writes", "reads", "batch"]
+
+EXEMPT_PATHS = {"/metrics", "/docs", "/redoc", "/openapi.json"}
+
+
+def route_class(method: str, path: str) -> str:
+    for route_method, pattern in PRIORITY_ROUTES:
+        if method == route_method and pattern.match(path):
+            return PRIORITY
+    if path.startswith("/api/auth/"):
+        return "auth"
+    if path.startswith("/api/events/batch"):
+        return "batch"
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return "reads"
+    return "writes"
+
+
+class Shed(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Lane:
+    """One route class: its running count, cap, FIFO of waiters and queue-delay state."""
+
+    def __init__(self, name: str, limit: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.timeout = timeout
+        self.active = 0
+        self.waiters = deque()  # (future, enqueued at)
+        self.above_target_since = None
+        self.overloaded = False
+
+    def observe(self, waited: float, now: float, target: float, interval: float):
+        """Track queue delay: overloaded once every request for `interval` waited over `target`."""
+        ADMISSION_QUEUE_WAIT.labels(self.name).observe(waited)
+        if waited <= target:
+            self.above_target_since = None
+            self.overloaded = False
+        elif self.above_target_since is None:
+            self.above_target_since = now
+        elif now - self.above_target_since >= interval:
+            self.overloaded = True
+        ADMISSION_OVERLOADED.labels(self.name).set(int(self.overloaded))
+
+
+class AdmissionController:
+    """
+    Bounds the requests of one worker running at once, per route class and in
+    total, so a slow database backs requests up here rather than in the
+    threadpool and the connection pool. Runs on the event loop only, so no
+    locking is needed.
+    """
+
+    def __init__(
+        self,
+        capacity: int = ADMISSION_CONCURRENCY,
+        limits: Optional[dict] = None,
+        reserve: int = ADMISSION_PRIORITY_RESERVE,
+        timeout_ms: float = ADMISSION_QUEUE_TIMEOUT_MS,
+        priority_timeout_ms: float = ADMISSION_PRIORITY_TIMEOUT_MS,
+        target_ms: float = ADMISSION_QUEUE_TARGET_MS,
+        interval_ms: float = ADMISSION_QUEUE_INTERVAL_MS,
+    ):
+        limits = ADMISSION_LIMITS if limits is None else limits
+        self.capacity = capacity
+        self.reserve = min(reserve, capacity)
+        self.target = target_ms / 1000
+        self.interval = interval_ms / 1000
+        self.active = 0
+        self.lanes = {
+            name: Lane(name, capacity if name == PRIORITY else limits.get(name, capacity), (priority_timeout_ms if name == PRIORITY else timeout_ms) / 1000)
+            for name in DISPATCH_ORDER
+        }
+
+    def _can_run(self, lane: Lane) -> bool:
+        headroom = self.capacity if lane.name == PRIORITY else self.capacity - self.reserve
+        return lane.active < lane.limit and self.active < headroom
+
+    def _start(self, lane: Lane):
+        lane.active += 1
+        self.active += 1
+        ADMISSION_IN_FLIGHT.labels(lane.name).inc()
+
+    async def acquire(self, name: str) -> Lane:
+        """Wait for a slot in the route class `name`; raises Shed when the request should get a 503."""
+        lane = self.lanes[name]
+        if not lane.waiters and self._can_run(lane):
+            lane.observe(0.0, time.monotonic(), self.target, self.interval)
+            self._start(lane)
+            return lane
+        if lane.overloaded:
+            raise Shed("overload")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        entry = (future, time.monotonic())
+        lane.waiters.append(entry)
+        ADMISSION_QUEUED.labels(name).inc()
+        expiry = loop.call_later(lane.timeout, self._expire, lane, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Client went away while queued; hand back a slot granted meanwhile
+            if future.done() and not future.cancelled():
+                self.release(lane)
+            else:
+                self._dequeue(lane, entry)
+            raise
+        finally:
+            expiry.cancel()
+        return lane
+
+    def _dequeue(self, lane: Lane, entry):
+        try:
+            lane.waiters.remove(entry)
+        except ValueError:
+            return
+        ADMISSION_QUEUED.labels(lane.name).dec()
+
+    def _expire(self, lane: Lane, entry):
+        future, enqueued = entry
+        if future.done():
+            return
+        self._dequeue(lane, entry)
+        now = time.monotonic()
+        lane.observe(now - enqueued, now, self.target, self.interval)
+        future.set_exception(Shed("timeout"))
+
+    def release(self, lane: Lane):
+        lane.active -= 1
+        self.active -= 1
+        ADMISSION_IN_FLIGHT.labels(lane.name).dec()
+        self._dispatch()
+
+    def _dispatch(self):
+        now = time.monotonic()
+        for lane in self.lanes.values():
+            while lane.waiters and self._can_run(lane):
+                future, enqueued = lane.waiters.popleft()
+                ADMISSION_QUEUED.labels(lane.name).dec()
+                if future.done():
+                    continue
+                lane.observe(now - enqueued, now, self.target, self.interval)
+                self._start(lane)
+                future.set_result(None)
+
+
+class AdmissionMiddleware:
+    """
+    Admits each request through the controller of its route class and answers
+    503 with Retry-After when it is shed: right away while the class is
+    overloaded, or once it waited `ADMISSION_QUEUE_TIMEOUT_MS` for a slot.
+    """
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or AdmissionController()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        name = route_class(scope["method"], scope["path"])
+        try:
+            lane = await self.controller.acquire(name)
+        except Shed as shed:
+            ADMISSION_SHED.labels(name, shed.reason).inc()
+            await JSONResponse(
+                {"detail": "Server overloaded, retry later"},
+                status_code=503,
+                headers={"Retry-After": str(math.ceil(ADMISSION_RETRY_AFTER))},
+            )(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(lane)
@@ -0,0 +1,234 @@
+import json
+import os
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Response cache configuration
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")  # memory / redis / none
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 300))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 10000))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+class CacheBackend(ABC):
+    """Byte-oriented key/value store with TTLs and per-user generation counters."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        ...
+
+    @abstractmethod
+    def add(self, key: str, value: bytes, ttl: Optional[int] = None) -> bool:
+        """Store `value` only if `key` is absent. Returns True if it was stored."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def generation(self, user_id: int) -> int:
+        ...
+
+    def generations(self, keys: List) -> List[int]:
+        """`generation` of several users (or "group:<id>" keys) at once."""
+        return [self.generation(key) for key in keys]
+
+    @abstractmethod
+    def bump_generations(self, user_ids: Iterable[int]) -> None:
+        ...
+
+
+class NullCache(CacheBackend):
+    """Backend that stores nothing; every lookup is a miss."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def add(self, key, value, ttl=None):
+        return True
+
+    def delete(self, key):
+        pass
+
+    def generation(self, user_id):
+        return 0
+
+    def bump_generations(self, user_ids):
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """
+    In-process LRU capped by entry count and total bytes. Only correct when a
+    single worker serves the API; use the redis backend with several workers.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._generations = {}  # never evicted, unlike entries
+        self._lock = threading.Lock()
+
+    def _drop(self, key):
+        value, _ = self._entries.pop(key)
+        self.size -= len(value)
+
+    def _live(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] < time.monotonic():
+            self._drop(key)
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _store(self, key, value, ttl):
+        # Caller holds the lock
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+        self.size += len(value)
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def set(self, key, value, ttl=None):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        if len(value) > self.max_bytes:
+            return False
+        # Check and store under one lock acquisition so only one caller claims the key
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._store(key, value, ttl)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def generation(self, user_id):
+        return self._generations.get(user_id, 0)
+
+    def bump_generations(self, user_ids):
+        with self._lock:
+            for user_id in set(user_ids):
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+
+class RedisCache(CacheBackend):
+    """Backend shared by every worker, on Redis or any protocol-compatible server."""
+
+    def __init__(self, url: str = RESPONSE_CACHE_URL, prefix: str = "neofi:"):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("The redis cache backend requires the 'redis' package") from exc
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value, ex=ttl)
+
+    def add(self, key, value, ttl=None):
+        return bool(self.client.set(self.prefix + key, value, ex=ttl, nx=True))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def generation(self, user_id):
+        return int(self.client.get(f"{self.prefix}gen:{user_id}") or 0)
+
+    def generations(self, keys):
+        if not keys:
+            return []
+        return [int(value or 0) for value in self.client.mget([f"{self.prefix}gen:{key}" for key in keys])]
+
+    def bump_generations(self, user_ids):
+        pipe = self.client.pipeline(transaction=False)
+        for user_id in set(user_ids):
+            pipe.incr(f"{self.prefix}gen:{user_id}")
+        pipe.execute()
+
+
+def create_backend(name: str = RESPONSE_CACHE_BACKEND) -> CacheBackend:
+    """Build the backend selected by RESPONSE_CACHE_BACKEND."""
+    if name == "memory":
+        return MemoryCache()
+    if name == "redis":
+        return RedisCache()
+    if name == "none":
+        return NullCache()
+    raise RuntimeError(f"Unknown cache backend: {name}")
+
+
+class ResponseCache:
+    """
+    Pre-serialized JSON responses keyed by (namespace, user, params, visibility
+    generation). Write paths bump the generation of every user whose view
+    changed, which orphans their old entries instead of deleting them. Groups
+    have generations too: a change shared with a group bumps one counter
+    instead of one per member.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: int = RESPONSE_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    def key(self, namespace: str, user_id: int, groups: Iterable[int] = (), **params) -> str:
+        """`groups`: the ids of the user's groups, whose generations are part of the key."""
+        groups = sorted(groups)
+        generation, *group_generations = self.backend.generations([user_id] + [f"group:{group_id}" for group_id in groups])
+        if groups:
+            generation = f"{generation}:" + ",".join(f"{group_id}.{count}" for group_id, count in zip(groups, group_generations))
+        return f"resp:{namespace}:{user_id}:{generation}:{json.dumps(params, sort_keys=True, default=str)}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.backend.get(key)
+
+    def set(self, key: str, body: bytes) -> None:
+        self.backend.set(key, body, self.ttl)
+
+    def invalidate_users(self, user_ids: Iterable[int]) -> None:
+        self.backend.bump_generations(user_ids)
+
+    def invalidate_groups(self, group_ids: Iterable[int]) -> None:
+        self.backend.bump_generations(f"group:{group_id}" for group_id in group_ids)
+
+
+cache_backend = create_backend()
+response_cache = ResponseCache(cache_backend)
@@ -0,0 +1,181 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+from starlette.responses import JSONResponse
+
+from app.core.cache import create_backend
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory")  # memory / redis / none
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 24 * 60 * 60))
+IDEMPOTENCY_LOCK_TTL = int(os.getenv("IDEMPOTENCY_LOCK_TTL", 60))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", 30))
+IDEMPOTENCY_POLL_INTERVAL = 0.05
+
+# (method, path) pairs honouring the Idempotency-Key header
+IDEMPOTENT_ROUTES = {
+    ("POST", "/api/events"),
+    ("POST", "/api/events/batch"),
+}
+
+# Responses that must not be replayed: the client should be able to retry them
+UNCACHEABLE_STATUSES = {401, 429}
+
+_PENDING = json.dumps({"state": "pending"}).encode()
+
+
+def _decode(raw):
+    return json.loads(raw) if raw is not None else None
+
+
+class IdempotencyMiddleware:
+    """
+    Replays the stored response of a request already executed with the same
+    Idempotency-Key, and makes concurrent duplicates wait for the first
+    execution instead of running the handler again.
+    """
+
+    def __init__(self, app, store=None):
+        self.app = app
+        self.store = store or create_backend(IDEMPOTENCY_BACKEND)
+        # Duplicates arriving at this worker are woken directly instead of polling
+        self._inflight = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in IDEMPOTENT_ROUTES:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(b"idempotency-key")
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+
+        body = await self._read_body(receive)
+        store_key = f"idem:{self._caller(headers)}:{hashlib.sha256(idempotency_key).hexdigest()}"
+        fingerprint = hashlib.sha256(scope["method"].encode() + scope["path"].encode() + b"\0" + body).hexdigest()
+
+        record = await self._acquire_or_wait(store_key)
+        if record is None:
+            await self._execute(scope, body, send, store_key, fingerprint)
+        elif record["state"] == "pending":
+            await JSONResponse(
+                {"detail": "A request with this Idempotency-Key is still in progress"},
+                status_code=409,
+            )(scope, receive, send)
+        elif record["fingerprint"] != fingerprint:
+            await JSONResponse(
+                {"detail": "Idempotency-Key was already used with a different request"},
+                status_code=422,
+            )(scope, receive, send)
+        else:
+            await self._replay(record, send)
+
+    @staticmethod
+    def _caller(headers) -> str:
+        """
+        The verified user id of the bearer token, so a retry sent after a token
+        refresh still finds the stored result. Requests without a valid token
+        share one scope; the handler rejects them with 401, which is not stored.
+        """
+        # Imported lazily: security depends on the database layer. Repeated
+        # tokens are answered from its verified-claims cache.
+        from app.core.security import verify_token
+
+        authorization = headers.get(b"authorization", b"")
+        if authorization[:7].lower() == b"bearer ":
+            payload = verify_token(authorization[7:].decode("latin-1"))
+            if payload and payload.get("sub") and payload.get("type") != "refresh":
+                return f"user:{payload['sub']}"
+        return "anonymous"
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    async def _acquire_or_wait(self, store_key):
+        """
+        Claim the key for execution (returns None) or wait for whoever holds it
+        and return their final record, or the pending one after a timeout.
+        """
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+        while True:
+            if await asyncio.to_thread(self.store.add, store_key, _PENDING, IDEMPOTENCY_LOCK_TTL):
+                return None
+
+            record = _decode(await asyncio.to_thread(self.store.get, store_key))
+            if record is None:
+                continue  # the holder failed and released the key; try to claim it
+            if record["state"] == "done" or time.monotonic() >= deadline:
+                return record
+
+            local = self._inflight.get(store_key)
+            remaining = deadline - time.monotonic()
+            try:
+                if local is not None:
+                    await asyncio.wait_for(local.wait(), timeout=remaining)
+                else:
+                    await asyncio.sleep(min(IDEMPOTENCY_POLL_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, scope, body, send, store_key, fingerprint):
+        done = self._inflight[store_key] = asyncio.Event()
+        response = {"status": 500, "headers": [], "body": []}
+        sent_body = False
+
+        async def replay_receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return {"type": "http.disconnect"}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        finally:
+            status = response["status"]
+            if status >= 500 or status in UNCACHEABLE_STATUSES:
+                await asyncio.to_thread(self.store.delete, store_key)
+            else:
+                record = {
+                    "state": "done",
+                    "fingerprint": fingerprint,
+                    "status": status,
+                    "headers": [[name.decode("latin-1"), value.decode("latin-1")] for name, value in response["headers"]],
+                    "body": base64.b64encode(b"".join(response["body"])).decode(),
+                }
+                await asyncio.to_thread(self.store.set, store_key, json.dumps(record).encode(), IDEMPOTENCY_TTL)
+            self._inflight.pop(store_key, None)
+            done.set()
+
+    @staticmethod
+    async def _replay(record, send):
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in record["headers"]]
+        headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": record["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": base64.b64decode(record["body"])})
@@ -0,0 +1,197 @@
+import os
+import time
+
+from dotenv import load_dotenv
+
+# PROMETHEUS_MULTIPROC_DIR must be visible before prometheus_client is imported:
+# it switches every metric to mmap-backed files shared by all worker processes.
+load_dotenv()
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.pool import QueuePool  # noqa: E402
+
+MULTIPROCESS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+REQUEST_COUNT = Counter(
+    "neofi_http_requests_total",
+    "HTTP requests served, by route template and status code.",
+    ["method", "route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "neofi_http_request_duration_seconds",
+    "HTTP request latency, by route template.",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "neofi_db_pool_checked_out",
+    "Database connections currently checked out of the pool, by engine (primary, shard or replica).",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "neofi_db_pool_overflow",
+    "Connections open beyond the configured pool size, by engine.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "neofi_db_pool_wait_seconds",
+    "Time spent waiting to obtain a connection from the pool, by engine.",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+
+BCRYPT_QUEUE_DEPTH = Gauge(
+    "neofi_bcrypt_queue_depth",
+    "Password hashing jobs waiting for a bcrypt executor thread.",
+    multiprocess_mode="livesum",
+)
+
+RATE_LIMIT_REJECTIONS = Counter(
+    "neofi_rate_limit_rejections_total",
+    "Requests rejected by the rate limiter.",
+    ["route"],
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "neofi_admission_in_flight",
+    "Requests admitted and running, by route class.",
+    ["route_class"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUED = Gauge(
+    "neofi_admission_queued",
+    "Requests waiting for an admission slot, by route class.",
+    ["route_class"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_OVERLOADED = Gauge(
+    "neofi_admission_overloaded",
+    "1 while a route class sheds new arrivals instead of queueing them.",
+    ["route_class"],
+    multiprocess_mode="livemax",
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "neofi_admission_queue_wait_seconds",
+    "Time requests waited for an admission slot, by route class.",
+    ["route_class"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+ADMISSION_SHED = Counter(
+    "neofi_admission_shed_total",
+    "Requests answered 503 by admission control, by route class and reason (overload, timeout).",
+    ["route_class", "reason"],
+)
+
+TOKEN_CACHE_LOOKUPS = Counter(
+    "neofi_token_cache_lookups_total",
+    "Bearer token verifications answered from the claims cache (hit) or verified (miss).",
+    ["result"],
+)
+
+NOTIFICATION_FANOUT_PENDING = Gauge(
+    "neofi_notification_fanout_pending",
+    "Notifications built by an in-progress fan-out but not yet committed.",
+    multiprocess_mode="livesum",
+)
+NOTIFICATIONS_SENT = Counter(
+    "neofi_notifications_sent_total",
+    "Notifications committed by event fan-outs.",
+)
+
+
+def route_template(scope) -> str:
+    """Route path template (e.g. /api/events/{event_id}) to keep label cardinality bounded."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool timing how long each checkout waits for a connection, labelled
+    with the pool's logging name. Being the pool class, it carries over when
+    engine.dispose() (e.g. after a fork) replaces the pool.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.labels(self.logging_name or "default").observe(time.perf_counter() - start)
+
+
+def instrument_pool(engine) -> None:
+    """
+    Track checked-out/overflow connections of the engine's pool. Pool event
+    listeners are carried over to the new pool by engine.dispose(), and read
+    whichever pool the engine currently has.
+    """
+
+    def update_gauges(returning: int = 0):
+        pool = engine.pool
+        name = pool.logging_name or "default"
+        if hasattr(pool, "checkedout"):
+            DB_POOL_CHECKED_OUT.labels(name).set(pool.checkedout() - returning)
+        if hasattr(pool, "overflow"):
+            DB_POOL_OVERFLOW.labels(name).set(max(pool.overflow(), 0))
+
+    # checkin fires before the connection is back in the pool
+    event.listen(engine.pool, "checkout", lambda *args: update_gauges())
+    event.listen(engine.pool, "checkin", lambda *args: update_gauges(returning=1))
+
+
+def render_metrics():
+    """Return (payload, content type) for the /metrics endpoint, merging all workers."""
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop a dead worker's live gauges (call from the process manager's child_exit hook)."""
+    if MULTIPROCESS_DIR:
+        multiprocess.mark_process_dead(pid)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request counts and latency."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = route_template(scope)
+            REQUEST_COUNT.labels(scope["method"], route, str(status_code)).inc()
+            REQUEST_LATENCY.labels(scope["method"], route).observe(time.perf_counter() - start)
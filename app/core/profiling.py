@@ -0,0 +1,253 @@
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from inspect import iscoroutinefunction
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Profiling configuration (opt-in)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_N_PLUS_ONE_THRESHOLD = int(os.getenv("PROFILE_N_PLUS_ONE_THRESHOLD", 5))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", 500))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_ENGINE = os.getenv("PROFILE_ENGINE", "cprofile")  # cprofile / pyinstrument
+
+
+class RequestProfile:
+    """Timings and query statistics collected for a single request."""
+
+    def __init__(self, sampled: bool = False):
+        self.sampled = sampled
+        self.db_time = 0.0
+        self.db_count = 0
+        self.statements = Counter()
+        # phase name -> [wall time, DB time spent inside the phase]
+        self.phases = {"auth": [0.0, 0.0], "handler": [0.0, 0.0]}
+        self.profiler = None
+
+    def repeated_statements(self, threshold: int = PROFILE_N_PLUS_ONE_THRESHOLD):
+        """Statements executed more than `threshold` times (likely N+1 patterns)."""
+        return {statement: count for statement, count in self.statements.items() if count > threshold}
+
+    def server_timing(self, total: float) -> str:
+        """Render the Server-Timing header value (durations in milliseconds)."""
+        auth_wall, auth_db = self.phases["auth"]
+        handler_wall, handler_db = self.phases["handler"]
+        serialization = max(total - auth_wall - handler_wall, 0.0)
+        metrics = [
+            ("auth", auth_wall - auth_db, None),
+            ("db", self.db_time, f"{self.db_count} queries"),
+            ("handler", handler_wall - handler_db, None),
+            ("serialization", serialization, "validation, serialization & framework"),
+            ("total", total, None),
+        ]
+        parts = []
+        for name, seconds, desc in metrics:
+            part = f"{name};dur={seconds * 1000:.2f}"
+            if desc:
+                part += f';desc="{desc}"'
+            parts.append(part)
+        return ", ".join(parts)
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    """Profile of the request being served, or None when profiling is off."""
+    return _current_profile.get()
+
+
+@contextmanager
+def phase(name: str):
+    """Attribute the wall time of a block to a named phase of the current request."""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    db_before = profile.db_time
+    try:
+        yield
+    finally:
+        totals = profile.phases.setdefault(name, [0.0, 0.0])
+        totals[0] += time.perf_counter() - start
+        totals[1] += profile.db_time - db_before
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    if profile is None or not conn.info.get("profile_query_start"):
+        return
+    profile.db_time += time.perf_counter() - conn.info["profile_query_start"].pop()
+    profile.db_count += 1
+    profile.statements[statement] += 1
+
+
+def install_query_hooks(engine) -> None:
+    """Count statements and DB time per request on the given engine."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _start_profiler():
+    if PROFILE_ENGINE == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument is not installed, falling back to cProfile")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Only one cProfile can be active at a time on Python 3.12+
+        return None
+    return profiler
+
+
+def _stop_profiler(profiler) -> None:
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+    else:
+        profiler.stop()
+
+
+def _dump_profile(profiler, method: str, path: str, total: float) -> str:
+    """Write a sampled profile to PROFILE_DIR and return the file path."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    stem = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}_{method}_{slug}_{total * 1000:.0f}ms"
+
+    if isinstance(profiler, cProfile.Profile):
+        filename = os.path.join(PROFILE_DIR, f"{stem}.prof")
+        profiler.dump_stats(filename)
+    else:
+        filename = os.path.join(PROFILE_DIR, f"{stem}.html")
+        with open(filename, "w") as out:
+            out.write(profiler.output_html())
+    return filename
+
+
+def _profiled(endpoint):
+    """Wrap a route endpoint so its time is recorded as the handler phase."""
+    def start():
+        profile = _current_profile.get()
+        if profile is not None and profile.sampled and profile.profiler is None:
+            profile.profiler = _start_profiler()
+        return profile
+
+    def stop(profile):
+        if profile is not None and profile.profiler is not None:
+            _stop_profiler(profile.profiler)
+
+    if iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            profile = start()
+            try:
+                with phase("handler"):
+                    return await endpoint(*args, **kwargs)
+            finally:
+                stop(profile)
+        async_wrapper.is_profiled = True
+        return async_wrapper
+
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = start()
+        try:
+            with phase("handler"):
+                return endpoint(*args, **kwargs)
+        finally:
+            stop(profile)
+    wrapper.is_profiled = True
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute that separates handler time from auth and serialization when profiling is on."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        # include_router() re-creates routes from already wrapped endpoints
+        if PROFILING_ENABLED and not getattr(endpoint, "is_profiled", False):
+            endpoint = _profiled(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware adding a Server-Timing header (auth, db, handler,
+    serialization) and X-Query-Count to every response, logging likely
+    N+1 query patterns, and dumping profiles of sampled slow requests.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(sampled=random.random() < PROFILE_SAMPLE_RATE)
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", profile.server_timing(time.perf_counter() - start))
+                headers.append("X-Query-Count", str(profile.db_count))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_profile.reset(token)
+            self._report(profile, scope, time.perf_counter() - start)
+
+    def _report(self, profile: RequestProfile, scope, total: float) -> None:
+        method, path = scope["method"], scope["path"]
+
+        for statement, count in profile.repeated_statements().items():
+            logger.warning(
+                "Possible N+1 on %s %s: statement executed %d times: %s",
+                method, path, count, " ".join(statement.split())[:200],
+            )
+
+        if total * 1000 >= PROFILE_SLOW_MS:
+            logger.info(
+                "Slow request %s %s: %.1fms total, %d queries in %.1fms",
+                method, path, total * 1000, profile.db_count, profile.db_time * 1000,
+            )
+            if profile.profiler is not None:
+                logger.info("Profile written to %s", _dump_profile(profile.profiler, method, path, total))
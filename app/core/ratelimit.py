@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+from starlette.responses import JSONResponse
+
+from app.core.metrics import RATE_LIMIT_REJECTIONS
+
+try:
+    import fcntl
+except ImportError:  # Windows: no shared-memory backend
+    fcntl = None
+
+# Load environment variables
+load_dotenv()
+
+# Rate limit configuration: RATE_LIMIT_REQUESTS cost units per RATE_LIMIT_PERIOD
+# seconds, with bursts of up to RATE_LIMIT_BURST units
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_REQUESTS = float(os.getenv("RATE_LIMIT_REQUESTS", 120))
+RATE_LIMIT_PERIOD = float(os.getenv("RATE_LIMIT_PERIOD", 60))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", 60))
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "shm" if fcntl else "memory")  # shm / redis / memory
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_SHM_PATH = os.getenv(
+    "RATE_LIMIT_SHM_PATH",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "neofi-ratelimit"),
+)
+RATE_LIMIT_SLOTS = int(os.getenv("RATE_LIMIT_SLOTS", 65536))
+
+# Cost units charged per request; anything not listed costs 1
+ROUTE_COSTS = {
+    ("POST", "/api/auth/login"): 12,
+    ("POST", "/api/auth/register"): 12,
+    ("POST", "/api/events/batch"): 10,
+    ("PATCH", "/api/events/batch"): 10,
+    ("DELETE", "/api/events/batch"): 10,
+    ("POST", "/api/events/batch/shift"): 10,
+}
+
+EXEMPT_PATHS = {"/metrics", "/docs", "/redoc", "/openapi.json"}
+
+
+class GCRA:
+    """
+    Generic cell rate algorithm: a token bucket stored as a single "theoretical
+    arrival time" (TAT) per key. Each unit of cost pushes the TAT forward by the
+    emission interval; a request is rejected if that would put the TAT further
+    than the burst tolerance ahead of now.
+    """
+
+    def __init__(self, requests: float = RATE_LIMIT_REQUESTS, period: float = RATE_LIMIT_PERIOD, burst: float = RATE_LIMIT_BURST):
+        self.interval = period / requests
+        self.tolerance = self.interval * burst
+
+    def update(self, tat: float, now: float, cost: float):
+        """Return (new TAT to store or None when rejected, seconds until allowed)."""
+        new_tat = max(tat, now) + self.interval * cost
+        excess = new_tat - now - self.tolerance
+        if excess > 0:
+            return None, excess
+        return new_tat, 0.0
+
+
+class MemoryStore:
+    """Per-process TATs. Limits only hold with a single worker."""
+
+    blocking = False
+
+    def __init__(self, gcra: GCRA):
+        self.gcra = gcra
+        self._tats = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, cost: float) -> float:
+        now = time.time()
+        with self._lock:
+            new_tat, retry_after = self.gcra.update(self._tats.get(key, 0.0), now, cost)
+            if new_tat is not None:
+                self._tats[key] = new_tat
+        return retry_after
+
+
+class SharedMemoryStore:
+    """
+    TATs in an mmap'd file (under /dev/shm by default) shared by every worker
+    on the host. The file is an open-addressing table of (key hash, TAT)
+    slots; updates are serialized with flock, which costs a couple of
+    microseconds. When all probed slots hold live buckets of other keys the
+    one closest to expiry is evicted.
+    """
+
+    blocking = False
+    SLOT = struct.Struct("<Qd")
+    PROBES = 8
+
+    def __init__(self, gcra: GCRA, path: str = RATE_LIMIT_SHM_PATH, slots: int = RATE_LIMIT_SLOTS):
+        self.gcra = gcra
+        self.slots = slots
+        size = slots * self.SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()  # flock does not exclude threads sharing the fd
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def hit(self, key: str, cost: float) -> float:
+        key_hash = self._hash(key)
+        start = key_hash % self.slots
+        now = time.time()
+        unpack, pack = self.SLOT.unpack_from, self.SLOT.pack_into
+
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                target, tat = None, 0.0
+                victim, victim_tat = None, math.inf
+                for probe in range(self.PROBES):
+                    offset = ((start + probe) % self.slots) * self.SLOT.size
+                    slot_hash, slot_tat = unpack(self._map, offset)
+                    if slot_hash == key_hash:
+                        target, tat = offset, slot_tat
+                        break
+                    if slot_tat < victim_tat:
+                        victim, victim_tat = offset, slot_tat
+                if target is None:
+                    target = victim  # empty, expired, or the bucket nearest to expiry
+
+                new_tat, retry_after = self.gcra.update(tat, now, cost)
+                if new_tat is not None:
+                    pack(self._map, target, key_hash, new_tat)
+                return retry_after
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class RedisStore:
+    """TATs in Redis (or a compatible server), updated atomically by a Lua script."""
+
+    blocking = True
+    SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or ARGV[1]), now)
+    local new_tat = tat + tonumber(ARGV[2])
+    local excess = new_tat - now - tonumber(ARGV[3])
+    if excess > 0 then
+        return tostring(excess)
+    end
+    redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+    return '0'
+    """
+
+    def __init__(self, gcra: GCRA, url: str = RATE_LIMIT_REDIS_URL):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("The redis rate limit backend requires the 'redis' package") from exc
+        self.gcra = gcra
+        self._script = redis.Redis.from_url(url).register_script(self.SCRIPT)
+
+    def hit(self, key: str, cost: float) -> float:
+        return float(self._script(
+            keys=[f"neofi:rl:{key}"],
+            args=[time.time(), self.gcra.interval * cost, self.gcra.tolerance],
+        ))
+
+
+def create_store(name: str = RATE_LIMIT_BACKEND, gcra: Optional[GCRA] = None):
+    gcra = gcra or GCRA()
+    if name == "shm":
+        if fcntl is None:
+            raise RuntimeError("The shm rate limit backend is not available on this platform")
+        return SharedMemoryStore(gcra)
+    if name == "redis":
+        return RedisStore(gcra)
+    if name == "memory":
+        return MemoryStore(gcra)
+    raise RuntimeError(f"Unknown rate limit backend: {name}")
+
+
+class RateLimitMiddleware:
+    """
+    Charges every request against a bucket for the authenticated user id,
+    falling back to the client IP, and answers 429 with Retry-After once the
+    bucket is empty.
+    """
+
+    def __init__(self, app, store=None):
+        self.app = app
+        self.store = store or create_store()
+
+    @staticmethod
+    def _user_id(token: bytes) -> Optional[str]:
+        # Imported lazily: security depends on the database layer. Repeated
+        # tokens are answered from its verified-claims cache.
+        from app.core.security import verify_token
+
+        payload = verify_token(token.decode("latin-1"))
+        if not payload or not payload.get("sub"):
+            return None
+        return str(payload["sub"])
+
+    def identify(self, scope) -> str:
+        for name, value in scope["headers"]:
+            if name == b"authorization" and value[:7].lower() == b"bearer ":
+                user_id = self._user_id(value[7:])
+                if user_id:
+                    return f"user:{user_id}"
+                break
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        rule = (scope["method"], scope["path"])
+        cost = ROUTE_COSTS.get(rule, 1)
+        key = self.identify(scope)
+        if self.store.blocking:
+            retry_after = await asyncio.to_thread(self.store.hit, key, cost)
+        else:
+            retry_after = self.store.hit(key, cost)
+
+        if retry_after > 0:
+            RATE_LIMIT_REJECTIONS.labels(scope["path"] if rule in ROUTE_COSTS else "default").inc()
+            await JSONResponse(
+                {"detail": "Rate limit exceeded"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
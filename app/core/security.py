@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Dict
 
@@ -10,6 +11,9 @@ from passlib.context import CryptContext
 
 from app.models.user import User
 from app.db.database import SessionLocal
+from app.core.profiling import phase
+from app.core.metrics import BCRYPT_QUEUE_DEPTH
+from app.core.token_cache import TOKEN_VERIFIER, ClaimsCache, create_verifier
 
 # Load environment variables
 load_dotenv()
@@ -19,22 +23,41 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", os.cpu_count() or 1))
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Bcrypt is CPU-bound; cap concurrent hashes at the core count instead of
+# letting it occupy every request thread
+bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+# Claims of tokens already verified by this worker, valid until their exp
+claims_cache = ClaimsCache(create_verifier(TOKEN_VERIFIER, SECRET_KEY, ALGORITHM))
+
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
+def run_bcrypt(func, *args):
+    """Run a password hashing call on the bcrypt executor and wait for its result."""
+    BCRYPT_QUEUE_DEPTH.inc()
+
+    def job():
+        BCRYPT_QUEUE_DEPTH.dec()
+        return func(*args)
+
+    return bcrypt_executor.submit(job).result()
+
+
 def get_password_hash(password: str) -> str:
     """Hash a plain password using bcrypt."""
-    return pwd_context.hash(password)
+    return run_bcrypt(pwd_context.hash, password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against its hashed version."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return run_bcrypt(pwd_context.verify, plain_password, hashed_password)
 
 
 def create_access_token(data: Dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -45,18 +68,18 @@ def create_access_token(data: Dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def create_refresh_token(data: Dict) -> str:
+def create_refresh_token(data: Dict, expires_at: Optional[datetime] = None) -> str:
     """Generate a JWT refresh token."""
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+    expire = expires_at or datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    to_encode.update({"exp": expire, "type": "refresh"})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
 def verify_token(token: str) -> Optional[Dict]:
     """Verify and decode a JWT token. Return payload or None if invalid."""
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        return claims_cache.decode(token)
     except JWTError:
         return None
 
@@ -71,17 +94,18 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         detail="Could not validate credentials",
     )
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        if not user_id:
+    with phase("auth"):
+        try:
+            payload = claims_cache.decode(token)
+            user_id = payload.get("sub")
+            if not user_id or payload.get("type") == "refresh":
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
 
-    # Use context manager to handle DB session
-    with SessionLocal() as db:
-        user = db.query(User).filter(User.id == int(user_id)).first()
-        if not user:
-            raise credentials_exception
-        return user
+        # Use context manager to handle DB session
+        with SessionLocal() as db:
+            user = db.query(User).filter(User.id == int(user_id)).first()
+            if not user:
+                raise credentials_exception
+            return user
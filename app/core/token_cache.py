@@ -0,0 +1,167 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict
+
+from dotenv import load_dotenv
+from jose import JWTError, jwt as jose_jwt
+
+from app.core.metrics import TOKEN_CACHE_LOOKUPS
+
+# Load environment variables
+load_dotenv()
+
+# Signature verifier used on cache misses: jose, pyjwt or hmac
+TOKEN_VERIFIER = os.getenv("TOKEN_VERIFIER", "jose")
+# Verified tokens remembered per worker; 0 disables the cache
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+
+CACHE_HITS = TOKEN_CACHE_LOOKUPS.labels("hit")
+CACHE_MISSES = TOKEN_CACHE_LOOKUPS.labels("miss")
+
+HMAC_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+
+class JoseVerifier:
+    """python-jose, the reference implementation the others must agree with."""
+
+    def __init__(self, key: str, algorithm: str):
+        self.key = key
+        self.algorithm = algorithm
+
+    def decode(self, token: str) -> Dict:
+        return jose_jwt.decode(token, self.key, algorithms=[self.algorithm])
+
+
+class PyJWTVerifier:
+    """PyJWT, roughly twice as fast as python-jose for HMAC tokens."""
+
+    def __init__(self, key: str, algorithm: str):
+        import jwt
+
+        self._jwt = jwt
+        self.key = key
+        self.algorithm = algorithm
+
+    def decode(self, token: str) -> Dict:
+        try:
+            payload = self._jwt.decode(token, self.key, algorithms=[self.algorithm])
+        except self._jwt.PyJWTError as exc:
+            raise JWTError(str(exc))
+        if "sub" in payload and not isinstance(payload["sub"], str):
+            raise JWTError("Subject must be a string.")
+        return payload
+
+
+class HMACVerifier:
+    """
+    Verifies HS256/384/512 tokens directly with a keyed hash whose inner and
+    outer pads are computed once, instead of per token. Checks the header
+    algorithm, signature, `exp` and `nbf`, and that `sub` is a string.
+    """
+
+    def __init__(self, key: str, algorithm: str):
+        if algorithm not in HMAC_DIGESTS:
+            raise RuntimeError(f"The hmac token verifier does not support {algorithm}")
+        self.algorithm = algorithm
+        self._mac = hmac.new(key.encode(), digestmod=HMAC_DIGESTS[algorithm])
+
+    @staticmethod
+    def _b64decode(segment: str) -> bytes:
+        return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+    def decode(self, token: str) -> Dict:
+        try:
+            signing_input, signature = token.rsplit(".", 1)
+            header_segment, payload_segment = signing_input.split(".")
+            header = json.loads(self._b64decode(header_segment))
+            mac = self._mac.copy()
+            mac.update(signing_input.encode("ascii"))
+            valid = hmac.compare_digest(mac.digest(), self._b64decode(signature))
+            payload = json.loads(self._b64decode(payload_segment)) if valid else None
+        except (ValueError, TypeError, UnicodeError):
+            raise JWTError("Malformed token")
+        if not isinstance(header, dict) or header.get("alg") != self.algorithm:
+            raise JWTError("The specified alg value is not allowed")
+        if not valid:
+            raise JWTError("Signature verification failed.")
+        if not isinstance(payload, dict):
+            raise JWTError("Invalid payload")
+
+        now = time.time()
+        try:
+            if "exp" in payload and float(payload["exp"]) <= now:
+                raise JWTError("Signature has expired.")
+            if "nbf" in payload and float(payload["nbf"]) > now:
+                raise JWTError("The token is not yet valid (nbf)")
+        except (TypeError, ValueError):
+            raise JWTError("Invalid exp or nbf claim")
+        if "sub" in payload and not isinstance(payload["sub"], str):
+            raise JWTError("Subject must be a string.")
+        return payload
+
+
+VERIFIERS = {"jose": JoseVerifier, "pyjwt": PyJWTVerifier, "hmac": HMACVerifier}
+
+
+def create_verifier(name: str, key: str, algorithm: str):
+    if name not in VERIFIERS:
+        raise RuntimeError(f"Unknown token verifier: {name}")
+    return VERIFIERS[name](key, algorithm)
+
+
+class ClaimsCache:
+    """
+    Verified claims of recently seen tokens, keyed by a digest of the token,
+    so a token presented again within its lifetime skips signature
+    verification and JSON parsing. An entry is dropped once the token's `exp`
+    passes; tokens without `exp` are not cached. Least recently used entries
+    are evicted beyond `size`.
+
+    The returned claims dict is shared between callers and must not be modified.
+    """
+
+    def __init__(self, verifier, size: int = TOKEN_CACHE_SIZE):
+        self.verifier = verifier
+        self.size = size
+        self._entries = OrderedDict()  # token digest -> (claims, exp)
+        self._lock = threading.Lock()
+
+    def decode(self, token: str) -> Dict:
+        """Claims of a valid token; raises JWTError otherwise."""
+        if self.size <= 0:
+            return self.verifier.decode(token)
+
+        key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    CACHE_HITS.inc()
+                    return entry[0]
+                del self._entries[key]
+        CACHE_MISSES.inc()
+
+        claims = self.verifier.decode(token)
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            with self._lock:
+                self._entries[key] = (claims, float(exp))
+                if len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        return claims
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
@@ -1,9 +1,15 @@
 import os
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 from typing import Generator
 
+from app.core.metrics import TimedQueuePool, instrument_pool
+from app.core.profiling import PROFILING_ENABLED, install_query_hooks
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -12,8 +18,38 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL is not set in the environment variables.")
 
+# PostgreSQL driver: psycopg2, or psycopg (3) for pipelined writes and server-side prepared statements
+DATABASE_DRIVER = os.getenv("DATABASE_DRIVER", "")
+# psycopg 3 prepares a statement on the server once a connection ran it this
+# many times; empty disables it (e.g. behind pgbouncer in transaction mode)
+DB_PREPARE_THRESHOLD = os.getenv("DB_PREPARE_THRESHOLD", "5")
+# Send the writes of one request in a single round trip (psycopg 3 only)
+DB_PIPELINE = os.getenv("DB_PIPELINE", "true").lower() == "true"
+
+
+def create_db_engine(url: str, name: str):
+    """
+    Engine for `url`, with the PostgreSQL driver chosen by DATABASE_DRIVER,
+    its pool reported on /metrics under `name` and, with PROFILING_ENABLED,
+    its statements counted by the request profiler.
+    """
+    url = make_url(url)
+    options = {}
+    if DATABASE_DRIVER and url.get_backend_name() == "postgresql":
+        url = url.set(drivername=f"postgresql+{DATABASE_DRIVER}")
+        if DATABASE_DRIVER == "psycopg":
+            options["connect_args"] = {"prepare_threshold": int(DB_PREPARE_THRESHOLD) if DB_PREPARE_THRESHOLD else None}
+    if url.get_dialect().get_pool_class(url) is QueuePool:
+        options["poolclass"] = TimedQueuePool
+    db_engine = create_engine(url, echo=False, pool_pre_ping=True, pool_logging_name=name, **options)
+    instrument_pool(db_engine)
+    if PROFILING_ENABLED:
+        install_query_hooks(db_engine)
+    return db_engine
+
+
 # SQLAlchemy engine and session configuration
-engine = create_engine(DATABASE_URL, echo=False, pool_pre_ping=True)
+engine = create_db_engine(DATABASE_URL, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Base class for models
@@ -30,3 +66,19 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+
+@contextmanager
+def pipeline(db):
+    """
+    Send the statements issued inside, up to and including the commit, to the
+    server in one batch when the session runs on psycopg 3; a no-op on other
+    drivers. Only statements whose results are not read may run inside: Core
+    inserts, updates and deletes, not queries, ORM flushes or RETURNING.
+    """
+    connection = db.connection().connection.dbapi_connection
+    if DB_PIPELINE and hasattr(connection, "pipeline"):
+        with connection.pipeline():
+            yield
+    else:
+        yield
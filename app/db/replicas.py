@@ -0,0 +1,149 @@
+import itertools
+import logging
+import os
+import time
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+from fastapi import Depends, Request
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.cache import RESPONSE_CACHE_BACKEND, cache_backend, create_backend
+from app.core.security import get_current_user
+from app.db.database import SessionLocal, create_db_engine
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated URLs of read replicas; reads use the primary when empty
+READ_REPLICA_URLS = [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+# A replica is skipped for this long after a failed connection or excessive lag
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", 30))
+# Replication lag (PostgreSQL) is re-checked at most this often per replica
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", 5))
+# Replicas lagging more than this are taken out of rotation
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 5))
+# Users stay on the primary this long after a write changed what they can see
+REPLICA_PIN_SECONDS = float(os.getenv("REPLICA_PIN_SECONDS", REPLICA_MAX_LAG_SECONDS))
+# Where those pins are kept (memory / redis); defaults to RESPONSE_CACHE_BACKEND
+REPLICA_PIN_BACKEND = os.getenv("REPLICA_PIN_BACKEND", "")
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = create_db_engine(url, f"replica:{self.name}")
+        self.down_until = 0.0
+        self.checked_at = 0.0
+
+    def mark_down(self, reason: str) -> None:
+        logger.warning("Read replica %s removed from rotation for %ss: %s", self.name, REPLICA_RETRY_SECONDS, reason)
+        self.down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+
+
+class ReplicaSet:
+    """Round-robin over the replicas that are reachable and not lagging."""
+
+    def __init__(self, urls: Iterable[str]):
+        self.replicas = [Replica(url) for url in urls]
+        self._cursor = itertools.count()
+
+    def session(self) -> Optional[Session]:
+        """Open a session on the next healthy replica, or return None if there is none."""
+        count = len(self.replicas)
+        start = next(self._cursor)
+        for offset in range(count):
+            replica = self.replicas[(start + offset) % count]
+            now = time.monotonic()
+            if replica.down_until > now:
+                continue
+
+            session = ReplicaSessionLocal(bind=replica.engine)
+            try:
+                connection = session.connection()
+                if now - replica.checked_at >= REPLICA_CHECK_SECONDS:
+                    replica.checked_at = now
+                    if connection.dialect.name == "postgresql":
+                        lag = float(connection.execute(LAG_QUERY).scalar() or 0)
+                        if lag > REPLICA_MAX_LAG_SECONDS:
+                            session.close()
+                            replica.mark_down(f"{lag:.1f}s behind")
+                            continue
+                return session
+            except DBAPIError as exc:
+                session.close()
+                replica.mark_down(str(exc.orig))
+        return None
+
+
+class LastWriteStore:
+    """
+    Time of the last write that changed what each user can see, in a shared
+    cache backend so every worker honours it.
+    """
+
+    def __init__(self, backend, pin_seconds: float = REPLICA_PIN_SECONDS):
+        self.backend = backend
+        self.pin_seconds = pin_seconds
+
+    def record(self, user_ids: Iterable[int]) -> None:
+        stamp = str(time.time()).encode()
+        for user_id in set(user_ids):
+            self.backend.set(f"lastwrite:{user_id}", stamp, max(1, int(self.pin_seconds + 1)))
+
+    def is_recent(self, user_id: int) -> bool:
+        stamp = self.backend.get(f"lastwrite:{user_id}")
+        return stamp is not None and time.time() - float(stamp) < self.pin_seconds
+
+
+def create_pin_backend(name: str = REPLICA_PIN_BACKEND):
+    """Backend for read-your-writes pins; never the null one, which would turn them off."""
+    name = name or RESPONSE_CACHE_BACKEND
+    if name == "none":
+        if READ_REPLICA_URLS:
+            logger.warning("RESPONSE_CACHE_BACKEND=none: read-your-writes pins are kept in each worker's memory; "
+                           "set REPLICA_PIN_BACKEND=redis when running several workers")
+        name = "memory"
+    return cache_backend if name == RESPONSE_CACHE_BACKEND else create_backend(name)
+
+
+replica_set = ReplicaSet(READ_REPLICA_URLS)
+last_writes = LastWriteStore(create_pin_backend())
+
+
+def routed_session(method: str, user_id: int):
+    """
+    Session for a request: a replica for safe methods, unless none is healthy
+    or the user was just affected by a write (read-your-writes); the primary
+    otherwise.
+    """
+    session = None
+    if replica_set.replicas and method in SAFE_METHODS and not last_writes.is_recent(user_id):
+        session = replica_set.session()
+    if session is None:
+        session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def get_read_db(request: Request, current_user=Depends(get_current_user)):
+    """Dependency for read-only endpoints of authenticated users."""
+    yield from routed_session(request.method, current_user.id)
@@ -0,0 +1,336 @@
+import bisect
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy import event as sa_event, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.database import DATABASE_URL, SessionLocal, create_db_engine, engine
+from app.db.replicas import SAFE_METHODS, routed_session
+from app.models.archived_event import ArchivedEvent
+from app.models.event import Event
+from app.models.event_version import EventVersion
+from app.models.group_permission import EventGroupPermission
+from app.models.id_block import IdBlock
+from app.models.permission import EventPermission
+from app.models.shard_directory import ShardDirectory
+from app.models.user import User
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated name=url pairs, one per shard; everything stays on DATABASE_URL when empty
+SHARD_URLS = [item.strip() for item in os.getenv("SHARD_URLS", "").split(",") if item.strip()]
+# Points per shard on the hash ring; more points spread owners more evenly
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", 64))
+# Directory overrides (and freezes) are re-read at most this often per owner
+SHARD_DIRECTORY_TTL = float(os.getenv("SHARD_DIRECTORY_TTL", 10))
+# Ids reserved from the primary per round trip, per table and worker
+SHARD_ID_BLOCK = int(os.getenv("SHARD_ID_BLOCK", 100))
+# Threads used to query the shards in parallel
+SHARD_FANOUT_WORKERS = int(os.getenv("SHARD_FANOUT_WORKERS", 8))
+
+# Tables stored on the owner's shard whose ids must stay unique across shards,
+# so an event keeps its ids when it is moved
+SHARDED_MODELS = (Event, EventVersion, EventPermission, EventGroupPermission)
+
+# Event id -> shard name, remembered per worker
+LOCATION_CACHE_SIZE = 10000
+
+
+def ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def parse_shard_urls(items: Iterable[str]) -> Dict[str, str]:
+    """{name: url} from 'name=url' items; only the first '=' separates them."""
+    shards = {}
+    for item in items:
+        name, separator, url = item.partition("=")
+        if not separator or not name.strip() or not url.strip():
+            raise RuntimeError(f"SHARD_URLS entries must look like name=url, got {item!r}")
+        shards[name.strip()] = url.strip()
+    return shards
+
+
+class HashRing:
+    """
+    Consistent hashing of owner ids onto shard names. Adding or removing a
+    shard only moves the owners on the ring segments next to its points.
+    """
+
+    def __init__(self, names: Iterable[str], vnodes: int = SHARD_VNODES):
+        points = sorted((ring_hash(f"{name}#{index}"), name) for name in names for index in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def lookup(self, owner_id: int) -> str:
+        index = bisect.bisect(self._hashes, ring_hash(str(owner_id))) % len(self._hashes)
+        return self._names[index]
+
+
+class Shard:
+    def __init__(self, name: str, bind, session_factory=None):
+        self.name = name
+        self.engine = bind
+        self.session = session_factory or sessionmaker(autocommit=False, autoflush=False, bind=bind)
+
+
+class IdAllocator:
+    """
+    Hands out ids that are unique across shards. Each worker reserves blocks
+    of `block` ids per table from the `id_blocks` row on the primary, so only
+    one in `block` inserts costs a round trip there (hi/lo). A table's row is
+    created on first use, above the largest id any shard holds.
+    """
+
+    def __init__(self, router, block: int = SHARD_ID_BLOCK):
+        self.router = router
+        self.block = block
+        self._ranges = {}  # table -> (next id, end of reserved block)
+        self._lock = threading.Lock()
+
+    def next_id(self, table: str) -> int:
+        with self._lock:
+            current, end = self._ranges.get(table, (0, 0))
+            if current >= end:
+                current, end = self.reserve(table, self.block)
+            self._ranges[table] = (current + 1, end)
+            return current
+
+    def reserve(self, table: str, count: int) -> Tuple[int, int]:
+        """Reserve `count` consecutive ids and return (first, end)."""
+        for _ in range(2):
+            with engine.begin() as conn:
+                end = conn.execute(
+                    update(IdBlock).where(IdBlock.name == table).values(next_id=IdBlock.next_id + count).returning(IdBlock.next_id)
+                ).scalar()
+            if end is not None:
+                return end - count, end
+            self._seed(table)
+        raise RuntimeError(f"Could not reserve ids for {table}")
+
+    def _seed(self, table: str) -> None:
+        columns = [model.id for model in SHARDED_MODELS if model.__tablename__ == table]
+        if table == Event.__tablename__:
+            columns.append(ArchivedEvent.id)  # archived events keep their ids for when they are rehydrated
+        start = 1 + max(self.router.fan_out(lambda db: max(db.query(func.max(column)).scalar() or 0 for column in columns)))
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(IdBlock).values(name=table, next_id=start))
+        except IntegrityError:
+            pass  # another worker seeded it first
+
+
+class ShardRouter:
+    """
+    Maps owners to shards: an explicit `shard_directory` row wins, otherwise
+    the hash ring decides. Without SHARD_URLS there is a single shard, the
+    primary, and none of the lookups touch the database.
+    """
+
+    def __init__(self, urls: Dict[str, str], vnodes: int = SHARD_VNODES):
+        self.enabled = bool(urls)
+        if self.enabled:
+            self.shards = [
+                Shard(name, engine, SessionLocal) if url == DATABASE_URL else Shard(name, create_db_engine(url, f"shard:{name}"))
+                for name, url in urls.items()
+            ]
+        else:
+            self.shards = [Shard("default", engine, SessionLocal)]
+        self.by_name = {shard.name: shard for shard in self.shards}
+        self.ring = HashRing(self.by_name, vnodes)
+        self.ids = IdAllocator(self)
+        self._directory = {}  # owner id -> (shard name or None, frozen, read at)
+        self._locations = OrderedDict()  # event id -> shard name
+        self._mirrored = set()  # (shard name, user id) known to exist on the shard
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=min(SHARD_FANOUT_WORKERS, len(self.shards)), thread_name_prefix="shard-fanout")
+
+    # Placement
+
+    def placement(self, owner_id: int) -> Tuple[Shard, bool]:
+        """(shard holding the owner's events, whether the owner is frozen for a move)."""
+        if not self.enabled:
+            return self.shards[0], False
+        now = time.monotonic()
+        entry = self._directory.get(owner_id)
+        if entry is None or now - entry[2] >= SHARD_DIRECTORY_TTL:
+            with SessionLocal() as db:
+                row = db.get(ShardDirectory, owner_id)
+            entry = (row.shard, row.frozen, now) if row else (None, False, now)
+            self._directory[owner_id] = entry
+        name = entry[0] if entry[0] in self.by_name else self.ring.lookup(owner_id)
+        return self.by_name[name], entry[1]
+
+    def shard_for(self, owner_id: int, write: bool = False) -> Shard:
+        shard, frozen = self.placement(owner_id)
+        if write and frozen:
+            raise HTTPException(
+                status_code=503,
+                detail="These events are being moved to another database, try again shortly",
+                headers={"Retry-After": str(max(1, int(SHARD_DIRECTORY_TTL)))},
+            )
+        return shard
+
+    def forget(self, owner_id: int) -> None:
+        self._directory.pop(owner_id, None)
+
+    def locate(self, event_id: int) -> Optional[Tuple[Shard, int]]:
+        """(shard, owner id) of an event, hot or archived, or None if no shard has it."""
+        if not self.enabled:
+            return None
+
+        def owner_of(db):
+            owner_id = db.query(Event.owner_id).filter(Event.id == event_id).scalar()
+            if owner_id is None:
+                owner_id = db.query(ArchivedEvent.owner_id).filter(ArchivedEvent.id == event_id).scalar()
+            return owner_id
+
+        name = self._locations.get(event_id)
+        if name in self.by_name:
+            with self.by_name[name].session() as db:
+                owner_id = owner_of(db)
+            if owner_id is not None:
+                return self.by_name[name], owner_id
+
+        # Not cached, or moved since: ask every shard
+        for shard, owner_id in zip(self.shards, self.fan_out(owner_of)):
+            if owner_id is not None:
+                with self._lock:
+                    self._locations[event_id] = shard.name
+                    if len(self._locations) > LOCATION_CACHE_SIZE:
+                        self._locations.popitem(last=False)
+                return shard, owner_id
+        return None
+
+    # Queries across shards
+
+    def fan_out(self, query: Callable[[Session], object], db: Optional[Session] = None) -> List:
+        """
+        Run `query(session)` on every shard in parallel, each in its own
+        session, and return the results in shard order. Without sharding it
+        runs once, on `db` if given.
+        """
+        if not self.enabled and db is not None:
+            return [query(db)]
+
+        def run(shard):
+            with shard.session() as session:
+                return query(session)
+
+        if len(self.shards) == 1:
+            return [run(self.shards[0])]
+        return list(self._executor.map(run, self.shards))
+
+    # Reference data
+
+    def shard_of(self, db: Session) -> Optional[Shard]:
+        bind = db.get_bind()
+        return next((shard for shard in self.shards if shard.engine is bind), None)
+
+    def ensure_users(self, db: Session, user_ids: Iterable[int]) -> None:
+        """
+        Copy the rows of `user_ids` from the primary to the shard `db` is bound
+        to, so foreign keys hold there. Copies carry no usable password; users
+        are always authenticated against the primary.
+        """
+        shard = self.shard_of(db) if self.enabled else None
+        if shard is None or shard.engine is engine:
+            return
+        missing = {user_id for user_id in user_ids if user_id is not None and (shard.name, user_id) not in self._mirrored}
+        if not missing:
+            return
+        with shard.engine.connect() as conn:
+            missing -= set(conn.execute(select(User.id).where(User.id.in_(missing))).scalars())
+        if missing:
+            with SessionLocal() as primary:
+                rows = [
+                    {"id": user.id, "username": user.username, "email": user.email, "hashed_password": "!",
+                     "is_active": user.is_active, "role": user.role}
+                    for user in primary.query(User).filter(User.id.in_(missing))
+                ]
+            for row in rows:
+                try:
+                    with shard.engine.begin() as conn:
+                        conn.execute(insert(User).values(**row))
+                except IntegrityError:
+                    pass  # mirrored concurrently by another worker
+        self._mirrored.update((shard.name, user_id) for user_id in user_ids if user_id is not None)
+
+    def assign_ids(self, model, rows: List[dict]) -> List[dict]:
+        """Give Core insert rows of a sharded table their ids; a no-op without sharding."""
+        if self.enabled:
+            for row in rows:
+                row.setdefault("id", self.ids.next_id(model.__tablename__))
+        return rows
+
+
+shard_router = ShardRouter(parse_shard_urls(SHARD_URLS))
+
+
+def _assign_id(mapper, connection, target) -> None:
+    if target.id is None:
+        target.id = shard_router.ids.next_id(mapper.local_table.name)
+
+
+if shard_router.enabled:
+    for model in SHARDED_MODELS:
+        sa_event.listen(model, "before_insert", _assign_id)
+
+
+def _shard_session(shard: Shard):
+    session = shard.session()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def owner_session(method: str, user):
+    """
+    Session on the shard holding `user`'s own events. Without sharding this is
+    the replica-routed session.
+    """
+    if not shard_router.enabled:
+        yield from routed_session(method, user.id)
+        return
+    write = method not in SAFE_METHODS
+    shard = shard_router.shard_for(user.id, write=write)
+    for session in _shard_session(shard):
+        if write:
+            shard_router.ensure_users(session, [user.id])
+        yield session
+
+
+def event_session(event_id: int, method: str, user):
+    """
+    Session on the shard holding event `event_id`, falling back to the
+    caller's shard when no shard has it (the endpoint then reports 404).
+    """
+    if not shard_router.enabled:
+        yield from routed_session(method, user.id)
+        return
+    located = shard_router.locate(event_id)
+    write = method not in SAFE_METHODS
+    if located is None:
+        yield from owner_session(method, user)
+        return
+    shard, owner_id = located
+    if write:
+        shard_router.shard_for(owner_id, write=True)  # refuses writes while the owner is being moved
+    for session in _shard_session(shard):
+        if write:
+            shard_router.ensure_users(session, [user.id])
+        yield session
@@ -1,20 +1,49 @@
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from fastapi.security import OAuth2PasswordBearer
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
 
-from app.routers import auth, events
+from app.core.admission import ADMISSION_ENABLED, AdmissionMiddleware
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.metrics import MetricsMiddleware
+from app.core.profiling import PROFILING_ENABLED, ProfilingMiddleware
+from app.core.ratelimit import RATE_LIMIT_ENABLED, RateLimitMiddleware
+from app.core.warmup import WARMUP_ENABLED, warm_up
+from app.db.shards import shard_router
+from app.routers import auth, events, groups, metrics, notifications
+from app.services.archive import ARCHIVE_ENABLED, archive_mover
+from app.services.partitions import ensure_partitions
+from app.services.reminders import REMINDERS_ENABLED, reminder_schedulers
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Make sure the monthly partitions for the coming months exist, on every shard
+    for shard in shard_router.shards:
+        ensure_partitions(shard.engine)
+    # Build the OpenAPI schema, open pooled connections and start bcrypt threads
+    # before the first request instead of during it
+    if WARMUP_ENABLED:
+        warm_up(app)
+    # Every worker competes for each shard's scheduler lease; only the holder sends reminders
+    if REMINDERS_ENABLED:
+        for scheduler in reminder_schedulers:
+            scheduler.start()
+    # Periodically move events that ended long ago to the archive tables
+    if ARCHIVE_ENABLED:
+        archive_mover.start()
+    yield
+    if ARCHIVE_ENABLED:
+        archive_mover.stop()
+    if REMINDERS_ENABLED:
+        for scheduler in reminder_schedulers:
+            scheduler.stop()
 
-# Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
 
 # Create FastAPI app
-app = FastAPI(title="NeoFi Event API")
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+app = FastAPI(title="NeoFi Event API", lifespan=lifespan)
 
 # OAuth2 password bearer token URL
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -22,6 +51,9 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 # Register routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Auth"])
 app.include_router(events.router, prefix="/api", tags=["Events"])
+app.include_router(groups.router, prefix="/api", tags=["Groups"])
+app.include_router(notifications.router, prefix="/api", tags=["Notifications"])
+app.include_router(metrics.router)
 
 # CORS configuration
 app.add_middleware(
@@ -31,6 +63,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Replay responses of retried POST /events and /events/batch carrying an Idempotency-Key
+app.add_middleware(IdempotencyMiddleware)
+
+# Per-user (or per-IP) GCRA rate limiting, shared by all workers on the host
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
+# Bounded concurrency per route class; sheds with 503 + Retry-After when requests queue too long
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
+
+# Prometheus metrics (per-route latency, pool usage) exposed at /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Opt-in per-request profiling (Server-Timing, query counts, N+1 detection)
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
 # Customize Swagger docs to include Bearer token authentication
 def custom_openapi():
     if app.openapi_schema:
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, LargeBinary
+from app.db.database import Base
+from datetime import datetime
+
+class ArchivedEvent(Base):
+    __tablename__ = "archived_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # the id the event had, and gets back when rehydrated
+    title = Column(String, nullable=False)
+    description = Column(Text)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    location = Column(String)
+    is_recurring = Column(Boolean, default=False)
+    recurrence_pattern = Column(String, nullable=True)
+
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    versions = Column(LargeBinary)  # zlib-compressed JSON list of the event's versions
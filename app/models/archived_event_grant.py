@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, ForeignKey, String, Index
+from app.db.database import Base
+
+class ArchivedEventGrant(Base):
+    __tablename__ = "archived_event_grants"
+
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, ForeignKey("archived_events.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)  # set for a user's permission...
+    group_id = Column(Integer, nullable=True)  # ...or for a group's
+    role = Column(String, nullable=False)  # viewer, editor
+
+    __table_args__ = (
+        Index("ix_archived_event_grants_user_id_event_id", "user_id", "event_id"),
+        Index("ix_archived_event_grants_group_id_event_id", "group_id", "event_id"),
+    )
@@ -10,7 +10,7 @@ class Event(Base):
     title = Column(String, nullable=False)
     description = Column(Text)
     start_time = Column(DateTime, nullable=False)
-    end_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False, index=True)  # events ended long ago are moved to archived_events
     location = Column(String)
     is_recurring = Column(Boolean, default=False)
     recurrence_pattern = Column(String, nullable=True)  # e.g., 'daily', 'weekly', 'monthly'
@@ -19,3 +19,4 @@ class Event(Base):
     owner = relationship("User", backref="owned_events")
 
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # polled by the reminder scheduler
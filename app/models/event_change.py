@@ -0,0 +1,17 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
+from app.db.database import Base
+
+class EventChange(Base):
+    __tablename__ = "event_changes"
+
+    id = Column(Integer, primary_key=True)  # increasing per database; sync tokens hold the last one a client has seen
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    group_id = Column(Integer, nullable=True)  # set instead of user_id for a change seen by every member of a group
+    event_id = Column(Integer, nullable=False)  # no foreign key: the row outlives a deleted event
+    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)  # compaction cutoff
+
+    __table_args__ = (
+        Index("ix_event_changes_user_id_id", "user_id", "id"),
+        Index("ix_event_changes_group_id_id", "group_id", "id"),
+    )
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey
+from app.db.database import Base
+
+class EventDayRollup(Base):
+    __tablename__ = "event_day_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC calendar day
+    event_count = Column(Integer, nullable=False, default=0)
+    busy_minutes = Column(Integer, nullable=False, default=0)
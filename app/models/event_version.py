@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 from datetime import datetime
@@ -15,5 +15,7 @@ class EventVersion(Base):
     location = Column(String)
     is_recurring = Column(Boolean)
     recurrence_pattern = Column(String)
-    updated_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # monthly partition key on Postgres
     updated_by = Column(Integer, ForeignKey("users.id"))
+
+    __table_args__ = (Index("ix_event_versions_event_id_updated_at", "event_id", "updated_at"),)
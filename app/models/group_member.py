@@ -0,0 +1,10 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from app.db.database import Base
+
+class GroupMember(Base):
+    __tablename__ = "group_members"
+
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True)  # groups of a user
+    added_at = Column(DateTime, default=datetime.utcnow, nullable=False)
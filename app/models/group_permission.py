@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, ForeignKey, String, Index, UniqueConstraint
+from app.db.database import Base
+
+class EventGroupPermission(Base):
+    __tablename__ = "event_group_permissions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False)
+    group_id = Column(Integer, nullable=False)  # no foreign key: groups live on the primary, grants on the event's shard
+    role = Column(String, nullable=False)  # viewer, editor
+
+    __table_args__ = (
+        UniqueConstraint("event_id", "group_id", name="_event_group_uc"),
+        Index("ix_event_group_permissions_group_id_event_id", "group_id", "event_id"),
+    )
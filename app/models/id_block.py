@@ -0,0 +1,8 @@
+from sqlalchemy import Column, String, BigInteger
+from app.db.database import Base
+
+class IdBlock(Base):
+    __tablename__ = "id_blocks"
+
+    name = Column(String(64), primary_key=True)  # table whose ids are handed out, e.g. 'events'
+    next_id = Column(BigInteger, nullable=False)  # first id not yet given to any worker
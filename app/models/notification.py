@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, String, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.database import Base
@@ -8,10 +8,16 @@ class Notification(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    event_id = Column(Integer, ForeignKey("events.id"))
+    group_id = Column(Integer, nullable=True)  # set instead of user_id for one notification shown to every member of a group
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="SET NULL"), index=True)
     message = Column(String, nullable=False)
     seen = Column(Boolean, default=False)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)  # monthly partition key on Postgres
 
     user = relationship("User")
     event = relationship("Event")
+
+    __table_args__ = (
+        Index("ix_notifications_user_id_timestamp", "user_id", "timestamp"),
+        Index("ix_notifications_group_id_timestamp", "group_id", "timestamp"),
+    )
@@ -0,0 +1,14 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from app.db.database import Base
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    jti_hash = Column(String(64), primary_key=True)  # SHA-256 of the token's jti; the token itself is never stored
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    session_id = Column(String(32), nullable=False, index=True)  # shared by every rotation of one login (device)
+    device = Column(String(255), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=True)  # set when rotated, logged out or revoked
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, String, DateTime
+from app.db.database import Base
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String, primary_key=True)  # one row per singleton job, e.g. 'reminders'
+    holder = Column(String, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
@@ -0,0 +1,11 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, DateTime
+from app.db.database import Base
+
+class SentReminder(Base):
+    __tablename__ = "sent_reminders"
+
+    event_id = Column(Integer, primary_key=True, autoincrement=False)  # no foreign key: pruned by occurrence instead
+    occurrence = Column(DateTime, primary_key=True)  # start of the occurrence reminded about
+    lead_minutes = Column(Integer, primary_key=True, autoincrement=False)
+    sent_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,11 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from app.db.database import Base
+
+class ShardDirectory(Base):
+    __tablename__ = "shard_directory"
+
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    shard = Column(String(64), nullable=False)  # overrides the hash ring placement of this owner's events
+    frozen = Column(Boolean, nullable=False, default=False)  # set while the owner is being moved; writes are refused
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -11,4 +11,3 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     role = Column(String, default="viewer")  # viewer/editor/owner
-    refresh_token = Column(String, nullable=True)
@@ -1,18 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Body
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from app.schemas.user import UserCreate, UserOut
+from typing import List
+from app.schemas.user import UserCreate, UserOut, SessionOut
 from app.models.user import User
 from app.core.security import (
-    get_password_hash, create_access_token, create_refresh_token,
-    verify_password, verify_token, get_current_user
+    get_password_hash, create_access_token,
+    verify_password, verify_token, get_current_user, oauth2_scheme
 )
+from app.services import refresh_tokens
 from app.db.database import SessionLocal, get_db
+from app.core.profiling import ProfiledRoute
 from datetime import timedelta
 
-router = APIRouter()
-
-REFRESH_TOKEN_EXPIRE_DAYS = 7
+router = APIRouter(route_class=ProfiledRoute)
 
 
 def get_db():
@@ -47,7 +48,7 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = db.query(User).filter(
         (User.username == form_data.username) | (User.email == form_data.username)
     ).first()
@@ -55,12 +56,10 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-    access_token = create_access_token(data={"sub": str(user.id), "role": user.role})
-    refresh_token = create_refresh_token(data={"sub": str(user.id)})
-    user.refresh_token = refresh_token
-    db.add(user)
+    # Every login is a separate session (device) with its own rotating refresh token
+    refresh_token, session_id = refresh_tokens.issue(db, user.id, user.role, device=request.headers.get("User-Agent"))
     db.commit()
-
+    access_token = create_access_token(data={"sub": str(user.id), "role": user.role, "sid": session_id})
 
     return {
         "access_token": access_token,
@@ -76,12 +75,46 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 
 
 @router.post("/logout")
-def logout(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
-    current_user.refresh_token = None
+def logout(token: str = Depends(oauth2_scheme), current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+    session_id = (verify_token(token) or {}).get("sid")
+    if session_id:
+        refresh_tokens.revoke_session(db, current_user.id, session_id)
+    else:
+        refresh_tokens.revoke_user(db, current_user.id)
     db.commit()
     return {"message": f"User '{current_user.username}' logged out successfully."}
 
 
+@router.post("/logout-all")
+def logout_all(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+    revoked = refresh_tokens.revoke_user(db, current_user.id)
+    db.commit()
+    return {"message": f"Signed out of {revoked} session(s)."}
+
+
+@router.get("/sessions", response_model=List[SessionOut])
+def list_sessions(token: str = Depends(oauth2_scheme), current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+    current_session = (verify_token(token) or {}).get("sid")
+    return [
+        SessionOut(
+            session_id=row.session_id,
+            device=row.device,
+            last_refreshed_at=row.created_at,
+            expires_at=row.expires_at,
+            current=row.session_id == current_session,
+        )
+        for row in refresh_tokens.active_sessions(db, current_user.id)
+    ]
+
+
+@router.delete("/sessions/{session_id}")
+def revoke_session(session_id: str, current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+    if not refresh_tokens.revoke_session(db, current_user.id, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    db.commit()
+    return {"message": "Session revoked"}
+
+
 @router.post("/refresh")
 def refresh_token(request: Request, db: Session = Depends(get_db)):
     auth_header = request.headers.get("Authorization")
@@ -89,19 +122,12 @@ def refresh_token(request: Request, db: Session = Depends(get_db)):
         raise HTTPException(status_code=401, detail="Missing refresh token")
 
     token = auth_header.split(" ")[1]
-    payload = verify_token(token)
-
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid refresh token")
-
-    user_id = int(payload.get("sub"))
-    user = db.query(User).filter_by(id=user_id).first()
-
-    print("TOKEN SENT IN HEADER:\n", token)
-    print("TOKEN STORED IN DATABASE:\n", user.refresh_token)
-
-    if not user or user.refresh_token != token:
-        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
-
-    new_access_token = create_access_token(data={"sub": user.id})
-    return {"access_token": new_access_token, "token_type": "bearer"}
+    try:
+        # One primary-key lookup on refresh_tokens; the users row is not touched
+        claims, new_refresh_token = refresh_tokens.rotate(db, token)
+    except refresh_tokens.RefreshTokenError as exc:
+        raise HTTPException(status_code=401, detail=str(exc))
+
+    access_claims = {key: claims[key] for key in ("sub", "role", "sid") if key in claims}
+    new_access_token = create_access_token(data=access_claims)
+    return {"access_token": new_access_token, "refresh_token": new_refresh_token, "token_type": "bearer"}
@@ -1,52 +1,349 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
-
-from app.schemas.event import EventCreate, EventOut, EventUpdate
-from app.schemas.permission import ShareRequest, SharedUserOut
-from app.schemas.event_version import EventVersionOut
-
+import heapq
+from datetime import date, datetime, timedelta
+from operator import attrgetter
+from types import SimpleNamespace
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import and_, delete, insert, null, or_, union_all, update
+from sqlalchemy.orm import Session, load_only
+
+from app.schemas.event import EventBatchUpdate, EventCreate, EventDetailOut, EventFieldsOut, EventIds, EventOut, EventShift, EventSyncOut, EventUpdate
+from app.schemas.permission import ShareRequest, SharedGroupOut, SharedUserOut
+from app.schemas.event_version import EventVersionFieldsOut, EventVersionOut
+from app.schemas.calendar import CalendarBucket
+
+from app.models.archived_event import ArchivedEvent
 from app.models.event import Event
+from app.models.group import Group
+from app.models.group_member import GroupMember
+from app.models.group_permission import EventGroupPermission
 from app.models.permission import EventPermission
 from app.models.user import User
 from app.models.event_version import EventVersion
-from app.models.notification import Notification
 
-from app.db.database import SessionLocal
+from app.db.database import SessionLocal, pipeline
+from app.db.replicas import last_writes
+from app.db.shards import event_session, owner_session, shard_router
 from app.core.security import get_current_user
+from app.core.profiling import ProfiledRoute
+from app.core.cache import response_cache
+from app.core.metrics import NOTIFICATIONS_SENT
+from app.services.archive import archived_grants, archived_role, archived_versions, reaches_cold, rehydrate, visible_archived
+from app.services.calendar import add_to_rollups, apply_rollup_changes, calendar_buckets, merge_buckets, remove_from_rollups, snapshot
+from app.services.groups import event_groups, group_member_ids, group_role, member_groups, shared_event_ids, strongest
+from app.services.notifications import notify_users, queue_notifications
+from app.services.sync import decode_token, encode_token, groups_digest, latest_change, read_changes, record_changes, record_many, settled_before, token_expired
+
+router = APIRouter(route_class=ProfiledRoute)
+
+# Clock skew tolerated between the worker that created an event and the one versioning it
+VERSION_PRUNE_SLACK = timedelta(hours=1)
+
+# Longest range accepted by the calendar view
+CALENDAR_MAX_DAYS = 366
+
+# Largest number of events one batch update, delete or shift may touch
+BATCH_MAX_EVENTS = 500
+
+# Sections the event detail view can embed
+DETAIL_SECTIONS = ("permissions", "changelog", "latest_diff")
+
+# Fields list endpoints can return (`fields=`); descriptions are unbounded text,
+# so they are only loaded when asked for
+EVENT_FIELDS = tuple(EventFieldsOut.model_fields)
+VERSION_FIELDS = tuple(EventVersionFieldsOut.model_fields)
+DEFAULT_EVENT_FIELDS = tuple(field for field in EVENT_FIELDS if field != "description")
+DEFAULT_VERSION_FIELDS = tuple(field for field in VERSION_FIELDS if field != "description")
+
+# Serializers for cached responses
+event_adapter = TypeAdapter(EventOut)
+event_detail_adapter = TypeAdapter(EventDetailOut)
+event_list_adapter = TypeAdapter(list[EventOut])
+event_fields_adapter = TypeAdapter(list[EventFieldsOut])
+version_fields_adapter = TypeAdapter(list[EventVersionFieldsOut])
+calendar_adapter = TypeAdapter(list[CalendarBucket])
+
+def get_db(request: Request, current_user=Depends(get_current_user)):
+    # The shard holding the caller's own events; without sharding, GET requests
+    # read from a replica unless the user was just affected by a write
+    yield from owner_session(request.method, current_user)
+
+def get_event_db(event_id: int, request: Request, current_user=Depends(get_current_user)):
+    # The shard holding the event in the path, whoever owns it
+    yield from event_session(event_id, request.method, current_user)
+
+def event_versions(db, event):
+    """
+    Query the versions of an event. Versions never predate the event itself,
+    so bounding on created_at lets Postgres prune older monthly partitions.
+    """
+    query = db.query(EventVersion).filter(EventVersion.event_id == event.id)
+    if event.created_at:
+        query = query.filter(EventVersion.updated_at >= event.created_at - VERSION_PRUNE_SLACK)
+    return query
+
+def version_history(db, event, limit: Optional[int] = None, fields=None) -> list:
+    """Versions of a hot or archived event, newest first; only `fields` are loaded from the hot table, if given."""
+    if isinstance(event, ArchivedEvent):
+        return archived_versions(event)[:limit]
+    versions = event_versions(db, event).order_by(EventVersion.updated_at.desc())
+    if fields:
+        versions = versions.options(load_only(*(getattr(EventVersion, field) for field in fields)))
+    return versions.limit(limit).all() if limit else versions.all()
+
+def find_version(db, event, version_id: int):
+    if isinstance(event, ArchivedEvent):
+        return next((version for version in archived_versions(event) if version.id == version_id), None)
+    return event_versions(db, event).filter(EventVersion.id == version_id).first()
+
+def load_event(db, event_id: int, user_id: int):
+    """
+    (event, strongest role of `user_id` if it is shared with them directly or
+    through a group, owner plus shared users, groups it is shared with) with
+    one query; (None, None, set(), set()) if there is no such event. Archived
+    events are rehydrated, in the caller's transaction.
+    """
+    grants = union_all(
+        db.query(EventPermission.event_id, EventPermission.user_id, null().label("group_id"), EventPermission.role)
+        .filter(EventPermission.event_id == event_id).statement,
+        db.query(EventGroupPermission.event_id, null(), EventGroupPermission.group_id, EventGroupPermission.role)
+        .filter(EventGroupPermission.event_id == event_id).statement,
+    ).subquery()
+    rows = db.query(Event, grants.c.user_id, grants.c.group_id, grants.c.role).outerjoin(
+        grants, grants.c.event_id == Event.id
+    ).filter(Event.id == event_id).all()
+    if not rows:
+        # Write paths load events through here: an archived event is brought back first
+        if rehydrate(db, [event_id]):
+            return load_event(db, event_id, user_id)
+        return None, None, set(), set()
+    event = rows[0][0]
+    audience = {event.owner_id} | {shared_id for _, shared_id, _, _ in rows if shared_id is not None}
+    groups = {group_id for _, _, group_id, _ in rows if group_id is not None}
+    mine = set(member_groups(user_id)) if groups else set()
+    role = strongest(role for _, shared_id, group_id, role in rows if shared_id == user_id or group_id in mine)
+    return event, role, audience, groups
+
+def writable_event(db, event_id: int):
+    """The event, rehydrated first if it was archived; None if there is no such event."""
+    event = db.query(Event).filter_by(id=event_id).first()
+    if event is None and rehydrate(db, [event_id]):
+        event = db.query(Event).filter_by(id=event_id).first()
+    return event
 
-router = APIRouter()
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-def notify_event_participants(db, event_id: int, message: str):
-    user_ids = db.query(EventPermission.user_id).filter_by(event_id=event_id).all()
-    for (user_id,) in user_ids:
-        db.add(Notification(user_id=user_id, event_id=event_id, message=message))
-    db.commit()
+def find_event(db, event_id: int):
+    """The event for reading: the cold tier is only queried when it is not hot."""
+    return db.query(Event).filter_by(id=event_id).first() or db.get(ArchivedEvent, event_id)
+
+def can_view(db, event, user_id: int) -> bool:
+    """Whether `user_id` owns `event` or it is shared with them, directly or through a group."""
+    if event.owner_id == user_id:
+        return True
+    if isinstance(event, ArchivedEvent):
+        return archived_role(db, event, user_id) is not None
+    if db.query(EventPermission.id).filter_by(event_id=event.id, user_id=user_id).first():
+        return True
+    return group_role(db, event.id, user_id) is not None
+
+def record_version(db, event, user_id: int) -> None:
+    """Queue a version holding the event's current fields, without reading anything back."""
+    row = {"event_id": event.id, "updated_by": user_id, **{k: getattr(event, k) for k in EventUpdate.__annotations__}}
+    db.execute(insert(EventVersion).values(**shard_router.assign_ids(EventVersion, [row])[0]).inline())
+
+def write_event(db, event, audience: set, fields: dict, user_id: int, message: str, groups: set = frozenset()) -> None:
+    """
+    Version the event, overwrite `fields`, move it in the rollups, notify the
+    shared users and groups and commit: one transaction whose statements only
+    write, so on psycopg 3 they reach the server in a single round trip.
+    """
+    with pipeline(db):
+        record_version(db, event, user_id)
+        db.execute(update(Event).where(Event.id == event.id).values(**fields).execution_options(synchronize_session=False))
+        apply_rollup_changes(db, removed=[(event, audience)], added=[(SimpleNamespace(**{**vars(snapshot(event)), **fields}), audience)])
+        record_changes(db, event.id, audience, groups)
+        sent = queue_notifications(db, audience - {event.owner_id}, message, event.id, groups)
+        db.commit()
+    NOTIFICATIONS_SENT.inc(sent)
+
+def invalidate_users(user_ids, group_ids=()) -> None:
+    """
+    Drop the cached views of `user_ids` and of every member of `group_ids`,
+    and pin all of them to the primary for their next reads, so a lagging
+    replica cannot put the old view back into the cache.
+    """
+    user_ids = set(user_ids)
+    response_cache.invalidate_users(user_ids)
+    if group_ids:
+        response_cache.invalidate_groups(set(group_ids))
+        user_ids |= group_member_ids(group_ids)
+    last_writes.record(user_ids)
+
+def cache_key(namespace: str, user_id: int, **params) -> str:
+    """Response cache key covering the user's own generation and those of their groups."""
+    return response_cache.key(namespace, user_id, groups=member_groups(user_id), **params)
+
+def json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+def parse_fields(fields: Optional[str], allowed, default) -> tuple:
+    """The fields named in a comma-separated `fields=` parameter ("*" for all), in `allowed` order; `id` is always included."""
+    if fields is None:
+        return default
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    if "*" in requested:
+        return tuple(allowed)
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {sorted(unknown)}; choose from {list(allowed)}")
+    return tuple(field for field in allowed if field == "id" or field in requested)
+
+def dump_fields(adapter, rows, fields) -> bytes:
+    """Serialize only `fields` of each row, never touching (and lazy-loading) the deferred ones."""
+    return adapter.dump_json(adapter.validate_python([{field: getattr(row, field) for field in fields} for row in rows]), exclude_unset=True)
+
+def load_batch(db, ids, user_id: int, allow_editors: bool) -> list:
+    """
+    Lock and return the events `ids`, in order, with one query (two when some
+    are archived and get rehydrated). All or nothing: raises unless every
+    event exists and the caller may modify it.
+    """
+    if not ids or len(ids) > BATCH_MAX_EVENTS:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {BATCH_MAX_EVENTS} events")
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Duplicate event ids")
+
+    def lock():
+        return db.query(Event, EventPermission.role).outerjoin(
+            EventPermission, and_(EventPermission.event_id == Event.id, EventPermission.user_id == user_id)
+        ).filter(Event.id.in_(ids)).with_for_update(of=Event).all()
+
+    rows = lock()
+    if len(rows) < len(ids) and rehydrate(db, set(ids) - {event.id for event, _ in rows}):
+        rows = lock()  # archived events are brought back before they are modified
+    found = {event.id: (event, role) for event, role in rows}
+    if allow_editors and member_groups(user_id):
+        group_editor = {event_id for (event_id,) in db.query(EventGroupPermission.event_id).filter(
+            EventGroupPermission.event_id.in_(ids), EventGroupPermission.group_id.in_(member_groups(user_id)), EventGroupPermission.role == "editor"
+        )}
+        found = {event_id: (event, "editor" if event_id in group_editor else role) for event_id, (event, role) in found.items()}
+
+    missing = [event_id for event_id in ids if event_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Events not found: {missing}")
+    denied = [
+        event_id for event_id in ids
+        if found[event_id][0].owner_id != user_id and not (allow_editors and found[event_id][1] == "editor")
+    ]
+    if denied:
+        raise HTTPException(status_code=403, detail=f"Not allowed to modify events: {denied}")
+    return [found[event_id][0] for event_id in ids]
+
+def batch_audiences(db, events) -> dict:
+    """Event id -> owner plus shared users, for many events in one query."""
+    audiences = {event.id: {event.owner_id} for event in events}
+    for event_id, user_id in db.query(EventPermission.event_id, EventPermission.user_id).filter(EventPermission.event_id.in_(audiences)):
+        audiences[event_id].add(user_id)
+    return audiences
+
+def visible_events(db, user_id: int):
+    """Events `user_id` owns or that are shared with them, directly or through a group."""
+    owned_events = db.query(Event).filter(Event.owner_id == user_id)
+    return db.query(Event).filter(Event.id.in_(shared_event_ids(db, user_id).union_all(owned_events.with_entities(Event.id))))
+
+def merge_by_id(pages) -> list:
+    """Merge per-shard event lists sorted by id, keeping one copy of an event caught mid-move on two shards."""
+    merged = []
+    for event in heapq.merge(*pages, key=attrgetter("id")):
+        if not merged or merged[-1].id != event.id:
+            merged.append(event)
+    return merged
+
+def find_conflict(db, user_id: int, intervals, exclude_ids):
+    """
+    First event of `user_id` outside `exclude_ids` overlapping any of the
+    (start, end) `intervals`, in one query per shard: shared events live on
+    their owners' shards.
+    """
+    if not intervals:
+        return None
+    overlapping = lambda model: or_(*[and_(model.start_time < end, model.end_time > start) for start, end in intervals])
+    # Only intervals starting before the archive cutoff can hit archived events
+    cold = reaches_cold(min(start for start, _ in intervals))
+
+    def first_conflict(session):
+        conflict = session.query(Event).filter(
+            Event.id.notin_(exclude_ids),
+            overlapping(Event),
+            or_(Event.owner_id == user_id, Event.id.in_(shared_event_ids(session, user_id)))
+        ).first()
+        if conflict is None and cold:
+            conflict = visible_archived(session, user_id).filter(ArchivedEvent.id.notin_(exclude_ids), overlapping(ArchivedEvent)).first()
+        return conflict
+
+    conflicts = shard_router.fan_out(first_conflict, db)
+    return next((conflict for conflict in conflicts if conflict is not None), None)
+
+def check_shareable_groups(group_ids, user_id: int) -> None:
+    """Raise unless every group exists and `user_id` owns or belongs to it; read on the primary, where groups live."""
+    if not group_ids:
+        return
+    with SessionLocal() as primary:
+        found = {group_id: owner_id for group_id, owner_id in primary.query(Group.id, Group.owner_id).filter(Group.id.in_(group_ids))}
+        missing = [group_id for group_id in group_ids if group_id not in found]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Groups not found: {missing}")
+        member_of = {group_id for (group_id,) in primary.query(GroupMember.group_id).filter(GroupMember.group_id.in_(group_ids), GroupMember.user_id == user_id)}
+    denied = [group_id for group_id in group_ids if found[group_id] != user_id and group_id not in member_of]
+    if denied:
+        raise HTTPException(status_code=403, detail=f"Not allowed to share with groups: {denied}")
+
+def apply_batch(db, events, changes: dict, current_user, message: str) -> list:
+    """
+    Apply `changes` (event id -> {field: value}) to `events` in the current
+    transaction: one multi-row version insert, one rollup upsert, and one
+    notification per participant, committed together.
+    """
+    db.execute(insert(EventVersion), shard_router.assign_ids(EventVersion, [
+        {"event_id": event.id, "updated_by": current_user.id, **{k: getattr(event, k) for k in EventUpdate.__annotations__}}
+        for event in events
+    ]))
+
+    audiences = batch_audiences(db, events)
+    previous = {event.id: snapshot(event) for event in events}
+    for event in events:
+        for key, value in changes[event.id].items():
+            setattr(event, key, value)
+    apply_rollup_changes(
+        db,
+        removed=[(previous[event.id], audiences[event.id]) for event in events],
+        added=[(event, audiences[event.id]) for event in events],
+    )
+    groups = event_groups(db, audiences)
+    record_many(db, audiences.items(), groups.items())
+
+    # Serialized before the commit expires them, to avoid reloading each event
+    updated = event_list_adapter.validate_python(events, from_attributes=True)
+    participants = set().union(*(audiences[event.id] - {event.owner_id} for event in events))
+    group_ids = set().union(*groups.values())
+    notify_users(db, participants, message, event_id=events[0].id if len(events) == 1 else None, group_ids=group_ids)
+    invalidate_users(set().union(*audiences.values()), group_ids)
+    return updated
 
 @router.post("/events", response_model=EventOut)
 def create_event(event: EventCreate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    conflict = db.query(Event).filter(
-        Event.id != None,
-        Event.start_time < event.end_time,
-        Event.end_time > event.start_time,
-        or_(Event.owner_id == current_user.id,
-            Event.id.in_(db.query(EventPermission.event_id).filter(EventPermission.user_id == current_user.id)))
-    ).first()
-
-    if conflict:
+    if find_conflict(db, current_user.id, [(event.start_time, event.end_time)], []):
         raise HTTPException(status_code=400, detail="Conflicting event exists in this time range")
 
     new_event = Event(**event.dict(), owner_id=current_user.id)
     db.add(new_event)
+    db.flush()
+    add_to_rollups(db, new_event, [current_user.id])
+    record_changes(db, new_event.id, [current_user.id])
     db.commit()
     db.refresh(new_event)
+    invalidate_users([current_user.id])
     return new_event
 
 @router.post("/events/batch")
@@ -56,142 +353,419 @@ def batch_create_events(events: list[EventCreate], db: Session = Depends(get_db)
         new_event = Event(**e.dict(), owner_id=current_user.id)
         db.add(new_event)
         db.flush()
+        add_to_rollups(db, new_event, [current_user.id])
         created.append(new_event)
+    record_many(db, [(new_event.id, [current_user.id]) for new_event in created])
     db.commit()
+    invalidate_users([current_user.id])
     return created
 
-@router.get("/events", response_model=list[EventOut])
-def get_events(skip: int = Query(0, ge=0), limit: int = Query(10, le=100), db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    owned_events = db.query(Event).filter(Event.owner_id == current_user.id)
-    shared_event_ids = db.query(EventPermission.event_id).filter(EventPermission.user_id == current_user.id)
-    events = db.query(Event).filter(Event.id.in_(shared_event_ids.union_all(owned_events.with_entities(Event.id)))).offset(skip).limit(limit).all()
-    return events
+@router.patch("/events/batch", response_model=list[EventOut])
+def batch_update_events(updates: list[EventBatchUpdate], db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    events = load_batch(db, [item.id for item in updates], current_user.id, allow_editors=True)
+    changes = {item.id: item.dict(exclude_unset=True, exclude={"id"}) for item in updates}
+    if any(change.get(field, "") is None for change in changes.values() for field in ("title", "start_time", "end_time")):
+        raise HTTPException(status_code=400, detail="title, start_time and end_time cannot be null")
+
+    # Only events whose times change need a conflict check, against everything
+    # else the user sees and against the rest of the batch
+    batch_times = {event.id: (changes[event.id].get("start_time", event.start_time), changes[event.id].get("end_time", event.end_time)) for event in events}
+    moved = [event.id for event in events if {"start_time", "end_time"} & changes[event.id].keys()]
+    for event_id in moved:
+        start, end = batch_times[event_id]
+        for other_id, (other_start, other_end) in batch_times.items():
+            if other_id != event_id and start < other_end and end > other_start:
+                raise HTTPException(status_code=400, detail=f"Events {event_id} and {other_id} would overlap")
+    conflict = find_conflict(db, current_user.id, [batch_times[event_id] for event_id in moved], list(batch_times))
+    if conflict:
+        raise HTTPException(status_code=400, detail=f"Conflicting event {conflict.id} exists during this time")
+
+    return apply_batch(db, events, changes, current_user, f"Events you are part of have been updated ({len(events)} in this batch).")
+
+@router.post("/events/batch/shift", response_model=list[EventOut])
+def shift_events(request: EventShift, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    events = load_batch(db, request.ids, current_user.id, allow_editors=True)
+    delta = timedelta(minutes=request.delta_minutes)
+    changes = {event.id: {"start_time": event.start_time + delta, "end_time": event.end_time + delta} for event in events}
+
+    # Moving together keeps the batch's own spacing, so only other events can conflict
+    if delta:
+        conflict = find_conflict(db, current_user.id, [(c["start_time"], c["end_time"]) for c in changes.values()], request.ids)
+        if conflict:
+            raise HTTPException(status_code=400, detail=f"Conflicting event {conflict.id} exists during this time")
+
+    return apply_batch(db, events, changes, current_user, f"Events you are part of have been moved by {request.delta_minutes} minutes ({len(events)} in this batch).")
+
+@router.delete("/events/batch")
+def batch_delete_events(request: EventIds, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    events = load_batch(db, request.ids, current_user.id, allow_editors=False)
+    audiences = batch_audiences(db, events)
+    groups = event_groups(db, audiences)
+    apply_rollup_changes(db, removed=[(event, audiences[event.id]) for event in events])
+    record_many(db, audiences.items(), groups.items())
+
+    db.query(EventPermission).filter(EventPermission.event_id.in_(request.ids)).delete(synchronize_session=False)
+    db.query(EventGroupPermission).filter(EventGroupPermission.event_id.in_(request.ids)).delete(synchronize_session=False)
+    versions = db.query(EventVersion).filter(EventVersion.event_id.in_(request.ids))
+    created = [event.created_at for event in events if event.created_at]
+    if len(created) == len(events):
+        # Same partition pruning bound as event_versions()
+        versions = versions.filter(EventVersion.updated_at >= min(created) - VERSION_PRUNE_SLACK)
+    versions.delete(synchronize_session=False)
+    db.query(Event).filter(Event.id.in_(request.ids)).delete(synchronize_session=False)
+
+    participants = set().union(*(audiences[event.id] - {event.owner_id} for event in events))
+    group_ids = set().union(*groups.values())
+    notify_users(db, participants, f"Events you were part of have been deleted ({len(events)} in this batch).", group_ids=group_ids)
+    invalidate_users(set().union(*audiences.values()), group_ids)
+    return {"message": f"{len(events)} events deleted", "deleted": request.ids}
+
+@router.get("/events", response_model=list[EventFieldsOut])
+def get_events(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, le=100),
+    include_archived: bool = Query(False, description="Also list events moved to the archive"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or * for all; default: all but description"),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    fields = parse_fields(fields, EVENT_FIELDS, DEFAULT_EVENT_FIELDS)
+    key = cache_key("events", current_user.id, skip=skip, limit=limit, include_archived=include_archived, fields=",".join(fields))
+    body = response_cache.get(key)
+    if body is None:
+        hot_columns = load_only(*(getattr(Event, field) for field in fields))
+        if shard_router.enabled or include_archived:
+            # Each shard (and tier) returns its first skip + limit events by id; the merged page is cut from those
+            def first_events(session):
+                hot = visible_events(session, current_user.id).options(hot_columns).order_by(Event.id).limit(skip + limit).all()
+                if not include_archived:
+                    return hot
+                # Also keeps the compressed version history of archived events unread
+                cold_columns = load_only(*(getattr(ArchivedEvent, field) for field in fields))
+                return merge_by_id([hot, visible_archived(session, current_user.id).options(cold_columns).order_by(ArchivedEvent.id).limit(skip + limit).all()])
+            events = merge_by_id(shard_router.fan_out(first_events, db))[skip:skip + limit]
+        else:
+            events = visible_events(db, current_user.id).options(hot_columns).order_by(Event.id).offset(skip).limit(limit).all()
+        body = dump_fields(event_fields_adapter, events, fields)
+        response_cache.set(key, body)
+    return json_response(body)
+
+@router.get("/events/calendar", response_model=list[CalendarBucket])
+def get_calendar(start: date, end: date, bucket: Literal["day", "week", "month"] = "day", db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    if end < start or (end - start).days >= CALENDAR_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"end must be on or after start and within {CALENDAR_MAX_DAYS} days")
+    key = cache_key("calendar", current_user.id, start=start, end=end, bucket=bucket)
+    body = response_cache.get(key)
+    if body is None:
+        # Rollups and recurring events are per shard, so the shards' buckets add up
+        buckets = merge_buckets(shard_router.fan_out(lambda session: calendar_buckets(session, current_user.id, start, end, bucket), db))
+        body = calendar_adapter.dump_json(calendar_adapter.validate_python(buckets))
+        response_cache.set(key, body)
+    return json_response(body)
+
+@router.get("/events/sync", response_model=EventSyncOut)
+def sync_events(token: Optional[str] = Query(None, description="Token returned by the previous sync; omit for a full download"), db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    """
+    What changed for the current user since `token`: events created, updated
+    or shared with them, and the ids of events deleted or unshared. Without a
+    token, with one older than the change log's retention, or after the
+    user joined or left a group, every visible event is returned instead
+    (`full`).
+    """
+    now = datetime.utcnow()
+    names = [shard.name for shard in shard_router.shards]
+    group_ids = member_groups(current_user.id)
+    cursors = None
+    if token:
+        try:
+            cursors, pending_since, digest = decode_token(token)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        # Issued for another set of shards, compaction may have removed changes it has not seen,
+        # or the user's groups changed and the log has no rows for what that made (in)visible
+        if sorted(cursors) != sorted(names) or token_expired(pending_since, now) or digest != groups_digest(group_ids):
+            cursors = None
+
+    if cursors is None:
+        # The cursor is read first: a change committed after it is sent again next time
+        pages = shard_router.fan_out(lambda session: (
+            latest_change(session, current_user.id, group_ids, now),
+            visible_events(session, current_user.id).order_by(Event.id).all(),
+        ), db)
+        return {
+            "events": merge_by_id([events for _, events in pages]),
+            "deleted": [],
+            "token": encode_token({name: cursor for name, (cursor, _) in zip(names, pages)}, settled_before(now), group_ids),
+            "full": True,
+            "more": False,
+        }
+
+    def changes(session):
+        # Unsharded, `session` may be bound to a replica; the only cursor is then the first
+        shard = shard_router.shard_of(session) or shard_router.shards[0]
+        return read_changes(session, current_user.id, group_ids, cursors[shard.name], now)
+
+    reads = shard_router.fan_out(changes, db)
+    changed = set().union(*(event_ids for event_ids, _, _, _ in reads))
+    events = []
+    if changed:
+        # A moved event's older changes are on its previous shard, so visibility is checked on all of them
+        events = merge_by_id(shard_router.fan_out(
+            lambda session: visible_events(session, current_user.id).filter(Event.id.in_(changed)).order_by(Event.id).all(), db
+        ))
+    return {
+        "events": events,
+        "deleted": sorted(changed - {event.id for event in events}),
+        "token": encode_token({name: cursor for name, (_, cursor, _, _) in zip(names, reads)}, min(pending for _, _, pending, _ in reads), group_ids),
+        "full": False,
+        "more": any(more for _, _, _, more in reads),
+    }
 
 @router.get("/events/{event_id}", response_model=EventOut)
-def get_event_by_id(event_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    event = db.query(Event).filter_by(id=event_id).first()
-    if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
-    if event.owner_id != current_user.id and not db.query(EventPermission).filter_by(event_id=event_id, user_id=current_user.id).first():
-        raise HTTPException(status_code=403, detail="Access denied")
-    return event
+def get_event_by_id(event_id: int, db: Session = Depends(get_event_db), current_user=Depends(get_current_user)):
+    key = cache_key("event", current_user.id, event_id=event_id)
+    body = response_cache.get(key)
+    if body is None:
+        event = find_event(db, event_id)
+        if not event:
+            raise HTTPException(status_code=404, detail="Event not found")
+        if not can_view(db, event, current_user.id):
+            raise HTTPException(status_code=403, detail="Access denied")
+        body = event_adapter.dump_json(event_adapter.validate_python(event, from_attributes=True))
+        response_cache.set(key, body)
+    return json_response(body)
+
+@router.get("/events/{event_id}/detail", response_model=EventDetailOut)
+def get_event_detail(event_id: int, include: str = Query("", description="Comma-separated: permissions, changelog, latest_diff"), db: Session = Depends(get_event_db), current_user=Depends(get_current_user)):
+    """
+    The event plus the requested sections in one response, with a single
+    access check and at most three queries. `latest_diff` compares the most
+    recent version with the current event, i.e. what the last edit changed.
+    """
+    sections = sorted({name.strip() for name in include.split(",") if name.strip()})
+    unknown = set(sections) - set(DETAIL_SECTIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(sorted(unknown))}")
+
+    key = cache_key("event_detail", current_user.id, event_id=event_id, include=sections)
+    body = response_cache.get(key)
+    if body is None:
+        # The event and the caller's share of it in one query
+        row = db.query(Event, EventPermission.role).outerjoin(
+            EventPermission, and_(EventPermission.event_id == Event.id, EventPermission.user_id == current_user.id)
+        ).filter(Event.id == event_id).first()
+        if row:
+            event, role = row
+            if event.owner_id == current_user.id:
+                role = "owner"
+            else:
+                role = strongest([role, group_role(db, event_id, current_user.id)])
+        else:
+            # Not hot: fall through to the archive
+            event = db.get(ArchivedEvent, event_id)
+            if not event:
+                raise HTTPException(status_code=404, detail="Event not found")
+            role = archived_role(db, event, current_user.id)
+        if role is None:
+            raise HTTPException(status_code=403, detail="Access denied")
+
+        detail = {"event": event, "role": role}
+        if "permissions" in sections and role == "owner":
+            detail["permissions"] = archived_grants(db, event_id) if not row else db.query(EventPermission).filter_by(event_id=event_id).all()
+        if "changelog" in sections or "latest_diff" in sections:
+            versions = version_history(db, event, limit=None if "changelog" in sections else 1)
+            if "changelog" in sections:
+                detail["changelog"] = versions
+            if "latest_diff" in sections and versions:
+                latest = versions[0]
+                detail["latest_diff"] = {
+                    "version_id": latest.id,
+                    "diff": {field: {"v1": getattr(latest, field), "v2": getattr(event, field)}
+                             for field in EventUpdate.__annotations__ if getattr(latest, field) != getattr(event, field)},
+                }
+        body = event_detail_adapter.dump_json(event_detail_adapter.validate_python(detail, from_attributes=True))
+        response_cache.set(key, body)
+    return json_response(body)
 
 @router.put("/events/{event_id}")
-def update_event(event_id: int, updated_data: EventUpdate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    event = db.query(Event).filter_by(id=event_id).first()
+def update_event(event_id: int, updated_data: EventUpdate, db: Session = Depends(get_event_db), current_user=Depends(get_current_user)):
+    event, role, audience, groups = load_event(db, event_id, current_user.id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
 
-    if event.owner_id != current_user.id:
-        if not db.query(EventPermission).filter_by(event_id=event_id, user_id=current_user.id, role="editor").first():
-            raise HTTPException(status_code=403, detail="Not allowed to update this event")
-
-    conflict = db.query(Event).filter(
-        Event.id != event.id,
-        Event.start_time < updated_data.end_time,
-        Event.end_time > updated_data.start_time,
-        or_(Event.owner_id == current_user.id,
-            Event.id.in_(db.query(EventPermission.event_id).filter(EventPermission.user_id == current_user.id)))
-    ).first()
+    if event.owner_id != current_user.id and role != "editor":
+        raise HTTPException(status_code=403, detail="Not allowed to update this event")
 
-    if conflict:
+    if find_conflict(db, current_user.id, [(updated_data.start_time, updated_data.end_time)], [event.id]):
         raise HTTPException(status_code=400, detail="Conflicting event exists during this time")
 
-    version = EventVersion(event_id=event.id, updated_by=current_user.id, **{k: getattr(event, k) for k in EventUpdate.__annotations__})
-    db.add(version)
-
-    for key, value in updated_data.dict().items():
-        setattr(event, key, value)
-
-    db.commit()
-    notify_event_participants(db, event_id, "Event has been updated.")
+    write_event(db, event, audience, updated_data.dict(), current_user.id, "Event has been updated.", groups)
+    invalidate_users(audience, groups)
     return {"message": "Event updated and version saved"}
 
 @router.delete("/events/{event_id}")
-def delete_event(event_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    event = db.query(Event).filter_by(id=event_id).first()
+def delete_event(event_id: int, db: Session = Depends(get_event_db), current_user=Depends(get_current_user)):
+    event, _, audience, groups = load_event(db, event_id, current_user.id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     if event.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Only owner can delete this event")
 
-    notify_event_participants(db, event_id, "An event you were part of has been deleted.")
-
-    db.query(EventPermission).filter_by(event_id=event_id).delete()
-    db.query(EventVersion).filter_by(event_id=event_id).delete()
-    db.delete(event)
-    db.commit()
+    # Write-only statements, sent in one round trip on psycopg 3
+    with pipeline(db):
+        sent = queue_notifications(db, audience - {event.owner_id}, "An event you were part of has been deleted.", event_id, groups)
+        remove_from_rollups(db, event, audience)
+        record_changes(db, event_id, audience, groups)
+        db.execute(delete(EventPermission).where(EventPermission.event_id == event_id))
+        db.execute(delete(EventGroupPermission).where(EventGroupPermission.event_id == event_id))
+        event_versions(db, event).delete(synchronize_session=False)
+        db.execute(delete(Event).where(Event.id == event_id).execution_options(synchronize_session=False))
+        db.commit()
+    NOTIFICATIONS_SENT.inc(sent)
+    invalidate_users(audience, groups)
     return {"message": f"Event {event_id} deleted"}
 
 @router.post("/events/{event_id}/share")
-def share_event(event_id: int, request: ShareRequest, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    event = db.query(Event).filter_by(id=event_id).first()
+def share_event(event_id: int, request: ShareRequest, db: Session = Depends(get_event_db), current_user=Depends(get_current_user)):
+    event, _, audience, groups = load_event(db, event_id, current_user.id)
     if not event or event.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to share this event")
 
-    for user in request.users:
-        if user.user_id == current_user.id:
-            continue
-        existing = db.query(EventPermission).filter_by(event_id=event_id, user_id=user.user_id).first()
-        if existing:
-            existing.role = user.role
-        else:
-            db.add(EventPermission(event_id=event_id, user_id=user.user_id, role=user.role))
-
-    db.commit()
-    notify_event_participants(db, event_id, "You have been granted access to an event.")
+    roles = {user.user_id: user.role for user in request.users if user.user_id != current_user.id}
+    added = [user_id for user_id in roles if user_id not in audience]
+    shard_router.ensure_users(db, added)
+    group_roles = {group.group_id: group.role for group in request.groups}
+    check_shareable_groups(group_roles, current_user.id)
+    added_groups = [group_id for group_id in group_roles if group_id not in groups]
+
+    # Write-only statements, sent in one round trip on psycopg 3
+    with pipeline(db):
+        for role in set(roles.values()):
+            changed = [user_id for user_id, new_role in roles.items() if new_role == role and user_id in audience]
+            if changed:
+                db.execute(update(EventPermission).where(EventPermission.event_id == event_id, EventPermission.user_id.in_(changed)).values(role=role))
+        if added:
+            db.execute(insert(EventPermission).values(shard_router.assign_ids(EventPermission, [
+                {"event_id": event_id, "user_id": user_id, "role": roles[user_id]} for user_id in added
+            ])))
+        for role in set(group_roles.values()):
+            changed = [group_id for group_id, new_role in group_roles.items() if new_role == role and group_id in groups]
+            if changed:
+                db.execute(update(EventGroupPermission).where(EventGroupPermission.event_id == event_id, EventGroupPermission.group_id.in_(changed)).values(role=role))
+        if added_groups:
+            db.execute(insert(EventGroupPermission).values(shard_router.assign_ids(EventGroupPermission, [
+                {"event_id": event_id, "group_id": group_id, "role": group_roles[group_id]} for group_id in added_groups
+            ])))
+        add_to_rollups(db, event, added)
+        record_changes(db, event_id, roles, group_roles)
+        audience |= set(added)
+        groups |= set(added_groups)
+        sent = queue_notifications(db, audience - {event.owner_id}, "You have been granted access to an event.", event_id, groups)
+        db.commit()
+    NOTIFICATIONS_SENT.inc(sent)
+    invalidate_users(audience, groups)
     return {"message": "Event shared successfully"}
 
 @router.get("/events/{event_id}/permissions", response_model=list[SharedUserOut])
-def list_permissions(event_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    event = db.query(Event).filter_by(id=event_id).first()
+def list_permissions(event_id: int, db: Session = Depends(get_event_db), current_user=Depends(get_current_user)):
+    event = find_event(db, event_id)
     if not event or event.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
+    if isinstance(event, ArchivedEvent):
+        return archived_grants(db, event_id)
     return db.query(EventPermission).filter_by(event_id=event_id).all()
 
 @router.put("/events/{event_id}/permissions/{user_id}")
-def update_permission(event_id: int, user_id: int, new_role: SharedUserOut, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    event = db.query(Event).filter_by(id=event_id).first()
+def update_permission(event_id: int, user_id: int, new_role: SharedUserOut, db: Session = Depends(get_event_db), current_user=Depends(get_current_user)):
+    event = writable_event(db, event_id)
     if not event or event.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     permission = db.query(EventPermission).filter_by(event_id=event_id, user_id=user_id).first()
     if not permission:
         raise HTTPException(status_code=404, detail="Permission not found")
     permission.role = new_role.role
+    record_changes(db, event_id, [user_id])
     db.commit()
+    invalidate_users([event.owner_id, user_id])
     return {"message": "Permission updated"}
 
 @router.delete("/events/{event_id}/permissions/{user_id}")
-def delete_permission(event_id: int, user_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    event = db.query(Event).filter_by(id=event_id).first()
+def delete_permission(event_id: int, user_id: int, db: Session = Depends(get_event_db), current_user=Depends(get_current_user)):
+    event = writable_event(db, event_id)
     if not event or event.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     permission = db.query(EventPermission).filter_by(event_id=event_id, user_id=user_id).first()
     if not permission:
         raise HTTPException(status_code=404, detail="Permission not found")
     db.delete(permission)
+    remove_from_rollups(db, event, [user_id])
+    record_changes(db, event_id, [user_id])
     db.commit()
+    invalidate_users([event.owner_id, user_id])
     return {"message": "Access removed"}
 
-@router.get("/events/{event_id}/changelog", response_model=list[EventVersionOut])
-def get_changelog(event_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    event = db.query(Event).filter_by(id=event_id).first()
+@router.get("/events/{event_id}/groups", response_model=list[SharedGroupOut])
+def list_group_permissions(event_id: int, db: Session = Depends(get_event_db), current_user=Depends(get_current_user)):
+    event = find_event(db, event_id)
+    if not event or event.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if isinstance(event, ArchivedEvent):
+        return archived_grants(db, event_id, groups=True)
+    return db.query(EventGroupPermission).filter_by(event_id=event_id).all()
+
+@router.put("/events/{event_id}/groups/{group_id}")
+def update_group_permission(event_id: int, group_id: int, new_role: SharedGroupOut, db: Session = Depends(get_event_db), current_user=Depends(get_current_user)):
+    event = writable_event(db, event_id)
+    if not event or event.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    permission = db.query(EventGroupPermission).filter_by(event_id=event_id, group_id=group_id).first()
+    if not permission:
+        raise HTTPException(status_code=404, detail="Permission not found")
+    permission.role = new_role.role
+    record_changes(db, event_id, [], [group_id])
+    db.commit()
+    invalidate_users([event.owner_id], [group_id])
+    return {"message": "Permission updated"}
+
+@router.delete("/events/{event_id}/groups/{group_id}")
+def delete_group_permission(event_id: int, group_id: int, db: Session = Depends(get_event_db), current_user=Depends(get_current_user)):
+    event = writable_event(db, event_id)
+    if not event or event.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    permission = db.query(EventGroupPermission).filter_by(event_id=event_id, group_id=group_id).first()
+    if not permission:
+        raise HTTPException(status_code=404, detail="Permission not found")
+    db.delete(permission)
+    record_changes(db, event_id, [], [group_id])
+    db.commit()
+    invalidate_users([event.owner_id], [group_id])
+    return {"message": "Access removed"}
+
+@router.get("/events/{event_id}/changelog", response_model=list[EventVersionFieldsOut])
+def get_changelog(
+    event_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or * for all; default: all but description"),
+    db: Session = Depends(get_event_db),
+    current_user=Depends(get_current_user)
+):
+    fields = parse_fields(fields, VERSION_FIELDS, DEFAULT_VERSION_FIELDS)
+    event = find_event(db, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
-    if event.owner_id != current_user.id and not db.query(EventPermission).filter_by(event_id=event_id, user_id=current_user.id).first():
+    if not can_view(db, event, current_user.id):
         raise HTTPException(status_code=403, detail="Not allowed to view changelog")
-    return db.query(EventVersion).filter_by(event_id=event_id).order_by(EventVersion.updated_at.desc()).all()
+    return json_response(dump_fields(version_fields_adapter, version_history(db, event, fields=fields), fields))
 
 @router.get("/events/{event_id}/diff/{v1}/{v2}")
-def get_diff(event_id: int, v1: int, v2: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    event = db.query(Event).filter_by(id=event_id).first()
+def get_diff(event_id: int, v1: int, v2: int, db: Session = Depends(get_event_db), current_user=Depends(get_current_user)):
+    event = find_event(db, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
-    if event.owner_id != current_user.id and not db.query(EventPermission).filter_by(event_id=event_id, user_id=current_user.id).first():
+    if not can_view(db, event, current_user.id):
         raise HTTPException(status_code=403, detail="Not allowed to view diff")
 
-    ver1 = db.query(EventVersion).filter_by(id=v1, event_id=event_id).first()
-    ver2 = db.query(EventVersion).filter_by(id=v2, event_id=event_id).first()
+    ver1 = find_version(db, event, v1)
+    ver2 = find_version(db, event, v2)
 
     if not ver1 or not ver2:
         raise HTTPException(status_code=404, detail="One or both versions not found")
@@ -201,35 +775,31 @@ def get_diff(event_id: int, v1: int, v2: int, db: Session = Depends(get_db), cur
     return {"diff": diffs}
 
 @router.post("/events/{event_id}/rollback/{version_id}")
-def rollback_event(event_id: int, version_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    event = db.query(Event).filter_by(id=event_id).first()
+def rollback_event(event_id: int, version_id: int, db: Session = Depends(get_event_db), current_user=Depends(get_current_user)):
+    event, _, audience, groups = load_event(db, event_id, current_user.id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     if event.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Only owner can rollback")
 
-    version = db.query(EventVersion).filter_by(id=version_id, event_id=event_id).first()
+    version = event_versions(db, event).filter(EventVersion.id == version_id).first()
     if not version:
         raise HTTPException(status_code=404, detail="Version not found")
 
-    db.add(EventVersion(event_id=event.id, updated_by=current_user.id, **{k: getattr(event, k) for k in EventUpdate.__annotations__}))
-
-    for field in EventUpdate.__annotations__:
-        setattr(event, field, getattr(version, field))
-
-    db.commit()
-    notify_event_participants(db, event_id, f"Event was rolled back to version {version_id}.")
+    restored = {field: getattr(version, field) for field in EventUpdate.__annotations__}
+    write_event(db, event, audience, restored, current_user.id, f"Event was rolled back to version {version_id}.", groups)
+    invalidate_users(audience, groups)
     return {"message": f"Rolled back to version {version_id}"}
 
 @router.get("/events/{event_id}/history/{version_id}", response_model=EventVersionOut)
-def get_event_version_by_id(event_id: int, version_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    event = db.query(Event).filter_by(id=event_id).first()
+def get_event_version_by_id(event_id: int, version_id: int, db: Session = Depends(get_event_db), current_user=Depends(get_current_user)):
+    event = find_event(db, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
-    if event.owner_id != current_user.id and not db.query(EventPermission).filter_by(event_id=event_id, user_id=current_user.id).first():
+    if not can_view(db, event, current_user.id):
         raise HTTPException(status_code=403, detail="Not allowed to view history")
 
-    version = db.query(EventVersion).filter_by(id=version_id, event_id=event_id).first()
+    version = find_version(db, event, version_id)
     if not version:
         raise HTTPException(status_code=404, detail="Version not found")
     return version
\ No newline at end of file
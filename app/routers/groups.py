@@ -0,0 +1,124 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+# Database & Security
+from app.db.database import get_db
+from app.db.shards import shard_router
+from app.core.security import get_current_user
+from app.core.profiling import ProfiledRoute
+from app.core.cache import response_cache
+
+# Models
+from app.models.archived_event_grant import ArchivedEventGrant
+from app.models.group import Group
+from app.models.group_member import GroupMember
+from app.models.group_permission import EventGroupPermission
+from app.models.user import User
+
+from app.schemas.group import GroupCreate, GroupMembers, GroupOut
+from app.services.groups import member_groups, memberships
+
+router = APIRouter(route_class=ProfiledRoute)
+
+def membership_changed(user_ids) -> None:
+    """
+    Re-read the groups of `user_ids` on their next request here and drop their
+    cached views. Other workers pick the change up within GROUP_CACHE_TTL.
+    """
+    user_ids = set(user_ids)
+    memberships.forget(user_ids)
+    response_cache.invalidate_users(user_ids)
+
+def check_users(db, user_ids) -> None:
+    found = {user_id for (user_id,) in db.query(User.id).filter(User.id.in_(user_ids))}
+    missing = sorted(set(user_ids) - found)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Users not found: {missing}")
+
+def owned_group(db, group_id: int, user_id: int) -> Group:
+    group = db.get(Group, group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+    if group.owner_id != user_id:
+        raise HTTPException(status_code=403, detail="Only the group owner can manage it")
+    return group
+
+# Create a group; the owner is always a member
+@router.post("/groups", response_model=GroupOut)
+def create_group(group: GroupCreate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    members = set(group.members) | {current_user.id}
+    check_users(db, members)
+    new_group = Group(name=group.name, owner_id=current_user.id)
+    db.add(new_group)
+    db.flush()
+    db.add_all([GroupMember(group_id=new_group.id, user_id=user_id) for user_id in sorted(members)])
+    db.commit()
+    db.refresh(new_group)
+    membership_changed(members)
+    return new_group
+
+# Groups the current user owns or belongs to
+@router.get("/groups", response_model=list[GroupOut])
+def list_groups(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    group_ids = member_groups(current_user.id)
+    mine = Group.owner_id == current_user.id
+    if group_ids:
+        mine = or_(mine, Group.id.in_(group_ids))
+    return db.query(Group).filter(mine).order_by(Group.id).all()
+
+@router.get("/groups/{group_id}/members", response_model=GroupMembers)
+def list_members(group_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    group = db.get(Group, group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+    user_ids = [user_id for (user_id,) in db.query(GroupMember.user_id).filter(GroupMember.group_id == group_id).order_by(GroupMember.user_id)]
+    if group.owner_id != current_user.id and current_user.id not in user_ids:
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+    return {"user_ids": user_ids}
+
+@router.post("/groups/{group_id}/members", response_model=GroupMembers)
+def add_members(group_id: int, request: GroupMembers, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    owned_group(db, group_id, current_user.id)
+    check_users(db, request.user_ids)
+    existing = {user_id for (user_id,) in db.query(GroupMember.user_id).filter(GroupMember.group_id == group_id, GroupMember.user_id.in_(request.user_ids))}
+    added = sorted(set(request.user_ids) - existing)
+    db.add_all([GroupMember(group_id=group_id, user_id=user_id) for user_id in added])
+    db.commit()
+    membership_changed(added)
+    return {"user_ids": added}
+
+# The owner removes anyone but themselves; members may remove themselves
+@router.delete("/groups/{group_id}/members/{user_id}")
+def remove_member(group_id: int, user_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    group = db.get(Group, group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+    if user_id == group.owner_id:
+        raise HTTPException(status_code=400, detail="The owner cannot leave the group; delete it instead")
+    if current_user.id not in (group.owner_id, user_id):
+        raise HTTPException(status_code=403, detail="Only the group owner can remove other members")
+    if not db.query(GroupMember).filter_by(group_id=group_id, user_id=user_id).delete(synchronize_session=False):
+        raise HTTPException(status_code=404, detail="Member not found")
+    db.commit()
+    membership_changed([user_id])
+    return {"message": "Member removed"}
+
+@router.delete("/groups/{group_id}")
+def delete_group(group_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    owned_group(db, group_id, current_user.id)
+    members = [user_id for (user_id,) in db.query(GroupMember.user_id).filter(GroupMember.group_id == group_id)]
+
+    def revoke(session):
+        # Grants live on the shards of the events; removed before the group, so a failed delete can be retried
+        removed = session.query(EventGroupPermission).filter(EventGroupPermission.group_id == group_id).delete(synchronize_session=False)
+        session.query(ArchivedEventGrant).filter(ArchivedEventGrant.group_id == group_id).delete(synchronize_session=False)
+        session.commit()
+        return removed
+
+    revoked = sum(shard_router.fan_out(revoke))
+    db.query(GroupMember).filter(GroupMember.group_id == group_id).delete(synchronize_session=False)
+    db.query(Group).filter(Group.id == group_id).delete(synchronize_session=False)
+    db.commit()
+    membership_changed(members)
+    return {"message": f"Group {group_id} deleted", "revoked_events": revoked}
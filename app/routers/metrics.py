@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+
+from app.core.metrics import render_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text exposition, aggregated across all worker processes."""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
@@ -1,38 +1,50 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.db.database import get_db
-from app.models.notification import Notification
-from app.core.security import get_current_user
+import heapq
+from datetime import datetime, timedelta
+from operator import attrgetter
+from typing import Optional
 
-router = APIRouter()
-
-@router.get("/notifications")
-def get_notifications(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    return db.query(Notification).filter_by(user_id=current_user.id).order_by(Notification.timestamp.desc()).all()
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
 # Database & Security
-from app.db.database import get_db
+from app.db.replicas import get_read_db
+from app.db.shards import shard_router
 from app.core.security import get_current_user
+from app.core.profiling import ProfiledRoute
 
 # Models
 from app.models.notification import Notification
 
-router = APIRouter()
+from app.services.groups import member_groups
+
+router = APIRouter(route_class=ProfiledRoute)
 
 # Retrieve notifications for the current user, ordered by most recent
 @router.get("/notifications")
 def get_notifications(
-    db: Session = Depends(get_db),
+    days: Optional[int] = Query(None, ge=1, le=366),
+    db: Session = Depends(get_read_db),
     current_user=Depends(get_current_user)
 ):
     """
-    Fetch a list of notifications for the current user, ordered by timestamp descending.
+    Fetch a list of notifications for the current user, ordered by timestamp
+    descending. With `days`, only the last `days` days are read, which keeps the
+    query on the most recent monthly partitions.
     """
-    return (
-        db.query(Notification)
-        .filter_by(user_id=current_user.id)
+    # Notifications to a group are stored once and shown to every member
+    group_ids = member_groups(current_user.id)
+    recipient = Notification.user_id == current_user.id
+    if group_ids:
+        recipient = or_(recipient, Notification.group_id.in_(group_ids))
+    filters = [recipient]
+    if days is not None:
+        filters.append(Notification.timestamp >= datetime.utcnow() - timedelta(days=days))
+    # Notifications are stored next to their event, on the event owner's shard
+    pages = shard_router.fan_out(lambda session: (
+        session.query(Notification)
+        .filter(*filters)
         .order_by(Notification.timestamp.desc())
         .all()
-    )
+    ), db)
+    return pages[0] if len(pages) == 1 else list(heapq.merge(*pages, key=attrgetter("timestamp"), reverse=True))
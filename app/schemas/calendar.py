@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+from datetime import date
+
+class CalendarBucket(BaseModel):
+    start: date
+    event_count: int
+    busy_minutes: int
@@ -1,7 +1,10 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
+from app.schemas.event_version import EventVersionOut
+from app.schemas.permission import SharedUserOut
+
 class EventCreate(BaseModel):
     title: str
     description: Optional[str] = None
@@ -18,6 +21,25 @@ class EventOut(EventCreate):
     class Config:
         from_attributes = True
 
+class EventFieldsOut(BaseModel):
+    """An event trimmed to the requested `fields`; fields not asked for are left out."""
+    id: int
+    owner_id: Optional[int] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    location: Optional[str] = None
+    is_recurring: Optional[bool] = None
+    recurrence_pattern: Optional[str] = None
+
+class EventSyncOut(BaseModel):
+    events: List[EventOut]  # created, updated or newly shared since the token
+    deleted: List[int]  # ids deleted or no longer shared since the token
+    token: str  # pass back on the next sync
+    full: bool  # `events` is everything the user can see; drop anything else stored locally
+    more: bool  # more changes are waiting; sync again right away
+
 class EventUpdate(BaseModel):
     title: Optional[str]
     description: Optional[str]
@@ -26,3 +48,30 @@ class EventUpdate(BaseModel):
     location: Optional[str]
     is_recurring: Optional[bool]
     recurrence_pattern: Optional[str]
+
+class EventBatchUpdate(BaseModel):
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    location: Optional[str] = None
+    is_recurring: Optional[bool] = None
+    recurrence_pattern: Optional[str] = None
+
+class EventIds(BaseModel):
+    ids: List[int]
+
+class EventShift(EventIds):
+    delta_minutes: int  # negative moves the events earlier
+
+class LatestDiffOut(BaseModel):
+    version_id: int  # the version the event was changed from
+    diff: Dict[str, Dict[str, Any]]
+
+class EventDetailOut(BaseModel):
+    event: EventOut
+    role: str  # owner / editor / viewer, for the current user
+    permissions: Optional[List[SharedUserOut]] = None  # owner only
+    changelog: Optional[List[EventVersionOut]] = None
+    latest_diff: Optional[LatestDiffOut] = None
@@ -1,18 +1,33 @@
 from pydantic import BaseModel
+from typing import Optional
 from datetime import datetime
 
 class EventVersionOut(BaseModel):
     id: int
     event_id: int
-    title: str
-    description: str
-    start_time: datetime
-    end_time: datetime
-    location: str
-    is_recurring: bool
-    recurrence_pattern: str
+    title: Optional[str] = None
+    description: Optional[str] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    location: Optional[str] = None
+    is_recurring: Optional[bool] = None
+    recurrence_pattern: Optional[str] = None
     updated_at: datetime
-    updated_by: int
+    updated_by: Optional[int] = None
 
     class Config:
         from_attributes = True
+
+class EventVersionFieldsOut(BaseModel):
+    """A version trimmed to the requested `fields`; fields not asked for are left out."""
+    id: int
+    event_id: Optional[int] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    location: Optional[str] = None
+    is_recurring: Optional[bool] = None
+    recurrence_pattern: Optional[str] = None
+    updated_at: Optional[datetime] = None
+    updated_by: Optional[int] = None
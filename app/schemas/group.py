@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel
+
+class GroupCreate(BaseModel):
+    name: str
+    members: List[int] = []
+
+class GroupOut(BaseModel):
+    id: int
+    name: str
+    owner_id: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class GroupMembers(BaseModel):
+    user_ids: List[int]
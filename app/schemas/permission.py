@@ -13,5 +13,18 @@ class SharedUserOut(BaseModel):
         from_attributes = True
 
 
+class ShareGroup(BaseModel):
+    group_id: int
+    role: str  # viewer / editor
+
+class SharedGroupOut(BaseModel):
+    group_id: int
+    role: str
+
+    class Config:
+        from_attributes = True
+
+
 class ShareRequest(BaseModel):
-    users: List[ShareUser]
+    users: List[ShareUser] = []
+    groups: List[ShareGroup] = []
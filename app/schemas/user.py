@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import Optional
+
 from pydantic import BaseModel, EmailStr
 
 class UserCreate(BaseModel):
@@ -15,3 +18,10 @@ class UserOut(BaseModel):
     class Config:
         from_attributes = True
 
+
+class SessionOut(BaseModel):
+    session_id: str
+    device: Optional[str] = None
+    last_refreshed_at: datetime
+    expires_at: datetime
+    current: bool = False
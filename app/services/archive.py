@@ -0,0 +1,245 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from operator import attrgetter
+from types import SimpleNamespace
+from typing import Iterable, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import DateTime, delete, insert, or_
+
+from app.db.shards import shard_router
+from app.models.archived_event import ArchivedEvent
+from app.models.archived_event_grant import ArchivedEventGrant
+from app.models.event import Event
+from app.models.event_version import EventVersion
+from app.models.group_permission import EventGroupPermission
+from app.models.permission import EventPermission
+from app.models.user import User  # noqa: F401  (resolves relationship("User") when run standalone)
+from app.services.groups import member_groups, strongest
+from app.services.partitions import ensure_partitions_for, month_start
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Non-recurring events that ended more than this many days ago move to the cold tier.
+# Reads only look there for windows starting before the cutoff, so do not raise it
+# while older settings' events are still archived
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 365))
+# Run the mover inside the API workers; otherwise run `python -m app.services.archive move` from cron
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "false").lower() == "true"
+ARCHIVE_INTERVAL_MINUTES = float(os.getenv("ARCHIVE_INTERVAL_MINUTES", 60))
+# Events moved per transaction
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 500))
+
+EVENT_COLUMNS = [column.key for column in Event.__table__.columns]
+VERSION_COLUMNS = [column.key for column in EventVersion.__table__.columns]
+VERSION_DATETIMES = {column.key for column in EventVersion.__table__.columns if isinstance(column.type, DateTime)}
+
+
+def archive_cutoff(now: Optional[datetime] = None) -> datetime:
+    """Events ending before this are candidates for the cold tier."""
+    return (now or datetime.utcnow()) - timedelta(days=ARCHIVE_AFTER_DAYS)
+
+
+def reaches_cold(start: datetime, now: Optional[datetime] = None) -> bool:
+    """Whether a time window starting at `start` may contain archived events."""
+    return start < archive_cutoff(now)
+
+
+def _pack(versions) -> Optional[bytes]:
+    if not versions:
+        return None
+    rows = [
+        {key: value.isoformat() if isinstance(value, datetime) else value for key, value in ((key, getattr(version, key)) for key in VERSION_COLUMNS)}
+        for version in versions
+    ]
+    return zlib.compress(json.dumps(rows, separators=(",", ":")).encode())
+
+
+def _unpack(blob: Optional[bytes]) -> List[dict]:
+    if not blob:
+        return []
+    rows = json.loads(zlib.decompress(blob))
+    for row in rows:
+        for key in VERSION_DATETIMES:
+            if row.get(key) is not None:
+                row[key] = datetime.fromisoformat(row[key])
+    return rows
+
+
+def archived_versions(event: ArchivedEvent) -> List[SimpleNamespace]:
+    """Versions stored with an archived event, newest first."""
+    return sorted((SimpleNamespace(**row) for row in _unpack(event.versions)), key=attrgetter("updated_at"), reverse=True)
+
+
+def _granted_to(user_id: int):
+    group_ids = member_groups(user_id)
+    if not group_ids:
+        return ArchivedEventGrant.user_id == user_id
+    return or_(ArchivedEventGrant.user_id == user_id, ArchivedEventGrant.group_id.in_(group_ids))
+
+
+def visible_archived(db, user_id: int):
+    """Archived events `user_id` owns or that were shared with them, directly or through a group."""
+    shared = db.query(ArchivedEventGrant.event_id).filter(_granted_to(user_id))
+    return db.query(ArchivedEvent).filter(or_(ArchivedEvent.owner_id == user_id, ArchivedEvent.id.in_(shared)))
+
+
+def archived_role(db, event: ArchivedEvent, user_id: int) -> Optional[str]:
+    """'owner', the strongest role shared with `user_id`, or None if they cannot see it."""
+    if event.owner_id == user_id:
+        return "owner"
+    return strongest(role for (role,) in db.query(ArchivedEventGrant.role).filter(ArchivedEventGrant.event_id == event.id, _granted_to(user_id)))
+
+
+def archived_grants(db, event_id: int, groups: bool = False) -> list:
+    """The user (or, with `groups`, group) permissions an event had when it was archived."""
+    column = ArchivedEventGrant.group_id if groups else ArchivedEventGrant.user_id
+    return db.query(ArchivedEventGrant).filter(ArchivedEventGrant.event_id == event_id, column.isnot(None)).all()
+
+
+def archive_events(db, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Move up to `batch_size` non-recurring events that ended before `cutoff`,
+    with their permissions and versions, to the cold tables and commit.
+    Rows locked by a running request are skipped until the next pass.
+    Rollups are left alone: archived events still count in calendars.
+    Returns the number of events moved.
+    """
+    events = db.query(Event).filter(Event.end_time < cutoff, Event.is_recurring.isnot(True)).order_by(Event.id).limit(batch_size).with_for_update(skip_locked=True).all()
+    if not events:
+        return 0
+    ids = [event.id for event in events]
+    versions = defaultdict(list)
+    for version in db.query(EventVersion).filter(EventVersion.event_id.in_(ids)):
+        versions[version.event_id].append(version)
+    grants = [
+        {"event_id": event_id, "user_id": user_id, "group_id": None, "role": role}
+        for event_id, user_id, role in db.query(EventPermission.event_id, EventPermission.user_id, EventPermission.role).filter(EventPermission.event_id.in_(ids))
+    ] + [
+        {"event_id": event_id, "user_id": None, "group_id": group_id, "role": role}
+        for event_id, group_id, role in db.query(EventGroupPermission.event_id, EventGroupPermission.group_id, EventGroupPermission.role).filter(EventGroupPermission.event_id.in_(ids))
+    ]
+
+    now = datetime.utcnow()
+    db.execute(insert(ArchivedEvent), [
+        {**{key: getattr(event, key) for key in EVENT_COLUMNS}, "archived_at": now, "versions": _pack(versions[event.id])}
+        for event in events
+    ])
+    if grants:
+        db.execute(insert(ArchivedEventGrant), grants)
+    db.execute(delete(EventVersion).where(EventVersion.event_id.in_(ids)))
+    db.execute(delete(EventPermission).where(EventPermission.event_id.in_(ids)))
+    db.execute(delete(EventGroupPermission).where(EventGroupPermission.event_id.in_(ids)))
+    db.execute(delete(Event).where(Event.id.in_(ids)).execution_options(synchronize_session=False))
+    db.commit()
+    return len(events)
+
+
+def archive_all(db, now: Optional[datetime] = None) -> int:
+    """Run `archive_events` until nothing is left to move. Returns the number of events moved."""
+    cutoff = archive_cutoff(now)
+    moved = 0
+    while True:
+        count = archive_events(db, cutoff)
+        moved += count
+        if count < ARCHIVE_BATCH_SIZE:
+            return moved
+
+
+def rehydrate(db, event_ids: Iterable[int]) -> List[int]:
+    """
+    Move archived events back into the hot tables, with their original ids,
+    permissions and versions, in the caller's transaction (nothing is
+    committed). Returns the ids found in the archive; [] for hot or unknown ids.
+    """
+    archived = db.query(ArchivedEvent).filter(ArchivedEvent.id.in_(list(event_ids))).with_for_update().all()
+    if not archived:
+        return []
+    ids = [event.id for event in archived]
+    grants = db.query(ArchivedEventGrant).filter(ArchivedEventGrant.event_id.in_(ids)).all()
+    versions = [row for event in archived for row in _unpack(event.versions)]
+    ensure_partitions_for(db.get_bind(), EventVersion.__tablename__, {month_start(row["updated_at"]) for row in versions})
+
+    db.execute(insert(Event), [{key: getattr(event, key) for key in EVENT_COLUMNS} for event in archived])
+    permissions = [{"event_id": grant.event_id, "user_id": grant.user_id, "role": grant.role} for grant in grants if grant.user_id is not None]
+    if permissions:
+        db.execute(insert(EventPermission), shard_router.assign_ids(EventPermission, permissions))
+    group_grants = [{"event_id": grant.event_id, "group_id": grant.group_id, "role": grant.role} for grant in grants if grant.group_id is not None]
+    if group_grants:
+        db.execute(insert(EventGroupPermission), shard_router.assign_ids(EventGroupPermission, group_grants))
+    if versions:
+        db.execute(insert(EventVersion), versions)
+    db.execute(delete(ArchivedEventGrant).where(ArchivedEventGrant.event_id.in_(ids)))
+    db.execute(delete(ArchivedEvent).where(ArchivedEvent.id.in_(ids)).execution_options(synchronize_session=False))
+    logger.info("Rehydrated archived events %s", ids)
+    return ids
+
+
+class ArchiveMover:
+    """
+    Moves old events to the cold tier on every shard every
+    `ARCHIVE_INTERVAL_MINUTES`. Several workers may run it at once: each
+    batch locks its rows with SKIP LOCKED, so they never move the same event.
+    """
+
+    def __init__(self, interval_minutes: float = ARCHIVE_INTERVAL_MINUTES):
+        self.interval = interval_minutes * 60
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="archive-mover", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            for shard in shard_router.shards:
+                try:
+                    with shard.session() as db:
+                        moved = archive_all(db)
+                    if moved:
+                        logger.info("%s: archived %d events", shard.name, moved)
+                except Exception:
+                    logger.exception("Archiving events on %s failed", shard.name)
+
+
+archive_mover = ArchiveMover()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Move old events to the archive tables, or bring them back.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("move", help="archive events that ended more than ARCHIVE_AFTER_DAYS ago")
+    back = sub.add_parser("rehydrate", help="move archived events back to the events table")
+    back.add_argument("event_ids", type=int, nargs="+")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    for shard in shard_router.shards:
+        with shard.session() as db:
+            if args.command == "move":
+                logger.info("%s: archived %d events that ended before %s", shard.name, archive_all(db), archive_cutoff())
+            else:
+                restored = rehydrate(db, args.event_ids)
+                db.commit()
+                if restored:
+                    logger.info("%s: rehydrated %s", shard.name, restored)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,522 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from passlib.context import CryptContext
+from sqlalchemy import Boolean, DateTime, Integer, delete, func, insert, or_, select, text, update
+
+from app.db.database import engine
+from app.db.shards import SHARDED_MODELS, shard_router
+from app.models.event import Event
+from app.models.event_version import EventVersion
+from app.models.permission import EventPermission
+from app.models.user import User
+from app.services.calendar import rebuild_rollups
+from app.services.partitions import ensure_partitions_for, month_start
+
+logger = logging.getLogger(__name__)
+
+# Load order respects the foreign keys
+MODELS = {"users": User, "events": Event, "permissions": EventPermission, "versions": EventVersion}
+REFERENCES = {
+    "events": {"owner_id": "users"},
+    "permissions": {"event_id": "events", "user_id": "users"},
+    "versions": {"event_id": "events", "updated_by": "users"},
+}
+# Columns naming users each table's rows need on their shard
+USER_COLUMNS = {"events": ("owner_id",), "permissions": ("user_id",), "versions": ("updated_by",)}
+DEFAULTS = {
+    "users": {"role": "viewer", "is_active": True},
+    "events": {"is_recurring": False},
+    "permissions": {},
+    "versions": {},
+}
+CHUNK_SIZE = 5000
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class BulkImportError(Exception):
+    """Invalid input, or input that does not match the interrupted import being resumed."""
+
+
+# Reading
+
+def read_records(path: str) -> Iterator[Tuple[int, dict]]:
+    """Yield (line number, record) from a CSV or NDJSON file."""
+    with open(path, newline="", encoding="utf-8") as handle:
+        if path.endswith((".ndjson", ".jsonl")):
+            for line_no, line in enumerate(handle, 1):
+                if line.strip():
+                    try:
+                        yield line_no, json.loads(line)
+                    except ValueError as exc:
+                        raise BulkImportError(f"{path}:{line_no}: {exc}")
+        else:
+            reader = csv.DictReader(handle)
+            for record in reader:
+                # Empty CSV cells are NULL
+                yield reader.line_num, {key: (value if value != "" else None) for key, value in record.items()}
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _convert(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, Boolean):
+        return value if isinstance(value, bool) else str(value).strip().lower() in ("1", "true", "t", "yes")
+    if isinstance(column.type, Integer):
+        return int(value)
+    if isinstance(column.type, DateTime):
+        moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        # Stored as naive UTC, like the rest of the app
+        return moment.astimezone(timezone.utc).replace(tzinfo=None) if moment.tzinfo else moment
+    return str(value)
+
+
+class TablePlan:
+    """One input file: its checksum, row count, reserved id block and source id map."""
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.table = MODELS[name].__table__
+        self.sha256 = file_sha256(path)
+        self.rows = 0
+        self.source_ids: Dict[int, int] = {}  # source id -> row ordinal
+        self.months = set()  # partition months touched (versions only)
+        self.first_versions: Dict[int, datetime] = {}  # source event id -> earliest version time (versions only)
+        self.owners: Dict[int, int] = {}  # source event id -> source owner id (events only)
+        self._located: Dict[int, int] = {}  # existing event id -> owner id, for rows routed to shards
+        for line_no, record in read_records(path):
+            try:
+                if name in ("users", "events"):
+                    if record.get("id") is None:
+                        raise BulkImportError("missing id")
+                    source_id = int(record["id"])
+                    if source_id in self.source_ids:
+                        raise BulkImportError(f"duplicate id {source_id}")
+                    self.source_ids[source_id] = self.rows
+                    if name == "events" and record.get("owner_id") is not None:
+                        self.owners[source_id] = int(record["owner_id"])
+                if name == "versions" and record.get("updated_at"):
+                    updated_at = _convert(self.table.c.updated_at, record["updated_at"])
+                    self.months.add(month_start(updated_at))
+                    if record.get("event_id") is not None:
+                        event_id = int(record["event_id"])
+                        self.first_versions[event_id] = min(updated_at, self.first_versions.get(event_id, updated_at))
+            except (BulkImportError, ValueError, TypeError) as exc:
+                raise BulkImportError(f"{path}:{line_no}: {exc}")
+            self.rows += 1
+        self.id_base: Optional[int] = None
+
+    def new_id(self, source_id: int) -> Optional[int]:
+        ordinal = self.source_ids.get(source_id)
+        return None if ordinal is None else self.id_base + ordinal
+
+    def event_owner(self, plans: Dict[str, "TablePlan"], source_event_id: int, event_id: int) -> int:
+        """Owner id of the event a permission or version row belongs to, which decides its shard."""
+        events = plans.get("events")
+        if events is not None and source_event_id in events.owners:
+            owner_id = events.owners[source_event_id]
+            return plans["users"].new_id(owner_id) if "users" in plans else owner_id
+        if event_id not in self._located:
+            located = shard_router.locate(event_id)
+            if located is None:
+                raise BulkImportError(f"unknown events id {source_event_id}")
+            self._located[event_id] = located[1]
+        return self._located[event_id]
+
+    def chunks(self, plans: Dict[str, "TablePlan"], chunk_size: int, now: datetime) -> Iterator[Tuple[int, List[dict]]]:
+        """Yield (chunk index, rows ready to insert) with ids assigned and references mapped."""
+        columns = [column for column in self.table.c if column.name != "id"]
+        references = REFERENCES.get(self.name, {})
+        first_versions = plans["versions"].first_versions if "versions" in plans else {}
+        rows = []
+        for ordinal, (line_no, record) in enumerate(read_records(self.path)):
+            try:
+                row = {"id": self.id_base + ordinal}
+                for column in columns:
+                    value = record.get(column.name)
+                    row[column.name] = _convert(column, DEFAULTS[self.name].get(column.name) if value is None else value)
+                for column_name, target in references.items():
+                    if row[column_name] is not None and target in plans:
+                        mapped = plans[target].new_id(row[column_name])
+                        if mapped is None:
+                            raise BulkImportError(f"unknown {target} id {row[column_name]}")
+                        row[column_name] = mapped
+                if self.name == "users":
+                    row["password"] = record.get("password")
+                    if row["hashed_password"] is None and row["password"] is None:
+                        raise BulkImportError("needs hashed_password or password")
+                    if row["hashed_password"] is not None and pwd_context.identify(row["hashed_password"], required=False) is None:
+                        raise BulkImportError("hashed_password is not a bcrypt hash")
+                elif self.name == "events":
+                    # Version reads assume no version predates its event (event_versions() prunes on created_at)
+                    candidates = [moment for moment in (row["created_at"], first_versions.get(int(record["id"]))) if moment is not None]
+                    row["created_at"] = min(candidates) if candidates else now
+                    # Newer than the reminder scheduler's last poll, so it queues them
+                    row["updated_at"] = now
+                elif self.name == "versions":
+                    row["updated_at"] = row["updated_at"] or now
+                if self.name in ("permissions", "versions") and shard_router.enabled:
+                    # Not a column: routes the row to its event owner's shard in load_chunk
+                    row["owner_id"] = self.event_owner(plans, int(record["event_id"]), row["event_id"])
+                missing = [
+                    column.name for column in columns
+                    if not column.nullable and row.get(column.name) is None and column.name != "hashed_password"
+                ]
+                if missing:
+                    raise BulkImportError(f"missing {', '.join(missing)}")
+            except (BulkImportError, ValueError, TypeError) as exc:
+                raise BulkImportError(f"{self.path}:{line_no}: {exc}")
+            rows.append(row)
+            if len(rows) == chunk_size:
+                yield ordinal // chunk_size, rows
+                rows = []
+        if rows:
+            yield (self.rows - 1) // chunk_size, rows
+
+
+# Writing
+
+def reserve_ids(name: str, count: int) -> int:
+    """Reserve `count` consecutive ids for a table and return the first."""
+    table = MODELS[name].__table__
+    if shard_router.enabled and MODELS[name] in SHARDED_MODELS:
+        # Sharded tables take their ids from the cross-shard allocator instead of the sequence
+        return shard_router.ids.reserve(table.name, max(count, 1))[0]
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Blocks inserts (which call nextval) until the block is reserved
+            conn.execute(text(f'LOCK TABLE "{table.name}" IN SHARE ROW EXCLUSIVE MODE'))
+            sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table.name}).scalar()
+            first = conn.execute(text("SELECT nextval(:seq)"), {"seq": sequence}).scalar()
+            conn.execute(text("SELECT setval(:seq, :last)"), {"seq": sequence, "last": first + max(count, 1) - 1})
+            return first
+        # No sequence to advance: other writers can still take these ids, which
+        # load_chunk detects instead of deleting their rows
+        return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def load_chunk(name: str, rows: List[dict]) -> int:
+    """
+    Insert one chunk in a single transaction per database. Where reserve_ids
+    really reserved the chunk's id range (PostgreSQL, sharded tables) it is
+    deleted first, so a chunk that committed but was not recorded can be
+    loaded again. Rows of sharded tables go to the shard of their event's
+    owner. On SQLite nothing is reserved: a range holding rows is only
+    accepted as this chunk already loaded, and rows of any other writer abort
+    the import.
+    """
+    table = MODELS[name].__table__
+    if name == "users":
+        for row in rows:
+            password = row.pop("password")
+            if row["hashed_password"] is None:
+                row["hashed_password"] = pwd_context.hash(password)
+    first_id, last_id = rows[0]["id"], rows[-1]["id"]
+
+    if shard_router.enabled and MODELS[name] in SHARDED_MODELS:
+        placed = {shard.name: [] for shard in shard_router.shards}
+        for row in rows:
+            owner_id = row["owner_id"] if name == "events" else row.pop("owner_id")
+            placed[shard_router.placement(owner_id)[0].name].append(row)
+        # Every shard clears the range, so rows placed elsewhere by an earlier attempt go away
+        for shard in shard_router.shards:
+            shard_rows = placed[shard.name]
+            if shard_rows:
+                with shard.session() as db:
+                    shard_router.ensure_users(db, {row[column] for row in shard_rows for column in USER_COLUMNS[name]})
+            replace_range(shard.engine, table, first_id, last_id, shard_rows)
+    elif engine.dialect.name == "postgresql":
+        replace_range(engine, table, first_id, last_id, rows)
+    else:
+        with engine.begin() as conn:
+            existing = {row["id"]: row for row in conn.execute(select(table).where(table.c.id.between(first_id, last_id))).mappings()}
+            if not existing:
+                conn.execute(insert(table), rows)
+            elif len(existing) == len(rows) and all(_same_row(existing.get(row["id"]), row) for row in rows):
+                logger.info("%s: ids %d-%d were already loaded", name, first_id, last_id)
+            else:
+                raise BulkImportError(
+                    f"{table.name} ids {first_id}-{last_id} were taken by another writer during the import; "
+                    f"delete the state file and import again"
+                )
+    return len(rows)
+
+
+def replace_range(bind, table, first_id: int, last_id: int, rows: List[dict]) -> None:
+    """Delete ids `first_id`..`last_id` of `table` and insert `rows` in one transaction, with COPY on PostgreSQL."""
+    if bind.dialect.name != "postgresql":
+        with bind.begin() as conn:
+            conn.execute(delete(table).where(table.c.id.between(first_id, last_id)))
+            if rows:
+                conn.execute(insert(table), rows)
+        return
+
+    columns = [column.name for column in table.c]
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(row.get(column)) for column in columns) + "\n")
+    quoted = ", ".join(f'"{column}"' for column in columns)
+    raw = bind.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(f'DELETE FROM "{table.name}" WHERE id BETWEEN %s AND %s', (first_id, last_id))
+        if rows:
+            sql = f'COPY "{table.name}" ({quoted}) FROM STDIN'
+            if hasattr(cursor, "copy_expert"):  # psycopg2
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+        cursor.close()
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def _same_row(stored, row: dict) -> bool:
+    # Password hashes are salted anew on every attempt
+    return stored is not None and all(stored[key] == value for key, value in row.items() if key != "hashed_password")
+
+
+def lower_created_at(first_version_id: int, last_version_id: int) -> None:
+    """Set created_at of the events of versions `first_version_id`..`last_version_id` to their oldest version, where it is later."""
+    versions = MODELS["versions"].__table__
+    first = (
+        select(versions.c.event_id, func.min(versions.c.updated_at).label("first_version"))
+        .where(versions.c.id.between(first_version_id, last_version_id))
+        .group_by(versions.c.event_id)
+        .subquery()
+    )
+    events = MODELS["events"].__table__
+    # Versions live on their event's shard
+    for shard in shard_router.shards:
+        with shard.engine.begin() as conn:
+            conn.execute(
+                update(events)
+                .where(events.c.id == first.c.event_id, or_(events.c.created_at.is_(None), events.c.created_at > first.c.first_version))
+                .values(created_at=first.c.first_version)
+            )
+
+
+def _init_worker() -> None:
+    # Connections inherited from the parent process must not be shared
+    engine.dispose(close=False)
+    for shard in shard_router.shards:
+        if shard.engine is not engine:
+            shard.engine.dispose(close=False)
+
+
+def secondary_indexes(names: List[str]) -> Dict[str, str]:
+    """CREATE statements of the non-unique indexes of the given tables, by index name."""
+    indexes = {}
+    with engine.connect() as conn:
+        for name in names:
+            table = MODELS[name].__table__.name
+            if conn.dialect.name == "postgresql":
+                rows = conn.execute(text(
+                    "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table"
+                ), {"table": table})
+            elif conn.dialect.name == "sqlite":
+                rows = conn.execute(text(
+                    "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = :table AND sql IS NOT NULL"
+                ), {"table": table})
+            else:
+                continue
+            for index_name, definition in rows:
+                if " UNIQUE " not in f" {definition.upper()} ":
+                    # ON ONLY would leave a partitioned table's index without partitions
+                    definition = definition.replace(" ON ONLY ", " ON ")
+                    indexes[index_name] = definition.replace("CREATE INDEX ", "CREATE INDEX IF NOT EXISTS ", 1)
+    return indexes
+
+
+def drop_indexes(indexes: Dict[str, str]) -> None:
+    with engine.begin() as conn:
+        for index_name in indexes:
+            conn.execute(text(f'DROP INDEX IF EXISTS "{index_name}"'))
+
+
+def create_indexes(indexes: Dict[str, str]) -> None:
+    for index_name, definition in indexes.items():
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(text(definition))
+        logger.info("Built index %s in %.1fs", index_name, time.perf_counter() - started)
+
+
+# State
+
+def load_state(path: str) -> dict:
+    if os.path.exists(path):
+        with open(path) as handle:
+            return json.load(handle)
+    return {"tables": {}, "deferred_indexes": {}}
+
+
+def save_state(path: str, state: dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as out:
+        json.dump(state, out, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_import(files: Dict[str, str], state_path: str, workers: int = 1, chunk_size: int = CHUNK_SIZE, defer_indexes: bool = False) -> dict:
+    """Import the given files (table name -> path). Returns rows loaded per table in this run."""
+    state = load_state(state_path)
+    plans = {}
+    for name in MODELS:
+        if name not in files:
+            continue
+        plan = plans[name] = TablePlan(name, files[name])
+        recorded = state["tables"].get(name)
+        if recorded and (recorded["sha256"] != plan.sha256 or recorded["chunk_size"] != chunk_size):
+            raise BulkImportError(
+                f"{plan.path} or --chunk-size changed since the interrupted import; "
+                f"delete {state_path} to start over"
+            )
+        if not recorded:
+            recorded = state["tables"][name] = {
+                "path": plan.path, "sha256": plan.sha256, "rows": plan.rows, "chunk_size": chunk_size,
+                "id_base": reserve_ids(name, plan.rows), "done": [],
+            }
+            save_state(state_path, state)
+        plan.id_base = recorded["id_base"]
+
+    if "versions" in plans:
+        for shard in shard_router.shards:
+            ensure_partitions_for(shard.engine, MODELS["versions"].__table__.name, plans["versions"].months)
+
+    if defer_indexes:
+        # Saved before dropping, so an interrupted run still rebuilds them on resume
+        state["deferred_indexes"].update(secondary_indexes(list(plans)))
+        save_state(state_path, state)
+        drop_indexes(state["deferred_indexes"])
+
+    if engine.dialect.name == "sqlite":
+        workers = 1  # a single writer at a time
+
+    loaded = {}
+    now = datetime.utcnow()
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    try:
+        for name, plan in plans.items():
+            recorded = state["tables"][name]
+            done = set(recorded["done"])
+            started = time.perf_counter()
+            loaded[name] = 0
+            pending = {}
+
+            def finish(future):
+                index = pending.pop(future)
+                loaded[name] += future.result()
+                recorded["done"].append(index)
+                save_state(state_path, state)
+
+            for index, rows in plan.chunks(plans, chunk_size, now):
+                if index in done:
+                    continue
+                if executor is None:
+                    loaded[name] += load_chunk(name, rows)
+                    recorded["done"].append(index)
+                    save_state(state_path, state)
+                    continue
+                pending[executor.submit(load_chunk, name, rows)] = index
+                if len(pending) >= 2 * workers:
+                    for future in wait(pending, return_when=FIRST_COMPLETED).done:
+                        finish(future)
+            for future in wait(pending).done:
+                finish(future)
+
+            elapsed = time.perf_counter() - started
+            logger.info("%s: %d rows in %.1fs (%.0f rows/s)", name, loaded[name], elapsed, loaded[name] / max(elapsed, 1e-9))
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        # Rebuilt even when the load failed, so the tables stay usable
+        if state["deferred_indexes"]:
+            create_indexes(state["deferred_indexes"])
+            state["deferred_indexes"] = {}
+            save_state(state_path, state)
+
+    # Sharded tables were loaded on the shards, the others on the primary
+    for name in plans:
+        binds = [shard.engine for shard in shard_router.shards] if MODELS[name] in SHARDED_MODELS else [engine]
+        for bind in binds:
+            if bind.dialect.name == "postgresql":
+                with bind.begin() as conn:
+                    conn.execute(text(f'ANALYZE "{MODELS[name].__table__.name}"'))
+
+    versions = plans.get("versions")
+    if versions is not None and "events" not in plans and versions.rows:
+        # Versions added to existing events: move created_at back to the oldest
+        # one, or event_versions() would never read them
+        lower_created_at(versions.id_base, versions.id_base + versions.rows - 1)
+
+    # Calendar rollups: imported events only reach imported users, unless they
+    # reference existing users
+    users = plans.get("users")
+    if {"events", "permissions"} & set(plans):
+        for shard in shard_router.shards:
+            with shard.session() as db:
+                if users is not None:
+                    rebuild_rollups(db, (users.id_base, users.id_base + max(users.rows, 1) - 1))
+                else:
+                    rebuild_rollups(db)
+    return loaded
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Bulk import users, events, permissions and versions from CSV/NDJSON.")
+    for name in MODELS:
+        parser.add_argument(f"--{name}", metavar="FILE")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--defer-indexes", action="store_true", help="drop non-unique indexes while loading and rebuild them after")
+    parser.add_argument("--state", default="import-state.json", help="progress file used to resume an interrupted import")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    files = {name: getattr(args, name) for name in MODELS if getattr(args, name)}
+    if not files:
+        parser.error("nothing to import")
+    try:
+        loaded = run_import(files, args.state, args.workers, args.chunk_size, args.defer_indexes)
+    except BulkImportError as exc:
+        raise SystemExit(f"import failed: {exc}")
+    logger.info("Import finished: %s", loaded)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import argparse
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from itertools import chain
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import or_, true, update
+
+from app.db.shards import shard_router
+from app.models.archived_event import ArchivedEvent
+from app.models.archived_event_grant import ArchivedEventGrant
+from app.models.event import Event
+from app.models.event_day_rollup import EventDayRollup
+from app.models.group_permission import EventGroupPermission
+from app.models.permission import EventPermission
+from app.models.user import User  # noqa: F401  (resolves relationship("User") when run standalone)
+from app.services.archive import reaches_cold
+from app.services.groups import member_groups, shared_event_ids
+from app.services.recurrence import is_recurring, occurrences
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_FIELDS = ("start_time", "end_time", "is_recurring", "recurrence_pattern")
+
+
+def snapshot(event) -> SimpleNamespace:
+    """Copy of the fields the rollups depend on, taken before an event is modified."""
+    return SimpleNamespace(**{field: getattr(event, field) for field in ROLLUP_FIELDS})
+
+
+def day_minutes(start: datetime, end: datetime) -> Dict[date, int]:
+    """Minutes of [start, end) falling on each calendar day; instant events count on their start day."""
+    if end <= start:
+        return {start.date(): 0}
+    spans = {}
+    cursor = start
+    while cursor < end:
+        midnight = datetime.combine(cursor.date() + timedelta(days=1), time(), tzinfo=cursor.tzinfo)
+        chunk_end = min(end, midnight)
+        spans[cursor.date()] = round((chunk_end - cursor).total_seconds() / 60)
+        cursor = chunk_end
+    return spans
+
+
+def _deltas(totals, event, user_ids: Iterable[int], sign: int) -> None:
+    # Recurring events repeat forever and are expanded when the calendar is read
+    if is_recurring(event):
+        return
+    days = day_minutes(event.start_time, event.end_time)
+    for user_id in set(user_ids) - {None}:
+        for day, minutes in days.items():
+            totals[(user_id, day)][0] += sign
+            totals[(user_id, day)][1] += sign * minutes
+
+
+def _write(db, totals) -> None:
+    rows = [
+        {"user_id": user_id, "day": day, "event_count": count, "busy_minutes": minutes}
+        for (user_id, day), (count, minutes) in sorted(totals.items())
+        if count or minutes
+    ]
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(EventDayRollup).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[EventDayRollup.user_id, EventDayRollup.day],
+            set_={
+                "event_count": EventDayRollup.event_count + stmt.excluded.event_count,
+                "busy_minutes": EventDayRollup.busy_minutes + stmt.excluded.busy_minutes,
+            },
+        ))
+        return
+
+    for row in rows:
+        result = db.execute(
+            update(EventDayRollup)
+            .where(EventDayRollup.user_id == row["user_id"], EventDayRollup.day == row["day"])
+            .values(
+                event_count=EventDayRollup.event_count + row["event_count"],
+                busy_minutes=EventDayRollup.busy_minutes + row["busy_minutes"],
+            )
+        )
+        if not result.rowcount:
+            db.add(EventDayRollup(**row))
+
+
+def add_to_rollups(db, event, user_ids: Iterable[int]) -> None:
+    """Count `event` in the calendars of `user_ids`, within the caller's transaction."""
+    apply_rollup_changes(db, added=[(event, user_ids)])
+
+
+def remove_from_rollups(db, event, user_ids: Iterable[int]) -> None:
+    """Undo `add_to_rollups`; pass a `snapshot` when the event was modified since."""
+    apply_rollup_changes(db, removed=[(event, user_ids)])
+
+
+def apply_rollup_changes(db, removed: Iterable[Tuple] = (), added: Iterable[Tuple] = ()) -> None:
+    """
+    Remove and add many (event, user ids) pairs with a single upsert. Changes
+    that cancel out (e.g. an event moved within the same day) write nothing.
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for event, user_ids in removed:
+        _deltas(totals, event, user_ids, -1)
+    for event, user_ids in added:
+        _deltas(totals, event, user_ids, 1)
+    _write(db, totals)
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())  # weeks start on Monday
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def calendar_buckets(db, user_id: int, start: date, end: date, bucket: str = "day") -> List[dict]:
+    """
+    Event counts and busy minutes per day/week/month between `start` and `end`
+    (inclusive) for the events `user_id` owns or can see. Only non-empty
+    buckets are returned.
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for day, event_count, busy_minutes in db.query(
+        EventDayRollup.day, EventDayRollup.event_count, EventDayRollup.busy_minutes
+    ).filter(EventDayRollup.user_id == user_id, EventDayRollup.day.between(start, end)):
+        totals[bucket_start(day, bucket)][0] += event_count
+        totals[bucket_start(day, bucket)][1] += busy_minutes
+
+    range_start = datetime.combine(start, time())
+    range_end = datetime.combine(end + timedelta(days=1), time())
+
+    def count(event_start: datetime, event_end: datetime) -> None:
+        for day, minutes in day_minutes(event_start, event_end).items():
+            if start <= day <= end:
+                totals[bucket_start(day, bucket)][0] += 1
+                totals[bucket_start(day, bucket)][1] += minutes
+
+    recurring = db.query(Event).filter(
+        Event.is_recurring.is_(True),
+        Event.start_time < range_end,
+        or_(Event.owner_id == user_id, Event.id.in_(shared_event_ids(db, user_id))),
+    )
+    for event in recurring:
+        if not is_recurring(event):
+            continue
+        duration = max(event.end_time - event.start_time, timedelta(0))
+        for occurrence in occurrences(event, range_start - duration, range_end):
+            count(occurrence, occurrence + duration)
+
+    # Rollups are per user; events seen only through a group are counted here
+    group_ids = member_groups(user_id)
+    if group_ids:
+        direct = db.query(EventPermission.event_id).filter(EventPermission.user_id == user_id)
+        through_groups = db.query(Event).filter(
+            Event.id.in_(db.query(EventGroupPermission.event_id).filter(EventGroupPermission.group_id.in_(group_ids))),
+            Event.id.notin_(direct),
+            Event.owner_id != user_id,
+            Event.start_time < range_end,
+            Event.end_time >= range_start,
+        ).all()
+        if reaches_cold(range_start):
+            archived_direct = db.query(ArchivedEventGrant.event_id).filter(ArchivedEventGrant.user_id == user_id)
+            through_groups += db.query(ArchivedEvent).filter(
+                ArchivedEvent.id.in_(db.query(ArchivedEventGrant.event_id).filter(ArchivedEventGrant.group_id.in_(group_ids))),
+                ArchivedEvent.id.notin_(archived_direct),
+                ArchivedEvent.owner_id != user_id,
+                ArchivedEvent.start_time < range_end,
+                ArchivedEvent.end_time >= range_start,
+            ).all()
+        for event in through_groups:
+            if not is_recurring(event):
+                count(event.start_time, event.end_time)
+
+    return [
+        {"start": key, "event_count": count, "busy_minutes": minutes}
+        for key, (count, minutes) in sorted(totals.items())
+        if count > 0
+    ]
+
+
+def merge_buckets(bucket_lists: List[List[dict]]) -> List[dict]:
+    """Add up the calendar_buckets() results of several shards."""
+    if len(bucket_lists) == 1:
+        return bucket_lists[0]
+    totals = defaultdict(lambda: [0, 0])
+    for buckets in bucket_lists:
+        for item in buckets:
+            totals[item["start"]][0] += item["event_count"]
+            totals[item["start"]][1] += item["busy_minutes"]
+    return [
+        {"start": key, "event_count": count, "busy_minutes": minutes}
+        for key, (count, minutes) in sorted(totals.items())
+    ]
+
+
+def rebuild_rollups(db, user_ids: Optional[Tuple[int, int]] = None) -> int:
+    """
+    Recompute rollup rows from events, hot and archived, and permissions, for
+    every user or only for the user id range `user_ids` (inclusive). Returns
+    the number of rows written.
+    """
+    in_scope = (lambda column: column.between(*user_ids)) if user_ids else (lambda column: true())
+    totals = defaultdict(lambda: [0, 0])
+    audiences = defaultdict(list)
+    for event_id, user_id in db.query(EventPermission.event_id, EventPermission.user_id).filter(in_scope(EventPermission.user_id)).union_all(
+        db.query(ArchivedEventGrant.event_id, ArchivedEventGrant.user_id).filter(in_scope(ArchivedEventGrant.user_id))
+    ):
+        audiences[event_id].append(user_id)
+    # Archived events keep counting in the calendar
+    events = db.query(Event)
+    archived = db.query(ArchivedEvent)
+    if user_ids:
+        shared_event_ids = db.query(EventPermission.event_id).filter(in_scope(EventPermission.user_id))
+        events = events.filter(or_(in_scope(Event.owner_id), Event.id.in_(shared_event_ids)))
+        archived_shared = db.query(ArchivedEventGrant.event_id).filter(in_scope(ArchivedEventGrant.user_id))
+        archived = archived.filter(or_(in_scope(ArchivedEvent.owner_id), ArchivedEvent.id.in_(archived_shared)))
+    for event in chain(events.yield_per(1000), archived.yield_per(1000)):
+        if is_recurring(event):
+            continue
+        owners = {event.owner_id} if not user_ids or user_ids[0] <= (event.owner_id or 0) <= user_ids[1] else set()
+        for day, minutes in day_minutes(event.start_time, event.end_time).items():
+            for user_id in (owners | set(audiences.get(event.id, ()))) - {None}:
+                totals[(user_id, day)][0] += 1
+                totals[(user_id, day)][1] += minutes
+
+    db.query(EventDayRollup).filter(in_scope(EventDayRollup.user_id)).delete(synchronize_session=False)
+    db.bulk_insert_mappings(EventDayRollup, [
+        {"user_id": user_id, "day": day, "event_count": count, "busy_minutes": minutes}
+        for (user_id, day), (count, minutes) in totals.items()
+    ])
+    db.commit()
+    return len(totals)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain the calendar rollup table.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    # Each shard holds the rollups of the events stored on it
+    for shard in shard_router.shards:
+        with shard.session() as db:
+            logger.info("%s: rebuilt %d calendar rollup rows", shard.name, rebuild_rollups(db))
+
+
+if __name__ == "__main__":
+    main()
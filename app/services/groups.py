@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from app.db.database import SessionLocal
+from app.models.group_member import GroupMember
+from app.models.group_permission import EventGroupPermission
+from app.models.permission import EventPermission
+
+# Load environment variables
+load_dotenv()
+
+# A user's group ids are re-read from the primary at most this often per worker;
+# membership changes made through another worker apply after this long
+GROUP_CACHE_TTL = float(os.getenv("GROUP_CACHE_TTL", 10))
+# Users whose memberships are remembered per worker
+GROUP_CACHE_SIZE = 10000
+
+# Higher wins when a user holds several roles on an event (directly and through groups)
+ROLE_RANK = {"viewer": 1, "editor": 2}
+
+
+class MembershipCache:
+    """
+    User id -> sorted tuple of the ids of the groups they belong to. Groups and
+    memberships live on the primary only; every shard filters grants with
+    `group_id IN (...)` on the cached ids instead of joining them.
+    """
+
+    def __init__(self, ttl: float = GROUP_CACHE_TTL, size: int = GROUP_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._entries = OrderedDict()  # user id -> (group ids, read at)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Tuple[int, ...]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(user_id)
+                return entry[0]
+        with SessionLocal() as db:
+            group_ids = tuple(sorted(group_id for (group_id,) in db.query(GroupMember.group_id).filter(GroupMember.user_id == user_id)))
+        with self._lock:
+            self._entries[user_id] = (group_ids, now)
+            self._entries.move_to_end(user_id)
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return group_ids
+
+    def forget(self, user_ids: Iterable[int]) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+
+memberships = MembershipCache()
+
+
+def member_groups(user_id: int) -> Tuple[int, ...]:
+    """Ids of the groups `user_id` belongs to (cached per worker)."""
+    return memberships.get(user_id)
+
+
+def group_member_ids(group_ids: Iterable[int], among: Optional[Iterable[int]] = None) -> Set[int]:
+    """Ids of the members of `group_ids`, optionally only those in `among`, read from the primary."""
+    group_ids = set(group_ids)
+    among = None if among is None else set(among)
+    if not group_ids or among == set():
+        return set()
+    with SessionLocal() as db:
+        query = db.query(GroupMember.user_id).filter(GroupMember.group_id.in_(group_ids))
+        if among is not None:
+            query = query.filter(GroupMember.user_id.in_(among))
+        return {user_id for (user_id,) in query.distinct()}
+
+
+def strongest(roles: Iterable[Optional[str]]) -> Optional[str]:
+    """The highest of `roles`, ignoring None; None if there is none."""
+    return max((role for role in roles if role), key=lambda role: ROLE_RANK.get(role, 0), default=None)
+
+
+def shared_event_ids(db, user_id: int):
+    """Query of the ids of events shared with `user_id`, directly or through one of their groups."""
+    shared = db.query(EventPermission.event_id).filter(EventPermission.user_id == user_id)
+    group_ids = member_groups(user_id)
+    if group_ids:
+        shared = shared.union_all(db.query(EventGroupPermission.event_id).filter(EventGroupPermission.group_id.in_(group_ids)))
+    return shared
+
+
+def group_role(db, event_id: int, user_id: int) -> Optional[str]:
+    """Strongest role `user_id` holds on an event through their groups; no query for users in no group."""
+    group_ids = member_groups(user_id)
+    if not group_ids:
+        return None
+    return strongest(role for (role,) in db.query(EventGroupPermission.role).filter(
+        EventGroupPermission.event_id == event_id, EventGroupPermission.group_id.in_(group_ids)
+    ))
+
+
+def event_groups(db, event_ids: Iterable[int]) -> dict:
+    """Event id -> ids of the groups it is shared with, for many events in one query."""
+    groups = {event_id: set() for event_id in event_ids}
+    if groups:
+        for event_id, group_id in db.query(EventGroupPermission.event_id, EventGroupPermission.group_id).filter(EventGroupPermission.event_id.in_(groups)):
+            groups[event_id].add(group_id)
+    return groups
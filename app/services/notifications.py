@@ -1,17 +1,58 @@
+from typing import Set, Tuple
+
+from sqlalchemy import insert
+
+from app.core.metrics import NOTIFICATION_FANOUT_PENDING, NOTIFICATIONS_SENT
 from app.models.notification import Notification
-from app.models.permission import EventPermission
+from app.services.groups import group_member_ids
+
+def recipients(user_ids, group_ids=()) -> Tuple[Set[int], Set[int]]:
+    """
+    Distinct (user ids, group ids) to notify. Members of one of the groups
+    already see the group's notification, so they get no notification of
+    their own as well.
+    """
+    user_ids = set(user_ids) - {None}
+    group_ids = set(group_ids)
+    if user_ids and group_ids:
+        user_ids -= group_member_ids(group_ids, among=user_ids)
+    return user_ids, group_ids
+
 
-def notify_event_participants(db, event_id: int, message: str):
+def queue_notifications(db, user_ids, message: str, event_id=None, group_ids=()) -> int:
     """
-    Sends a notification with the given message to all users
-    who have permission for the specified event.
+    Adds one notification per distinct user, and one per group that all its
+    members see, to the caller's transaction as a single multi-row INSERT that
+    reads nothing back, so it can share a pipeline with the other writes.
+    Returns the number of notifications.
     """
-    user_ids = db.query(EventPermission.user_id).filter_by(event_id=event_id).all()
-    
-    notifications = [
-        Notification(user_id=user_id, event_id=event_id, message=message)
-        for (user_id,) in user_ids
+    return _insert_notifications(db, *recipients(user_ids, group_ids), message, event_id)
+
+
+def _insert_notifications(db, user_ids, group_ids, message: str, event_id=None) -> int:
+    rows = [
+        {"user_id": user_id, "group_id": None, "event_id": event_id, "message": message}
+        for user_id in sorted(user_ids)
+    ] + [
+        {"user_id": None, "group_id": group_id, "event_id": event_id, "message": message}
+        for group_id in sorted(group_ids)
     ]
-    
-    db.add_all(notifications)
-    db.commit()
+    if rows:
+        db.execute(insert(Notification).values(rows))
+    return len(rows)
+
+
+def notify_users(db, user_ids, message: str, event_id=None, group_ids=()):
+    """
+    Sends one notification per distinct user and group, committing it
+    together with whatever else is pending in the caller's transaction.
+    """
+    user_ids, group_ids = recipients(user_ids, group_ids)
+    count = len(user_ids) + len(group_ids)
+    NOTIFICATION_FANOUT_PENDING.inc(count)
+    try:
+        _insert_notifications(db, user_ids, group_ids, message, event_id)
+        db.commit()
+        NOTIFICATIONS_SENT.inc(count)
+    finally:
+        NOTIFICATION_FANOUT_PENDING.dec(count)
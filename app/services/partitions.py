@@ -0,0 +1,263 @@
+import argparse
+import gzip
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Iterable, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.db.database import engine
+from app.db.shards import shard_router
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Append-only tables partitioned by month, mapped to their partition key column
+PARTITIONED_TABLES = {
+    "notifications": "timestamp",
+    "event_versions": "updated_at",
+}
+
+PARTITION_PREMAKE_MONTHS = int(os.getenv("PARTITION_PREMAKE_MONTHS", 3))
+PARTITION_RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", 12))
+PARTITION_ARCHIVE_DIR = os.getenv("PARTITION_ARCHIVE_DIR", "archive")
+
+_PARTITION_NAME = re.compile(r"^(?P<table>\w+)_y(?P<year>\d{4})m(?P<month>\d{2})$")
+
+
+def month_start(moment: datetime) -> datetime:
+    """Truncate a datetime to the first instant of its month."""
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    """Shift a month start forward (or backward) by `count` months."""
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    """Name of the partition holding `month`, e.g. notifications_y2025m06."""
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned(conn, table: str) -> bool:
+    """Whether `table` is a native range-partitioned table on this connection."""
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :table"),
+        {"table": table},
+    ).scalar())
+
+
+def default_partition(conn, table: str) -> Optional[str]:
+    """Name of the DEFAULT partition of `table`, which catches rows of months without a partition."""
+    return conn.execute(
+        text(
+            "SELECT c.relname FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partdefid "
+            "WHERE p.partrelid = CAST(:table AS regclass)"
+        ),
+        {"table": table},
+    ).scalar()
+
+
+def default_months(conn, table: str) -> Set[datetime]:
+    """Months of the rows held by the DEFAULT partition of `table`."""
+    name = default_partition(conn, table)
+    if name is None:
+        return set()
+    key = PARTITIONED_TABLES[table]
+    return set(conn.execute(text(f"SELECT DISTINCT date_trunc('month', \"{key}\") FROM \"{name}\"")).scalars())
+
+
+def list_partitions(conn, table: str) -> List[Tuple[str, datetime]]:
+    """Return (partition name, month) for every monthly partition attached to `table`."""
+    rows = conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = :table"
+        ),
+        {"table": table},
+    ).scalars()
+
+    partitions = []
+    for name in rows:
+        match = _PARTITION_NAME.match(name)
+        if match and match.group("table") == table:
+            partitions.append((name, datetime(int(match.group("year")), int(match.group("month")), 1)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def ensure_partitions(bind=engine, months_ahead: int = PARTITION_PREMAKE_MONTHS) -> List[str]:
+    """
+    Pre-create monthly partitions from the current month up to `months_ahead`
+    months in the future, plus the DEFAULT partition that keeps inserts working
+    once a process outlives them. Months that reached the DEFAULT partition get
+    their own partition. Safe to run concurrently from several workers.
+    """
+    created = []
+    current = month_start(datetime.utcnow())
+
+    for table in PARTITIONED_TABLES:
+        with bind.connect() as conn:
+            if not is_partitioned(conn, table):
+                continue
+            existing = {name for name, _ in list_partitions(conn, table)}
+            has_default = default_partition(conn, table) is not None
+            months = {add_months(current, offset) for offset in range(months_ahead + 1)} | default_months(conn, table)
+
+        if not has_default and create_default_partition(bind, table):
+            created.append(f"{table}_default")
+        for month in sorted(months):
+            if partition_name(table, month) not in existing and create_partition(bind, table, month):
+                created.append(partition_name(table, month))
+
+    return created
+
+
+def create_default_partition(bind, table: str) -> bool:
+    """Create the DEFAULT partition of `table`. Returns False if that failed."""
+    name = f"{table}_default"
+    try:
+        with bind.begin() as conn:
+            conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" DEFAULT'))
+        return True
+    except DBAPIError as exc:
+        # Another worker created it first
+        logger.warning("Could not create partition %s: %s", name, exc)
+        return False
+
+
+def create_partition(bind, table: str, month: datetime) -> bool:
+    """Create the partition of `table` holding `month`. Returns False if that failed."""
+    name = partition_name(table, month)
+    key = PARTITIONED_TABLES[table]
+    lower, upper = f"{month:%Y-%m-%d}", f"{add_months(month, 1):%Y-%m-%d}"
+    try:
+        with bind.begin() as conn:
+            default = default_partition(conn, table)
+            if default is None:
+                conn.execute(text(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+                    f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+                ))
+                return True
+            # A partition cannot be added while the DEFAULT partition holds rows
+            # of its month: move them into the new table before attaching it
+            conn.execute(text(f'LOCK TABLE "{default}" IN ACCESS EXCLUSIVE MODE'))
+            conn.execute(text(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+            conn.execute(text(
+                f'WITH moved AS (DELETE FROM "{default}" WHERE "{key}" >= :lower AND "{key}" < :upper RETURNING *) '
+                f'INSERT INTO "{name}" SELECT * FROM moved'
+            ), {"lower": month, "upper": add_months(month, 1)})
+            conn.execute(text(
+                f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" '
+                f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+            ))
+        return True
+    except DBAPIError as exc:
+        # Another worker created it first
+        logger.warning("Could not create partition %s: %s", name, exc)
+        return False
+
+
+def ensure_partitions_for(bind, table: str, months: Iterable[datetime]) -> List[str]:
+    """Create the missing partitions of `table` for the given month starts, e.g. before loading old rows."""
+    with bind.connect() as conn:
+        if not is_partitioned(conn, table):
+            return []
+        existing = {name for name, _ in list_partitions(conn, table)}
+    return [
+        partition_name(table, month)
+        for month in sorted(set(months))
+        if partition_name(table, month) not in existing and create_partition(bind, table, month)
+    ]
+
+
+def _copy_to_file(bind, name: str, path: str) -> None:
+    """Stream a partition's rows into a gzip-compressed CSV file."""
+    tmp_path = f"{path}.tmp"
+    raw = bind.raw_connection()
+    try:
+        cursor = raw.cursor()
+        sql = f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER)'
+        with gzip.open(tmp_path, "wb") as out:
+            if hasattr(cursor, "copy_expert"):  # psycopg2
+                cursor.copy_expert(sql, out)
+            else:  # psycopg 3
+                with cursor.copy(sql) as copy:
+                    for chunk in copy:
+                        out.write(chunk)
+        cursor.close()
+        raw.commit()
+    finally:
+        raw.close()
+    os.replace(tmp_path, path)
+
+
+def archive_partitions(
+    bind=engine,
+    retain_months: int = PARTITION_RETENTION_MONTHS,
+    archive_dir: str = PARTITION_ARCHIVE_DIR,
+) -> List[str]:
+    """
+    Archive partitions older than `retain_months` to `archive_dir` as
+    <partition>.csv.gz, then detach and drop them. Returns the written paths.
+    """
+    archived = []
+    cutoff = add_months(month_start(datetime.utcnow()), -retain_months)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    for table in PARTITIONED_TABLES:
+        with bind.connect() as conn:
+            if not is_partitioned(conn, table):
+                continue
+            expired = [name for name, month in list_partitions(conn, table) if month < cutoff]
+
+        for name in expired:
+            path = os.path.join(archive_dir, f"{name}.csv.gz")
+            _copy_to_file(bind, name, path)
+            with bind.begin() as conn:
+                conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+                conn.execute(text(f'DROP TABLE "{name}"'))
+            logger.info("Archived partition %s to %s", name, path)
+            archived.append(path)
+
+    return archived
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of notifications and event_versions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ensure = sub.add_parser("ensure", help="pre-create upcoming partitions")
+    ensure.add_argument("--months-ahead", type=int, default=PARTITION_PREMAKE_MONTHS)
+
+    archive = sub.add_parser("archive", help="archive and drop expired partitions")
+    archive.add_argument("--retain-months", type=int, default=PARTITION_RETENTION_MONTHS)
+    archive.add_argument("--archive-dir", default=PARTITION_ARCHIVE_DIR)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    for shard in shard_router.shards:
+        if args.command == "ensure":
+            for name in ensure_partitions(shard.engine, months_ahead=args.months_ahead):
+                logger.info("%s: created partition %s", shard.name, name)
+        else:
+            # Partition names repeat across shards, so each shard archives into its own directory
+            archive_dir = args.archive_dir if len(shard_router.shards) == 1 else os.path.join(args.archive_dir, shard.name)
+            archive_partitions(shard.engine, retain_months=args.retain_months, archive_dir=archive_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import calendar
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+# Fixed-length recurrence patterns; 'monthly' is handled separately
+_STEPS = {
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+}
+
+
+def _nth_month(start: datetime, count: int) -> datetime:
+    """`start` shifted by `count` months, clamped to the end of shorter months."""
+    index = start.year * 12 + start.month - 1 + count
+    year, month = index // 12, index % 12 + 1
+    return start.replace(year=year, month=month, day=min(start.day, calendar.monthrange(year, month)[1]))
+
+
+def is_recurring(event) -> bool:
+    return bool(event.is_recurring) and (event.recurrence_pattern in _STEPS or event.recurrence_pattern == "monthly")
+
+
+def occurrences(event, after: datetime, before: Optional[datetime] = None) -> Iterator[datetime]:
+    """
+    Start times of `event` that are >= `after` (and < `before`, if given), in
+    order. Recurring events repeat forever from their first start_time.
+    """
+    start = event.start_time
+    if not is_recurring(event):
+        if start >= after and (before is None or start < before):
+            yield start
+        return
+
+    pattern = event.recurrence_pattern
+    if pattern in _STEPS:
+        step = _STEPS[pattern]
+        count = max(0, -(-(after - start) // step))  # ceil division
+        moment = start + count * step
+        while before is None or moment < before:
+            yield moment
+            moment += step
+        return
+
+    count = max(0, (after.year - start.year) * 12 + after.month - start.month - 1)
+    while True:
+        moment = _nth_month(start, count)
+        count += 1
+        if moment < after:
+            continue
+        if before is not None and moment >= before:
+            return
+        yield moment
+
+
+def next_occurrence(event, after: datetime) -> Optional[datetime]:
+    """First start time of `event` at or after `after`, or None."""
+    return next(occurrences(event, after), None)
+
+
+def is_occurrence(event, moment: datetime) -> bool:
+    """Whether `event` (as currently stored) starts at `moment`."""
+    return next_occurrence(event, moment) == moment
@@ -0,0 +1,148 @@
+import argparse
+import hashlib
+import logging
+import secrets
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+
+from app.core.security import REFRESH_TOKEN_EXPIRE_DAYS, create_refresh_token, verify_token
+from app.db.database import SessionLocal
+from app.models.refresh_token import RefreshToken
+from app.models.user import User  # noqa: F401  (resolves the users foreign key when run standalone)
+
+logger = logging.getLogger(__name__)
+
+SWEEP_BATCH_SIZE = 1000
+
+
+class RefreshTokenError(Exception):
+    """The refresh token is unknown, expired, revoked or was already used."""
+
+
+def hash_jti(jti: str) -> str:
+    return hashlib.sha256(jti.encode()).hexdigest()
+
+
+def issue(db, user_id: int, role: Optional[str] = None, session_id: Optional[str] = None, device: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Add a refresh token row for `user_id` within the caller's transaction and
+    return (token, session id). A new session is started unless `session_id`
+    is given.
+    """
+    jti = secrets.token_urlsafe(16)
+    session_id = session_id or secrets.token_hex(16)
+    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    db.add(RefreshToken(
+        jti_hash=hash_jti(jti),
+        user_id=user_id,
+        session_id=session_id,
+        device=device[:255] if device else None,
+        expires_at=expires_at,
+    ))
+    claims = {"sub": str(user_id), "jti": jti, "sid": session_id}
+    if role:
+        claims["role"] = role
+    return create_refresh_token(claims, expires_at), session_id
+
+
+def rotate(db, token: str) -> Tuple[dict, str]:
+    """
+    Exchange a refresh token for a new one in the same session and return
+    (claims of the old token, new token). Presenting a token that was already
+    rotated or revoked is treated as theft: the whole session is revoked. A
+    refresh that loses a race with a concurrent one only fails.
+    """
+    payload = verify_token(token)
+    if not payload or payload.get("type") != "refresh" or not payload.get("jti"):
+        raise RefreshTokenError("Invalid refresh token")
+
+    now = datetime.utcnow()
+    jti_hash = hash_jti(payload["jti"])
+    row = db.get(RefreshToken, jti_hash)
+    if row is None or str(row.user_id) != payload.get("sub") or row.expires_at <= now:
+        raise RefreshTokenError("Invalid or expired refresh token")
+
+    if row.revoked_at is not None:
+        db.rollback()
+        logger.warning("Refresh token reuse for user %s, revoking session %s", row.user_id, row.session_id)
+        revoke_session(db, row.user_id, row.session_id)
+        db.commit()
+        raise RefreshTokenError("Refresh token already used")
+
+    # Conditional on the row still being live, so two concurrent refreshes
+    # with the same token cannot both succeed
+    claimed = db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.jti_hash == jti_hash, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    ).rowcount
+    if not claimed:
+        # A concurrent refresh with the same token won the race: the token
+        # was live when read, so this is no replay and the session stays
+        db.rollback()
+        raise RefreshTokenError("Refresh token already used")
+
+    new_token, _ = issue(db, row.user_id, payload.get("role"), row.session_id, row.device)
+    db.commit()
+    return payload, new_token
+
+
+def revoke_session(db, user_id: int, session_id: str) -> int:
+    """Revoke every live token of one session. Returns the number of tokens revoked."""
+    return db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.session_id == session_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    ).rowcount
+
+
+def revoke_user(db, user_id: int) -> int:
+    """Revoke every live token of a user, on all devices."""
+    return db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    ).rowcount
+
+
+def active_sessions(db, user_id: int) -> List[RefreshToken]:
+    """The live token of each signed-in session of a user, most recently refreshed first."""
+    return db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id,
+        RefreshToken.revoked_at.is_(None),
+        RefreshToken.expires_at > datetime.utcnow(),
+    ).order_by(RefreshToken.created_at.desc()).all()
+
+
+def sweep_expired(db, batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    """
+    Delete expired tokens in batches of `batch_size`, committing after each so
+    no long lock is held. Revoked tokens are kept until they expire: they are
+    what detects reuse. Returns the number of rows deleted.
+    """
+    now = datetime.utcnow()
+    deleted = 0
+    while True:
+        batch = select(RefreshToken.jti_hash).where(RefreshToken.expires_at <= now).limit(batch_size)
+        count = db.execute(delete(RefreshToken).where(RefreshToken.jti_hash.in_(batch))).rowcount
+        db.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain the refresh token table.")
+    parser.add_argument("command", choices=["sweep"])
+    parser.add_argument("--batch-size", type=int, default=SWEEP_BATCH_SIZE)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    with SessionLocal() as db:
+        logger.info("Deleted %d expired refresh tokens", sweep_expired(db, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import heapq
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.metrics import NOTIFICATIONS_SENT
+from app.db.database import SessionLocal
+from app.db.shards import shard_router
+from app.models.event import Event
+from app.models.group_permission import EventGroupPermission
+from app.models.notification import Notification
+from app.models.permission import EventPermission
+from app.models.user import User  # noqa: F401  (resolves relationship("User") when run standalone)
+from app.models.scheduler_lease import SchedulerLease
+from app.models.sent_reminder import SentReminder
+from app.services.notifications import recipients
+from app.services.recurrence import is_occurrence, is_recurring, occurrences
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "true").lower() == "true"
+REMINDER_LEAD_MINUTES = [int(m) for m in os.getenv("REMINDER_LEAD_MINUTES", "60,10").split(",") if m.strip()]
+REMINDER_HORIZON_HOURS = float(os.getenv("REMINDER_HORIZON_HOURS", 24))
+REMINDER_POLL_SECONDS = float(os.getenv("REMINDER_POLL_SECONDS", 5))
+REMINDER_LEASE_SECONDS = float(os.getenv("REMINDER_LEASE_SECONDS", 30))
+
+LEASE_NAME = "reminders"
+
+# Rows whose updated_at is this close to the last poll are read again: covers
+# transactions that committed late and clock skew between workers
+POLL_OVERLAP = timedelta(seconds=60)
+
+# A reminder found this late (e.g. an event created minutes before its lead
+# time) is still sent; anything older is skipped
+LATE_GRACE = timedelta(seconds=max(60.0, 2 * REMINDER_POLL_SECONDS))
+
+
+class ReminderScheduler:
+    """
+    Sends reminder notifications `REMINDER_LEAD_MINUTES` before each event
+    (and each occurrence of a recurring event).
+
+    Only the worker holding the `reminders` lease runs it. The leader keeps a
+    min-heap of (fire time, event, occurrence, lead) entries for events starting
+    within `REMINDER_HORIZON_HOURS` plus the next occurrence of every recurring
+    event. It picks up creates, updates and rollbacks by polling
+    `events.updated_at`; entries of an event that changed since they were
+    queued are discarded when popped. Deletes need no tracking: each entry is
+    checked against the current row right before it fires.
+
+    Every reminder sent is recorded in `sent_reminders` under its (event,
+    occurrence, lead), in the transaction inserting its notifications, so a
+    new leader does not repeat reminders after a failover while reminders
+    found late are still sent.
+    """
+
+    def __init__(self, leads_minutes=None, session_factory=SessionLocal, name: str = "default"):
+        self.session_factory = session_factory
+        self.name = name
+        self.leads = sorted({timedelta(minutes=m) for m in (leads_minutes or REMINDER_LEAD_MINUTES)})
+        self.horizon = timedelta(hours=REMINDER_HORIZON_HOURS)
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._reset()
+
+    def _reset(self):
+        self._heap = []
+        self._stamps = {}  # event id -> updated_at the queued entries were computed from
+        self._fired = {}  # (event id, occurrence, lead) -> occurrence, already sent or found in sent_reminders
+        self._window_end = None
+        self._seen_until = None
+
+    # Lifecycle
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name=f"reminder-scheduler-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=REMINDER_POLL_SECONDS + 5)
+        if self.is_leader:
+            self._release_lease()
+
+    def run(self):
+        next_renewal = datetime.min
+        next_poll = datetime.min
+        while not self._stop.is_set():
+            now = datetime.utcnow()
+            try:
+                if now >= next_renewal:
+                    self._renew_lease(now)
+                    next_renewal = now + timedelta(seconds=REMINDER_LEASE_SECONDS / 3)
+                if not self.is_leader:
+                    self._stop.wait(REMINDER_LEASE_SECONDS / 3)
+                    continue
+                if now >= next_poll:
+                    self._poll(now)
+                    next_poll = now + timedelta(seconds=REMINDER_POLL_SECONDS)
+                self._fire_due(now)
+            except Exception:
+                logger.exception("Reminder scheduler iteration failed")
+                self.is_leader = False
+                self._reset()
+                self._stop.wait(REMINDER_POLL_SECONDS)
+                continue
+
+            wake_at = min(next_poll, next_renewal)
+            if self._heap:
+                wake_at = min(wake_at, self._heap[0][0])
+            self._stop.wait(max(0.0, (wake_at - datetime.utcnow()).total_seconds()))
+
+    # Leader election
+
+    def _renew_lease(self, now: datetime):
+        was_leader = self.is_leader
+        with self.session_factory() as db:
+            result = db.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == LEASE_NAME,
+                    or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at.is_(None), SchedulerLease.expires_at < now),
+                )
+                .values(holder=self.holder, expires_at=now + timedelta(seconds=REMINDER_LEASE_SECONDS))
+            )
+            if result.rowcount:
+                db.commit()
+                self.is_leader = True
+            elif db.get(SchedulerLease, LEASE_NAME) is None:
+                db.add(SchedulerLease(name=LEASE_NAME, holder=self.holder, expires_at=now + timedelta(seconds=REMINDER_LEASE_SECONDS)))
+                try:
+                    db.commit()
+                    self.is_leader = True
+                except IntegrityError:
+                    db.rollback()
+                    self.is_leader = False
+            else:
+                self.is_leader = False
+
+            if self.is_leader and not was_leader:
+                logger.info("Reminder scheduler lease acquired by %s", self.holder)
+                self._reset()
+                self._load(db, now)
+            elif was_leader and not self.is_leader:
+                logger.warning("Reminder scheduler lease lost by %s", self.holder)
+                self._reset()
+
+    def _release_lease(self):
+        with self.session_factory() as db:
+            db.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == LEASE_NAME, SchedulerLease.holder == self.holder)
+                .values(expires_at=None)
+            )
+            db.commit()
+        self.is_leader = False
+
+    # Heap maintenance
+
+    def _load(self, db, now: datetime):
+        """Build the heap from scratch; only done when this worker becomes leader."""
+        self._window_end = now + self.horizon
+        self._seen_until = now
+        for event in db.query(Event).filter(
+            or_(Event.is_recurring.is_(True), Event.start_time.between(now - LATE_GRACE, self._window_end + self.leads[-1]))
+        ).yield_per(1000):
+            self._schedule(event, now)
+
+    def _poll(self, now: datetime):
+        """Queue changed events and extend the horizon, without rescanning the table."""
+        with self.session_factory() as db:
+            changed = db.query(Event).filter(Event.updated_at >= self._seen_until - POLL_OVERLAP).all()
+            for event in changed:
+                if self._stamps.get(event.id) != event.updated_at:
+                    self._schedule(event, now)
+                self._seen_until = max(self._seen_until, event.updated_at)
+
+            if now + self.horizon - self._window_end > self.horizon / 2:
+                # Queue the reminders falling between the old and the new window end
+                previous_end, self._window_end = self._window_end, now + self.horizon
+                for event in db.query(Event).filter(
+                    Event.is_recurring.isnot(True),
+                    Event.start_time > previous_end + self.leads[0],
+                    Event.start_time <= self._window_end + self.leads[-1],
+                ).yield_per(1000):
+                    self._schedule(event, now, fire_after=previous_end)
+
+        # Reminders of older occurrences can no longer fire (they are past LATE_GRACE)
+        cutoff = now - self.horizon
+        self._fired = {key: occurrence for key, occurrence in self._fired.items() if occurrence >= cutoff}
+        with self.session_factory() as db:
+            db.execute(delete(SentReminder).where(SentReminder.occurrence < cutoff))
+            db.commit()
+
+    def _schedule(self, event, now: datetime, fire_after: Optional[datetime] = None):
+        self._stamps[event.id] = event.updated_at
+        for lead in self.leads:
+            self._push(event, lead, next(occurrences(event, now - LATE_GRACE + lead), None), fire_after)
+
+    def _push(self, event, lead: timedelta, occurrence: Optional[datetime], fire_after: Optional[datetime] = None):
+        recurring = is_recurring(event)
+        while occurrence is not None:
+            fire_at = occurrence - lead
+            if not recurring and (fire_at > self._window_end or (fire_after is not None and fire_at <= fire_after)):
+                return  # outside the window being filled; queued when the horizon moves
+            if (event.id, occurrence, lead) not in self._fired:
+                heapq.heappush(self._heap, (fire_at, event.id, occurrence, lead, event.updated_at))
+                return
+            if not recurring:
+                return
+            occurrence = next(occurrences(event, occurrence + timedelta(microseconds=1)), None)
+
+    # Firing
+
+    def _fire_due(self, now: datetime):
+        while self._heap and self._heap[0][0] <= now and not self._stop.is_set():
+            fire_at, event_id, occurrence, lead, stamp = heapq.heappop(self._heap)
+            if self._stamps.get(event_id) != stamp:
+                continue  # superseded by an entry computed from a newer version
+            if not self._fire(fire_at, event_id, occurrence, lead, stamp, now):
+                return
+
+    def _fire(self, fire_at, event_id, occurrence, lead, stamp, now) -> bool:
+        """Send one reminder. Returns False if the lease was lost meanwhile."""
+        minutes = int(lead.total_seconds() // 60)
+        with self.session_factory() as db:
+            event = db.get(Event, event_id)
+            if event is None:
+                self._stamps.pop(event_id, None)
+                return True
+            if event.updated_at != stamp and not is_occurrence(event, occurrence):
+                return True  # changed and not yet polled; the poll queues the new times
+
+            if db.get(SentReminder, (event_id, occurrence, minutes)) is None:
+                user_ids = {event.owner_id} | {user_id for (user_id,) in db.query(EventPermission.user_id).filter_by(event_id=event_id)}
+                group_ids = {group_id for (group_id,) in db.query(EventGroupPermission.group_id).filter_by(event_id=event_id)}
+                user_ids, group_ids = recipients(user_ids, group_ids)
+                message = f"Reminder: '{event.title}' starts in {minutes} minutes ({occurrence:%Y-%m-%d %H:%M} UTC)."
+                # One notification per group, seen by all its members
+                db.add_all([Notification(user_id=user_id, event_id=event_id, message=message) for user_id in user_ids]
+                           + [Notification(group_id=group_id, event_id=event_id, message=message) for group_id in group_ids]
+                           + [SentReminder(event_id=event_id, occurrence=occurrence, lead_minutes=minutes)])
+
+                # Fence the insert with the lease so a deposed leader cannot double-send
+                result = db.execute(
+                    update(SchedulerLease)
+                    .where(SchedulerLease.name == LEASE_NAME, SchedulerLease.holder == self.holder)
+                    .values(expires_at=SchedulerLease.expires_at)
+                )
+                if not result.rowcount:
+                    db.rollback()
+                    logger.warning("Reminder scheduler lease lost by %s", self.holder)
+                    self.is_leader = False
+                    self._reset()
+                    return False
+                try:
+                    db.commit()
+                    NOTIFICATIONS_SENT.inc(len(user_ids) + len(group_ids))
+                except IntegrityError:
+                    db.rollback()  # sent by a previous leader in the meantime
+
+            self._fired[(event_id, occurrence, lead)] = occurrence
+            if is_recurring(event) and event.updated_at == stamp:
+                self._push(event, lead, next(occurrences(event, occurrence + timedelta(microseconds=1)), None))
+        return True
+
+
+# One scheduler (and lease) per shard, since each shard's events are only visible there
+reminder_schedulers = [ReminderScheduler(session_factory=shard.session, name=shard.name) for shard in shard_router.shards]
+
+
+def main() -> None:
+    """Run the scheduler in the foreground, e.g. as a dedicated process instead of inside the API workers."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    for scheduler in reminder_schedulers:
+        scheduler.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for scheduler in reminder_schedulers:
+            scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
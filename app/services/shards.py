@@ -0,0 +1,275 @@
+import argparse
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func, insert
+
+from app.db.database import SessionLocal
+from app.db.shards import SHARD_DIRECTORY_TTL, HashRing, Shard, shard_router
+from app.models.archived_event import ArchivedEvent
+from app.models.archived_event_grant import ArchivedEventGrant
+from app.models.event import Event
+from app.models.event_version import EventVersion
+from app.models.group_permission import EventGroupPermission
+from app.models.notification import Notification
+from app.models.permission import EventPermission
+from app.models.shard_directory import ShardDirectory
+from app.services.calendar import apply_rollup_changes
+from app.services.partitions import PARTITIONED_TABLES, ensure_partitions_for, month_start
+from app.services.sync import record_many
+
+logger = logging.getLogger(__name__)
+
+# Event ids per IN list while copying and deleting
+MOVE_BATCH_SIZE = 500
+# How long a freeze is held before copying: every worker's directory cache
+# has expired by then, and requests that passed the check have finished
+FREEZE_WAIT_SECONDS = SHARD_DIRECTORY_TTL + 2
+
+
+class ShardMoveError(Exception):
+    """The owner cannot be moved to the requested shard."""
+
+
+def _batches(ids: List[int]) -> Iterable[List[int]]:
+    for start in range(0, len(ids), MOVE_BATCH_SIZE):
+        yield ids[start:start + MOVE_BATCH_SIZE]
+
+
+def _rows(model, objects, exclude=()) -> List[dict]:
+    columns = [column for column in model.__table__.columns if column.key not in exclude]
+    return [{column.key: getattr(obj, column.key) for column in columns} for obj in objects]
+
+
+def set_placement(owner_id: int, shard: Optional[str], frozen: bool = False) -> None:
+    """Pin `owner_id` to `shard` in the directory, or drop the pin when `shard` is None."""
+    with SessionLocal() as db:
+        row = db.get(ShardDirectory, owner_id)
+        if shard is None:
+            if row is not None:
+                db.delete(row)
+        elif row is None:
+            db.add(ShardDirectory(owner_id=owner_id, shard=shard, frozen=frozen))
+        else:
+            row.shard, row.frozen = shard, frozen
+        db.commit()
+    shard_router.forget(owner_id)
+
+
+def owners_by_shard() -> Dict[str, Set[int]]:
+    """Shard name -> owners with at least one event, hot or archived, stored there."""
+    owners = shard_router.fan_out(lambda db: {
+        owner_id for (owner_id,) in db.query(Event.owner_id).distinct().union(db.query(ArchivedEvent.owner_id).distinct()) if owner_id is not None
+    })
+    return {shard.name: found for shard, found in zip(shard_router.shards, owners)}
+
+
+def _load(db, owner_id: int):
+    events = db.query(Event).filter(Event.owner_id == owner_id).order_by(Event.id).all()
+    ids = [event.id for event in events]
+    permissions, group_grants, versions, notifications = [], [], [], []
+    for batch in _batches(ids):
+        permissions += db.query(EventPermission).filter(EventPermission.event_id.in_(batch)).all()
+        group_grants += db.query(EventGroupPermission).filter(EventGroupPermission.event_id.in_(batch)).all()
+        versions += db.query(EventVersion).filter(EventVersion.event_id.in_(batch)).all()
+        notifications += db.query(Notification).filter(Notification.event_id.in_(batch)).all()
+    audiences = {event.id: {event.owner_id} for event in events}
+    for permission in permissions:
+        audiences[permission.event_id].add(permission.user_id)
+    groups = {event.id: set() for event in events}
+    for grant in group_grants:
+        groups[grant.event_id].add(grant.group_id)
+    archived = db.query(ArchivedEvent).filter(ArchivedEvent.owner_id == owner_id).order_by(ArchivedEvent.id).all()
+    archived_grants = []
+    for batch in _batches([event.id for event in archived]):
+        archived_grants += db.query(ArchivedEventGrant).filter(ArchivedEventGrant.event_id.in_(batch)).all()
+    return events, permissions, group_grants, versions, notifications, audiences, groups, archived, archived_grants
+
+
+def _purge(db, event_ids: List[int]) -> None:
+    """Delete events, hot or archived, with everything stored alongside them, taking them out of the rollups."""
+    for batch in _batches(event_ids):
+        events = db.query(Event).filter(Event.id.in_(batch)).all() + db.query(ArchivedEvent).filter(ArchivedEvent.id.in_(batch)).all()
+        audiences = {event.id: {event.owner_id} for event in events}
+        for event_id, user_id in db.query(EventPermission.event_id, EventPermission.user_id).filter(EventPermission.event_id.in_(batch)).union_all(
+            db.query(ArchivedEventGrant.event_id, ArchivedEventGrant.user_id).filter(ArchivedEventGrant.event_id.in_(batch), ArchivedEventGrant.user_id.isnot(None))
+        ):
+            audiences[event_id].add(user_id)
+        apply_rollup_changes(db, removed=[(event, audiences[event.id]) for event in events])
+        db.query(ArchivedEventGrant).filter(ArchivedEventGrant.event_id.in_(batch)).delete(synchronize_session=False)
+        db.query(ArchivedEvent).filter(ArchivedEvent.id.in_(batch)).delete(synchronize_session=False)
+        db.query(Notification).filter(Notification.event_id.in_(batch)).delete(synchronize_session=False)
+        db.query(EventVersion).filter(EventVersion.event_id.in_(batch)).delete(synchronize_session=False)
+        db.query(EventPermission).filter(EventPermission.event_id.in_(batch)).delete(synchronize_session=False)
+        db.query(EventGroupPermission).filter(EventGroupPermission.event_id.in_(batch)).delete(synchronize_session=False)
+        db.query(Event).filter(Event.id.in_(batch)).delete(synchronize_session=False)
+
+
+def _copy(db, events, permissions, group_grants, versions, notifications, audiences, groups, archived, archived_grants) -> None:
+    """
+    Insert an owner's rows, with their ids, add them to the rollups and log
+    the hot events as changed, so clients syncing from this shard pick them up.
+    """
+    bind = db.get_bind()
+    for model, objects in ((Notification, notifications), (EventVersion, versions)):
+        column = PARTITIONED_TABLES[model.__tablename__]
+        ensure_partitions_for(bind, model.__tablename__, {month_start(getattr(obj, column)) for obj in objects})
+
+    for model, rows in (
+        (Event, _rows(Event, events)),
+        (EventPermission, _rows(EventPermission, permissions)),
+        (EventGroupPermission, _rows(EventGroupPermission, group_grants)),
+        (EventVersion, _rows(EventVersion, versions)),
+        # Notification ids are only unique per shard; the destination assigns new ones
+        (Notification, _rows(Notification, notifications, exclude={"id"})),
+        (ArchivedEvent, _rows(ArchivedEvent, archived)),
+        (ArchivedEventGrant, _rows(ArchivedEventGrant, archived_grants, exclude={"id"})),
+    ):
+        for start in range(0, len(rows), MOVE_BATCH_SIZE):
+            db.execute(insert(model), rows[start:start + MOVE_BATCH_SIZE])
+    archived_audiences = {event.id: {event.owner_id} for event in archived}
+    for grant in archived_grants:
+        if grant.user_id is not None:
+            archived_audiences[grant.event_id].add(grant.user_id)
+    apply_rollup_changes(db, added=[(event, audiences[event.id]) for event in events] + [(event, archived_audiences[event.id]) for event in archived])
+    record_many(db, audiences.items(), groups.items())
+
+
+def move_owner(owner_id: int, target: str, source: Optional[Shard] = None, wait: float = FREEZE_WAIT_SECONDS) -> int:
+    """
+    Move every event of `owner_id` (with its user and group permissions, versions and
+    notifications) to shard `target` and point the directory at it. Writes to
+    the owner's events are refused while the move runs; reads keep working.
+    Safe to run again after a failure. Returns the number of events moved.
+    """
+    if target not in shard_router.by_name:
+        raise ShardMoveError(f"Unknown shard {target!r}")
+    destination = shard_router.by_name[target]
+    shard_router.forget(owner_id)
+    source = source or shard_router.placement(owner_id)[0]
+    pin = None if shard_router.ring.lookup(owner_id) == target else target
+    if source is destination:
+        set_placement(owner_id, pin)
+        return 0
+
+    set_placement(owner_id, source.name, frozen=True)
+    time.sleep(wait)
+
+    moved = 0
+    with source.session() as src, destination.session() as dst:
+        events, permissions, group_grants, versions, notifications, audiences, groups, archived, archived_grants = _load(src, owner_id)
+        # An earlier run that failed after removing the source rows leaves
+        # nothing to copy; the destination already has everything
+        if events or archived:
+            ids = [event.id for event in events] + [event.id for event in archived]
+            shard_router.ensure_users(dst, {event.owner_id for event in events + archived}
+                                      | {permission.user_id for permission in permissions}
+                                      | {grant.user_id for grant in archived_grants}
+                                      | {version.updated_by for version in versions}
+                                      | {notification.user_id for notification in notifications})
+            _purge(dst, ids)  # rows left by an earlier run that failed before the source was cleared
+            _copy(dst, events, permissions, group_grants, versions, notifications, audiences, groups, archived, archived_grants)
+            dst.commit()
+            _purge(src, ids)
+            src.commit()
+            moved = len(ids)
+
+    set_placement(owner_id, pin)
+    logger.info("Moved %d events of owner %s from %s to %s", moved, owner_id, source.name, target)
+    return moved
+
+
+def pin_current(names: List[str]) -> int:
+    """
+    Before adding or removing shards: pin every owner the new ring (of shard
+    `names`) would place elsewhere to the shard holding its events today, so
+    nothing moves when the configuration changes. `rebalance` then moves them.
+    """
+    ring = HashRing(names)
+    with SessionLocal() as db:
+        pinned = {owner_id for (owner_id,) in db.query(ShardDirectory.owner_id)}
+    count = 0
+    for shard_name, owners in owners_by_shard().items():
+        for owner_id in sorted(owners - pinned):
+            if ring.lookup(owner_id) != shard_name:
+                set_placement(owner_id, shard_name)
+                count += 1
+    return count
+
+
+def rebalance(keep_pinned: bool = False, dry_run: bool = False, wait: float = FREEZE_WAIT_SECONDS) -> List[tuple]:
+    """
+    Move owners whose events are not on their ring shard there, dropping their
+    directory pins. With `keep_pinned`, pinned owners stay where the directory
+    says and only misplaced events are moved. Returns (owner, from, to) moves.
+    """
+    with SessionLocal() as db:
+        pins = {row.owner_id: row.shard for row in db.query(ShardDirectory) if row.shard in shard_router.by_name}
+    moves = []
+    for shard_name, owners in owners_by_shard().items():
+        for owner_id in sorted(owners):
+            target = pins[owner_id] if keep_pinned and owner_id in pins else shard_router.ring.lookup(owner_id)
+            if target != shard_name:
+                moves.append((owner_id, shard_name, target))
+    if dry_run:
+        return moves
+
+    for owner_id, shard_name, target in moves:
+        move_owner(owner_id, target, source=shard_router.by_name[shard_name], wait=wait)
+    if not keep_pinned:
+        # Every remaining pinned owner's events are on its ring shard already
+        moved = {owner_id for owner_id, _, _ in moves}
+        for owner_id in set(pins) - moved:
+            set_placement(owner_id, None)
+    return moves
+
+
+def status() -> List[dict]:
+    counts = shard_router.fan_out(lambda db: (db.query(func.count(Event.id)).scalar(), db.query(func.count(func.distinct(Event.owner_id))).scalar()))
+    with SessionLocal() as db:
+        pins = defaultdict(int)
+        frozen = defaultdict(int)
+        for row in db.query(ShardDirectory):
+            pins[row.shard] += 1
+            frozen[row.shard] += bool(row.frozen)
+    return [
+        {"shard": shard.name, "events": events, "owners": owners, "pinned": pins[shard.name], "frozen": frozen[shard.name]}
+        for shard, (events, owners) in zip(shard_router.shards, counts)
+    ]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Inspect and rebalance the event shards.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="events, owners and directory pins per shard")
+    move = sub.add_parser("move", help="move one owner's events to a shard")
+    move.add_argument("--owner", type=int, required=True)
+    move.add_argument("--to", required=True)
+    pin = sub.add_parser("pin", help="before changing SHARD_URLS: pin owners the new ring would move")
+    pin.add_argument("--names", required=True, help="comma-separated shard names of the new configuration")
+    balance = sub.add_parser("rebalance", help="move owners to their ring shard")
+    balance.add_argument("--keep-pinned", action="store_true", help="respect directory pins, only fix misplaced events")
+    balance.add_argument("--dry-run", action="store_true")
+    for command in (move, balance):
+        command.add_argument("--wait", type=float, default=FREEZE_WAIT_SECONDS, help="seconds to hold the freeze before copying")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.command == "status":
+        for row in status():
+            logger.info("%(shard)s: %(events)d events, %(owners)d owners, %(pinned)d pinned, %(frozen)d frozen", row)
+    elif args.command == "move":
+        move_owner(args.owner, args.to, wait=args.wait)
+    elif args.command == "pin":
+        logger.info("Pinned %d owners", pin_current([name.strip() for name in args.names.split(",") if name.strip()]))
+    else:
+        moves = rebalance(keep_pinned=args.keep_pinned, dry_run=args.dry_run, wait=args.wait)
+        for owner_id, source, target in moves:
+            logger.info("%s owner %s: %s -> %s", "Would move" if args.dry_run else "Moved", owner_id, source, target)
+        logger.info("%d owners %s", len(moves), "to move" if args.dry_run else "moved")
+
+
+if __name__ == "__main__":
+    main()
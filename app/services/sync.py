@@ -0,0 +1,151 @@
+import argparse
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Set, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, insert, or_
+
+from app.db.shards import shard_router
+from app.models.event_change import EventChange
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Changes younger than this are sent again on the next sync: a transaction that
+# took an earlier id may still be committing. Keep it above REPLICA_MAX_LAG_SECONDS
+SYNC_SAFETY_SECONDS = int(os.getenv("SYNC_SAFETY_SECONDS", 30))
+# Change log rows are kept this long; clients whose token is older resync in full
+SYNC_RETENTION_DAYS = int(os.getenv("SYNC_RETENTION_DAYS", 14))
+# Most changes read per shard and sync request; clients call again while `more` is set
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", 1000))
+
+# Change log rows per INSERT
+RECORD_BATCH_SIZE = 5000
+
+
+def record_changes(db, event_id: int, user_ids: Iterable[int], group_ids: Iterable[int] = ()) -> None:
+    """
+    Log that `event_id` changed for each of `user_ids` and for every member
+    of `group_ids` (created, updated, deleted, shared or unshared), in the
+    caller's transaction. One multi-row INSERT that reads nothing back, so it
+    can run in a pipeline.
+    """
+    record_many(db, [(event_id, user_ids)], [(event_id, group_ids)])
+
+
+def record_many(db, changes: Iterable[Tuple[int, Iterable[int]]], group_changes: Iterable[Tuple[int, Iterable[int]]] = ()) -> None:
+    """`record_changes` for many (event id, user ids) and (event id, group ids) pairs at once."""
+    now = datetime.utcnow()
+    rows = [
+        {"user_id": user_id, "group_id": None, "event_id": event_id, "changed_at": now}
+        for event_id, user_ids in changes
+        for user_id in sorted(set(user_ids) - {None})
+    ] + [
+        {"user_id": None, "group_id": group_id, "event_id": event_id, "changed_at": now}
+        for event_id, group_ids in group_changes
+        for group_id in sorted(set(group_ids))
+    ]
+    # Bounded statements for large moves and batches (PostgreSQL allows 65535 parameters)
+    for start in range(0, len(rows), RECORD_BATCH_SIZE):
+        db.execute(insert(EventChange).values(rows[start:start + RECORD_BATCH_SIZE]))
+
+
+def settled_before(now: datetime) -> datetime:
+    return now - timedelta(seconds=SYNC_SAFETY_SECONDS)
+
+
+def addressed_to(user_id: int, group_ids: Tuple[int, ...]):
+    """Change log rows for `user_id` or one of their groups."""
+    if not group_ids:
+        return EventChange.user_id == user_id
+    return or_(EventChange.user_id == user_id, EventChange.group_id.in_(group_ids))
+
+
+def read_changes(db, user_id: int, group_ids: Tuple[int, ...], cursor: int, now: datetime) -> Tuple[Set[int], int, datetime, bool]:
+    """
+    Up to SYNC_PAGE_SIZE changes of `user_id` and their groups after `cursor` on this database.
+    Returns (changed event ids, new cursor, time of the oldest change after the
+    new cursor, whether a full page was consumed). The cursor only moves past
+    changes older than the safety margin, so younger ones are sent again.
+    """
+    rows = db.query(EventChange.id, EventChange.event_id, EventChange.changed_at).filter(
+        addressed_to(user_id, group_ids), EventChange.id > cursor
+    ).order_by(EventChange.id).limit(SYNC_PAGE_SIZE + 1).all()
+    page = rows[:SYNC_PAGE_SIZE]
+
+    cutoff = settled_before(now)
+    new_cursor = cursor
+    for row in page:
+        if row.changed_at > cutoff:
+            break
+        new_cursor = row.id
+    pending = next((row.changed_at for row in rows if row.id > new_cursor), cutoff)
+    more = len(rows) > SYNC_PAGE_SIZE and new_cursor == page[-1].id
+    return {row.event_id for row in page}, new_cursor, min(pending, cutoff), more
+
+
+def latest_change(db, user_id: int, group_ids: Tuple[int, ...], now: datetime) -> int:
+    """Cursor for a client that has just downloaded everything from this database."""
+    return db.query(func.max(EventChange.id)).filter(
+        addressed_to(user_id, group_ids), EventChange.changed_at <= settled_before(now)
+    ).scalar() or 0
+
+
+def groups_digest(group_ids: Iterable[int]) -> str:
+    """Short fingerprint of a set of group ids, to notice membership changes between syncs."""
+    return hashlib.blake2b(",".join(map(str, sorted(group_ids))).encode(), digest_size=6).hexdigest()
+
+
+def encode_token(cursors: Dict[str, int], pending_since: datetime, group_ids: Iterable[int]) -> str:
+    """
+    Opaque sync token: a cursor per shard, the time of the oldest change not
+    yet covered, and a fingerprint of the user's groups at the time.
+    """
+    payload = {"c": cursors, "t": int((pending_since - datetime(1970, 1, 1)).total_seconds()), "g": groups_digest(group_ids)}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> Tuple[Dict[str, int], datetime, str]:
+    """Inverse of `encode_token`; raises ValueError for anything it did not produce."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        cursors = {str(name): int(cursor) for name, cursor in payload["c"].items()}
+        return cursors, datetime(1970, 1, 1) + timedelta(seconds=int(payload["t"])), str(payload.get("g", ""))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, AttributeError, KeyError, TypeError, ValueError):
+        raise ValueError("Invalid sync token")
+
+
+def token_expired(pending_since: datetime, now: datetime) -> bool:
+    """Whether compaction may already have removed changes the token has not seen."""
+    return pending_since < now - timedelta(days=SYNC_RETENTION_DAYS)
+
+
+def compact(db, now: datetime = None) -> int:
+    """Delete change log rows past retention on this database. Returns the number removed."""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=SYNC_RETENTION_DAYS)
+    removed = db.execute(delete(EventChange).where(EventChange.changed_at < cutoff)).rowcount
+    db.commit()
+    return removed
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain the event change log used by delta sync.")
+    parser.add_argument("command", choices=["compact"])
+    parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    for shard in shard_router.shards:
+        with shard.session() as db:
+            logger.info("%s: removed %d change log rows older than %d days", shard.name, compact(db), SYNC_RETENTION_DAYS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Cold-start benchmark.
+
+Starts the API in a fresh process, waits until it answers, and measures the
+time from spawn to the first successful authenticated request, plus the
+latency of the first and second login / event listing / OpenAPI fetch. Uses
+a user from the `benchmarks.seed` manifest. The first login is sent as soon
+as the port accepts connections, so it also includes any time it waited for
+a worker to finish booting.
+
+    $ python -m benchmarks.coldstart --server gunicorn --workers 2 --runs 5
+    $ python -m benchmarks.coldstart --server uvicorn --no-warmup
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+READY_TIMEOUT = 60
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_command(args, port: int) -> list:
+    if args.server == "gunicorn":
+        return [sys.executable, "-m", "gunicorn", "app.main:app", "--bind", f"127.0.0.1:{port}", "--workers", str(args.workers)]
+    return [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers)]
+
+
+def timed(client: httpx.Client, method: str, url: str, **kwargs):
+    started = time.perf_counter()
+    response = client.request(method, url, **kwargs)
+    return response, (time.perf_counter() - started) * 1000
+
+
+def run_once(args, account: dict, password: str) -> dict:
+    port = free_port()
+    env = dict(os.environ, WARMUP_ENABLED="true" if args.warmup else "false", REMINDERS_ENABLED="false", RATE_LIMIT_ENABLED="false")
+    spawned = time.perf_counter()
+    process = subprocess.Popen(server_command(args, port), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            credentials = {"username": account["username"], "password": password}
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"server exited with code {process.returncode}")
+                if time.perf_counter() - spawned > READY_TIMEOUT:
+                    raise RuntimeError("server did not answer in time")
+                try:
+                    response, login_ms = timed(client, "POST", "/api/auth/login", data=credentials)
+                except httpx.TransportError:
+                    time.sleep(0.01)
+                    continue
+                if response.status_code != 200:
+                    raise RuntimeError(f"login failed: {response.status_code} {response.text}")
+                break
+
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            response, list_ms = timed(client, "GET", "/api/events", headers=headers)
+            response.raise_for_status()
+            result["time_to_first_success_ms"] = round((time.perf_counter() - spawned) * 1000, 1)
+            result["first_login_ms"] = round(login_ms, 1)
+            result["first_list_events_ms"] = round(list_ms, 1)
+            result["first_openapi_ms"] = round(timed(client, "GET", "/openapi.json")[1], 1)
+            result["second_login_ms"] = round(timed(client, "POST", "/api/auth/login", data=credentials)[1], 1)
+            result["second_list_events_ms"] = round(timed(client, "GET", "/api/events", headers=headers)[1], 1)
+            result["second_openapi_ms"] = round(timed(client, "GET", "/openapi.json")[1], 1)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return result
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Measure API time-to-first-successful-request after a cold start.")
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="gunicorn")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action=argparse.BooleanOptionalAction, default=True, help="WARMUP_ENABLED for the server")
+    parser.add_argument("--manifest", default="benchmarks/seed_manifest.json")
+    parser.add_argument("--output", default="benchmarks/coldstart.json")
+    args = parser.parse_args(argv)
+
+    with open(args.manifest) as handle:
+        manifest = json.load(handle)
+    account = manifest["users"][0]
+
+    runs = []
+    for index in range(args.runs):
+        runs.append(run_once(args, account, manifest["password"]))
+        print(f"run {index + 1}: {runs[-1]}")
+
+    summary = {name: round(statistics.median(run[name] for run in runs), 1) for name in runs[0]}
+    result = {"server": args.server, "workers": args.workers, "warmup": args.warmup, "median": summary, "runs": runs}
+    with open(args.output, "w") as out:
+        json.dump(result, out, indent=2)
+    print(f"median: {summary} -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
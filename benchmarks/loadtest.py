@@ -0,0 +1,263 @@
+"""
+Mixed-workload load harness.
+
+Replays login, list, create (with conflict check), share, update, changelog
+and notification reads against the API, using the users and events recorded
+by `benchmarks.seed`. Reports throughput and p50/p95/p99 per endpoint as a
+JSON baseline, and can compare a run against a previous baseline.
+
+    $ python -m benchmarks.loadtest --base-url http://localhost:8000 --duration 60 --concurrency 32
+    $ python -m benchmarks.loadtest --in-process --duration 30 --compare benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+
+# Relative weight of each operation in the mix
+DEFAULT_MIX = {
+    "login": 2,
+    "list_events": 30,
+    "get_event": 20,
+    "create_event": 10,
+    "share_event": 5,
+    "update_event": 8,
+    "changelog": 10,
+    "notifications": 15,
+}
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+
+    def record(self, operation: str, seconds: float, status) -> None:
+        self.latencies[operation].append(seconds)
+        self.statuses[operation][str(status)] += 1
+        if status == "error" or (isinstance(status, int) and status >= 500):
+            self.errors[operation] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        for operation, values in sorted(self.latencies.items()):
+            values.sort()
+            endpoints[operation] = {
+                "requests": len(values),
+                "throughput_rps": round(len(values) / elapsed, 2),
+                "errors": self.errors[operation],
+                "statuses": dict(self.statuses[operation]),
+                "mean_ms": round(sum(values) / len(values) * 1000, 2),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            "total_requests": total,
+            "throughput_rps": round(total / elapsed, 2),
+            "endpoints": endpoints,
+        }
+
+
+class VirtualUser:
+    """One simulated client: logs in once, then runs operations drawn from the mix."""
+
+    def __init__(self, client: httpx.AsyncClient, account: dict, password: str, peers: list, rng: random.Random, stats: Stats):
+        self.client = client
+        self.account = account
+        self.password = password
+        self.peers = peers
+        self.rng = rng
+        self.stats = stats
+        self.headers = {}
+        self.event_ids = list(account["event_ids"])
+
+    async def call(self, operation: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(operation, time.perf_counter() - started, "error")
+            return None
+        self.stats.record(operation, time.perf_counter() - started, response.status_code)
+        return response
+
+    def event_payload(self) -> dict:
+        start = datetime.utcnow() + timedelta(days=self.rng.randint(-365, 365), minutes=self.rng.randrange(0, 24 * 60, 15))
+        return {
+            "title": f"Load test {self.rng.randint(1, 10 ** 6)}",
+            "description": "Generated by benchmarks.loadtest",
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(minutes=self.rng.choice([30, 60, 90]))).isoformat(),
+            "location": "Online",
+            "is_recurring": False,
+            "recurrence_pattern": None,
+        }
+
+    async def login(self) -> None:
+        response = await self.call(
+            "login", "POST", "/api/auth/login",
+            data={"username": self.account["username"], "password": self.password},
+        )
+        if response is not None and response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def run_operation(self, operation: str) -> None:
+        if operation == "login" or not self.headers:
+            await self.login()
+        elif operation == "list_events":
+            await self.call(operation, "GET", "/api/events", params={"skip": self.rng.choice([0, 0, 10, 20]), "limit": 50})
+        elif operation == "notifications":
+            await self.call(operation, "GET", "/api/notifications")
+        elif operation == "create_event":
+            response = await self.call(operation, "POST", "/api/events", json=self.event_payload())
+            if response is not None and response.status_code == 200:
+                self.event_ids.append(response.json()["id"])
+        elif not self.event_ids:
+            await self.call("create_event", "POST", "/api/events", json=self.event_payload())
+        else:
+            event_id = self.rng.choice(self.event_ids)
+            if operation == "get_event":
+                await self.call(operation, "GET", f"/api/events/{event_id}")
+            elif operation == "changelog":
+                await self.call(operation, "GET", f"/api/events/{event_id}/changelog")
+            elif operation == "update_event":
+                await self.call(operation, "PUT", f"/api/events/{event_id}", json=self.event_payload())
+            elif operation == "share_event":
+                peer = self.rng.choice(self.peers)
+                await self.call(
+                    operation, "POST", f"/api/events/{event_id}/share",
+                    json={"users": [{"user_id": peer, "role": self.rng.choice(["viewer", "editor"])}]},
+                )
+
+
+async def run(args) -> dict:
+    with open(args.manifest) as handle:
+        manifest = json.load(handle)
+
+    mix = dict(DEFAULT_MIX)
+    for item in args.mix or []:
+        name, weight = item.split("=")
+        mix[name] = float(weight)
+    operations, weights = zip(*[(name, weight) for name, weight in mix.items() if weight > 0])
+
+    if args.in_process:
+        if not args.rate_limit:
+            # Every virtual user reaches the app from the same ASGI client
+            # address, so the limiter would answer most of the run with 429s
+            os.environ["RATE_LIMIT_ENABLED"] = "false"
+        from app.main import app
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        base_url = "http://neofi.test"
+    else:
+        transport = None
+        base_url = args.base_url
+
+    rng = random.Random(args.seed)
+    accounts = manifest["users"]
+    peers = [account["id"] for account in accounts]
+    stats = Stats()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=args.timeout) as client:
+        users = [
+            VirtualUser(client, rng.choice(accounts), manifest["password"], peers, random.Random(rng.random()), stats)
+            for _ in range(args.concurrency)
+        ]
+        await asyncio.gather(*(user.login() for user in users))
+        stats = Stats()  # warm-up logins are not part of the measurement
+        for user in users:
+            user.stats = stats
+
+        deadline = time.perf_counter() + args.duration
+        started = time.perf_counter()
+
+        async def worker(user: VirtualUser) -> None:
+            while time.perf_counter() < deadline:
+                await user.run_operation(user.rng.choices(operations, weights)[0])
+
+        await asyncio.gather(*(worker(user) for user in users))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "recorded_at": datetime.utcnow().isoformat(),
+        "target": "in-process" if args.in_process else base_url,
+        "python": platform.python_version(),
+        "duration_seconds": round(elapsed, 2),
+        "concurrency": args.concurrency,
+        "mix": mix,
+        "seed": args.seed,
+        "dataset": manifest.get("counts", {}),
+        **stats.summary(elapsed),
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Return human readable regressions of p95 latency beyond `tolerance` (0.2 = 20%)."""
+    regressions = []
+    for operation, result in current["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(operation)
+        if not previous or not previous["p95_ms"]:
+            continue
+        ratio = result["p95_ms"] / previous["p95_ms"]
+        if ratio > 1 + tolerance:
+            regressions.append(f"{operation}: p95 {previous['p95_ms']}ms -> {result['p95_ms']}ms (x{ratio:.2f})")
+    return regressions
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Replay a mixed workload against the NeoFi API.")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--base-url", default="http://localhost:8000")
+    target.add_argument("--in-process", action="store_true", help="drive app.main:app through ASGI, no server needed")
+    parser.add_argument("--rate-limit", action="store_true", help="keep rate limiting on for --in-process runs")
+    parser.add_argument("--manifest", default="benchmarks/seed_manifest.json")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of measured load")
+    parser.add_argument("--concurrency", type=int, default=16, help="simultaneous virtual users")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--mix", nargs="*", metavar="OP=WEIGHT", help=f"override weights of {sorted(DEFAULT_MIX)}")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="benchmarks/results.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="fail if p95 regressed against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 regression ratio for --compare")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    with open(args.output, "w") as out:
+        json.dump(result, out, indent=2)
+
+    print(f"{'endpoint':<16}{'reqs':>8}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'err':>6}")
+    for operation, row in result["endpoints"].items():
+        print(f"{operation:<16}{row['requests']:>8}{row['throughput_rps']:>10}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['errors']:>6}")
+    print(f"total: {result['total_requests']} requests, {result['throughput_rps']} req/s -> {args.output}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(result, json.load(handle), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Write-path round-trip benchmark.
+
+Puts a TCP proxy that delays every packet by `--latency-ms / 2` in each
+direction between the API and PostgreSQL, then times `PUT /events/{id}` on an
+event shared with `--participants` users, in-process. Each driver setting runs
+in its own process:
+
+- psycopg2: one round trip per statement and per commit
+- psycopg: psycopg 3, server-side prepared statements, pipelined writes
+- psycopg-no-pipeline: psycopg 3 with DB_PIPELINE=false
+
+Reported per request: round trips (as seen by the proxy, including
+the user lookup of authentication), SQL statements, and latency percentiles.
+DATABASE_URL must point at a migrated PostgreSQL database; the benchmark adds
+its own users and events to it.
+
+    $ python -m benchmarks.roundtrips --latency-ms 2 --requests 200
+"""
+import argparse
+import heapq
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+MODES = {
+    "psycopg2": {"DATABASE_DRIVER": "psycopg2", "DB_PIPELINE": "false"},
+    "psycopg": {"DATABASE_DRIVER": "psycopg", "DB_PIPELINE": "true"},
+    "psycopg-no-pipeline": {"DATABASE_DRIVER": "psycopg", "DB_PIPELINE": "false"},
+}
+
+
+class LatencyProxy:
+    """
+    Forwards TCP connections to `target`, delaying each packet by `delay`
+    seconds. Counts round trips: client sends that follow a server reply (or
+    open a connection), so pipelined statements sent back to back count once.
+    """
+
+    def __init__(self, target, delay: float):
+        self.target = target
+        self.delay = delay
+        self.round_trips = 0
+        self._replied = {}  # client socket -> server answered since its last send
+        self._lock = threading.Lock()
+        self._server = socket.socket()
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(("127.0.0.1", 0))
+        self._server.listen()
+        self.port = self._server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _connect(self):
+        if isinstance(self.target, str):
+            upstream = socket.socket(socket.AF_UNIX)
+        else:
+            upstream = socket.socket()
+        upstream.connect(self.target)
+        return upstream
+
+    def _accept(self):
+        while True:
+            client, _ = self._server.accept()
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            upstream = self._connect()
+            self._replied[client] = True
+            self._pipe(client, upstream, client, count=True)
+            self._pipe(upstream, client, client, count=False)
+
+    def _pipe(self, source, destination, client, count: bool):
+        queue = []  # (send at, sequence, data)
+        ready = threading.Condition()
+
+        def read():
+            sequence = 0
+            while True:
+                try:
+                    data = source.recv(65536)
+                except OSError:
+                    data = b""
+                if data:
+                    with self._lock:
+                        if count and self._replied[client]:
+                            self.round_trips += 1
+                        self._replied[client] = not count
+                with ready:
+                    heapq.heappush(queue, (time.perf_counter() + self.delay, sequence, data))
+                    ready.notify()
+                sequence += 1
+                if not data:
+                    return
+
+        def write():
+            while True:
+                with ready:
+                    while not queue:
+                        ready.wait()
+                    send_at, _, data = queue[0]
+                    wait = send_at - time.perf_counter()
+                    if wait > 0:
+                        ready.wait(wait)
+                        continue
+                    heapq.heappop(queue)
+                if not data:
+                    try:
+                        destination.shutdown(socket.SHUT_WR)
+                    except OSError:
+                        pass
+                    return
+                try:
+                    destination.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=read, daemon=True).start()
+        threading.Thread(target=write, daemon=True).start()
+
+
+def proxied_url(url: str, delay: float):
+    from sqlalchemy.engine import make_url
+
+    parsed = make_url(url)
+    socket_dir = parsed.query.get("host")
+    if socket_dir and socket_dir.startswith("/"):
+        target = os.path.join(socket_dir, f".s.PGSQL.{parsed.port or 5432}")
+    else:
+        target = (parsed.host or "localhost", parsed.port or 5432)
+    proxy = LatencyProxy(target, delay)
+    query = {key: value for key, value in parsed.query.items() if key != "host"}
+    return proxy, parsed.set(host="127.0.0.1", port=proxy.port, query=query).render_as_string(hide_password=False)
+
+
+def run_mode(args) -> dict:
+    """Runs inside the child process, with the mode's environment already set."""
+    proxy, url = proxied_url(os.environ["DATABASE_URL"], args.latency_ms / 2000)
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    for name in ("RATE_LIMIT_ENABLED", "REMINDERS_ENABLED", "WARMUP_ENABLED"):
+        os.environ[name] = "false"
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    from app.db.database import engine
+    from app.main import app
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *a: statements.append(1))
+
+    client = TestClient(app)
+    tag = uuid.uuid4().hex[:8]
+
+    def account(index: int):
+        name = f"rt-{tag}-{index}"
+        client.post("/api/auth/register", json={"username": name, "email": f"{name}@example.com", "password": "pw"})
+        body = client.post("/api/auth/login", data={"username": name, "password": "pw"}).json()
+        return {"Authorization": f"Bearer {body['access_token']}"}, body["user"]["id"]
+
+    owner, _ = account(0)
+    participants = [account(index + 1)[1] for index in range(args.participants)]
+    event_body = {"title": "round trips", "start_time": "2031-01-01T10:00:00", "end_time": "2031-01-01T11:00:00",
+                  "description": None, "location": None, "is_recurring": False, "recurrence_pattern": None}
+    event_id = client.post("/api/events", json=event_body, headers=owner).json()["id"]
+    client.post(f"/api/events/{event_id}/share", json={"users": [{"user_id": user_id, "role": "viewer"} for user_id in participants]}, headers=owner)
+
+    latencies, trips, counts = [], [], []
+    for index in range(args.warmup + args.requests):
+        body = dict(event_body, title=f"round trips {index}", end_time=f"2031-01-01T1{1 + index % 2}:00:00")
+        trips_before, executed = proxy.round_trips, len(statements)
+        started = time.perf_counter()
+        response = client.put(f"/api/events/{event_id}", json=body, headers=owner)
+        elapsed = (time.perf_counter() - started) * 1000
+        response.raise_for_status()
+        if index >= args.warmup:
+            latencies.append(elapsed)
+            trips.append(proxy.round_trips - trips_before)
+            counts.append(len(statements) - executed)
+
+    latencies.sort()
+    return {
+        "round_trips": statistics.median(trips),
+        "statements": statistics.median(counts),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Count round trips and time PUT /events/{id} behind injected network latency.")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="added round-trip time")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--participants", type=int, default=5)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--output", default="benchmarks/roundtrips.json")
+    parser.add_argument("--child", choices=list(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_mode(args)))
+        return
+
+    results = {}
+    for mode in [name.strip() for name in args.modes.split(",") if name.strip()]:
+        command = [sys.executable, "-m", "benchmarks.roundtrips", "--child", mode, "--latency-ms", str(args.latency_ms),
+                   "--requests", str(args.requests), "--warmup", str(args.warmup), "--participants", str(args.participants)]
+        output = subprocess.run(command, env=dict(os.environ, **MODES[mode]), check=True, capture_output=True, text=True).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:>20}: {results[mode]}")
+
+    with open(args.output, "w") as out:
+        json.dump({"latency_ms": args.latency_ms, "participants": args.participants, "requests": args.requests, "results": results}, out, indent=2)
+    print(f"-> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Synthetic data generator for benchmarks and load tests.
+
+Creates N users, ~M events per user (a share of them recurring), a sharing
+graph whose recipients follow a power law (a few users receive most shares)
+and a version history per event. Writes a manifest with the credentials and
+owned event ids the load harness replays against.
+
+    $ DATABASE_URL=sqlite:///./bench.db python -m benchmarks.seed --users 1000 --events-per-user 20 --create-schema
+"""
+import argparse
+import itertools
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from passlib.context import CryptContext
+from sqlalchemy import insert, select
+
+from app.db.database import Base, engine
+from app.models import user, event, permission, event_version, notification, scheduler_lease, event_day_rollup, refresh_token, shard_directory, id_block, event_change, group, group_member, group_permission, archived_event, archived_event_grant, sent_reminder  # noqa: F401  (registers every table for --create-schema)
+from app.models.event import Event
+from app.models.event_version import EventVersion
+from app.models.permission import EventPermission
+from app.models.user import User
+
+RECURRENCE_PATTERNS = ["daily", "weekly", "monthly"]
+LOCATIONS = ["Room A", "Room B", "Main Hall", "Online", "Cafeteria", None]
+CHUNK_SIZE = 5000
+
+
+def chunked(rows, size=CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def geometric(rng: random.Random, mean: float) -> int:
+    """Number of successes before a failure, with the given mean (0 allowed)."""
+    if mean <= 0:
+        return 0
+    p = 1 / (mean + 1)
+    count = 0
+    while rng.random() > p:
+        count += 1
+    return count
+
+
+def insert_rows(conn, model, rows) -> None:
+    for chunk in chunked(rows):
+        conn.execute(insert(model), chunk)
+
+
+def seed(args) -> dict:
+    rng = random.Random(args.seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    hashed_password = CryptContext(schemes=["bcrypt"], deprecated="auto").hash(args.password)
+
+    if args.create_schema:
+        Base.metadata.create_all(engine)
+
+    timings = {}
+    with engine.begin() as conn:
+        # Users
+        started = time.perf_counter()
+        prefix = args.username_prefix
+        insert_rows(conn, User, [
+            {
+                "username": f"{prefix}{i}",
+                "email": f"{prefix}{i}@example.com",
+                "hashed_password": hashed_password,
+                "is_active": True,
+                "role": "owner",
+            }
+            for i in range(args.users)
+        ])
+        users = conn.execute(
+            select(User.id, User.username).where(User.username.like(f"{prefix}%")).order_by(User.id)
+        ).all()[-args.users:]
+        user_ids = [user_id for user_id, _ in users]
+        timings["users"] = time.perf_counter() - started
+
+        # Events, spread over a window around now
+        started = time.perf_counter()
+        event_rows = []
+        for owner_id in user_ids:
+            for _ in range(max(0, int(rng.gauss(args.events_per_user, args.events_per_user / 4)))):
+                start = now + timedelta(minutes=rng.randint(-args.window_days, args.window_days) * 24 * 60
+                                        + rng.choice(range(8 * 60, 18 * 60, 30)))
+                recurring = rng.random() < args.recurring_ratio
+                event_rows.append({
+                    "title": f"Event {rng.randint(1, 10 ** 6)}",
+                    "description": "Lorem ipsum " * rng.randint(0, args.description_words),
+                    "start_time": start,
+                    "end_time": start + timedelta(minutes=rng.choice([15, 30, 45, 60, 90, 120, 240])),
+                    "location": rng.choice(LOCATIONS),
+                    "is_recurring": recurring,
+                    "recurrence_pattern": rng.choice(RECURRENCE_PATTERNS) if recurring else None,
+                    "owner_id": owner_id,
+                    "created_at": now - timedelta(days=rng.randint(1, args.window_days)),
+                })
+        insert_rows(conn, Event, event_rows)
+        events = conn.execute(
+            select(Event.id, Event.owner_id, Event.created_at)
+            .where(Event.owner_id.between(user_ids[0], user_ids[-1]))
+            .order_by(Event.id)
+        ).all()
+        timings["events"] = time.perf_counter() - started
+
+        # Sharing graph: recipient popularity follows a power law over a shuffled ranking
+        started = time.perf_counter()
+        ranking = list(user_ids)
+        rng.shuffle(ranking)
+        cum_weights = list(itertools.accumulate(1 / (rank + 1) ** args.share_alpha for rank in range(len(ranking))))
+        permission_rows = []
+        for event_id, owner_id, _ in events:
+            shares = min(geometric(rng, args.shares_per_event), len(ranking) - 1)
+            recipients = set()
+            while len(recipients) < shares:
+                recipient = rng.choices(ranking, cum_weights=cum_weights)[0]
+                if recipient != owner_id:
+                    recipients.add(recipient)
+            permission_rows.extend(
+                {"event_id": event_id, "user_id": user_id, "role": rng.choice(["viewer", "editor"])}
+                for user_id in recipients
+            )
+        insert_rows(conn, EventPermission, permission_rows)
+        timings["permissions"] = time.perf_counter() - started
+
+        # Version history, written after each event's creation
+        started = time.perf_counter()
+        version_rows = []
+        for event_id, owner_id, created_at in events:
+            for _ in range(geometric(rng, args.versions_per_event)):
+                start = now + timedelta(days=rng.randint(-args.window_days, args.window_days))
+                version_rows.append({
+                    "event_id": event_id,
+                    "title": f"Event {rng.randint(1, 10 ** 6)}",
+                    "description": "Lorem ipsum " * rng.randint(0, args.description_words),
+                    "start_time": start,
+                    "end_time": start + timedelta(hours=1),
+                    "location": rng.choice(LOCATIONS),
+                    "is_recurring": False,
+                    "recurrence_pattern": None,
+                    "updated_at": created_at + timedelta(minutes=rng.randint(1, 60 * 24 * 30)),
+                    "updated_by": owner_id,
+                })
+        insert_rows(conn, EventVersion, version_rows)
+        timings["versions"] = time.perf_counter() - started
+
+    owned = {}
+    for event_id, owner_id, _ in events:
+        owned.setdefault(owner_id, []).append(event_id)
+
+    return {
+        "generated_at": now.isoformat(),
+        "seed": args.seed,
+        "password": args.password,
+        "counts": {
+            "users": len(user_ids),
+            "events": len(events),
+            "permissions": len(permission_rows),
+            "versions": len(version_rows),
+        },
+        "timings_seconds": {name: round(value, 3) for name, value in timings.items()},
+        "users": [
+            {"id": user_id, "username": username, "event_ids": owned.get(user_id, [])[:args.manifest_events]}
+            for user_id, username in users
+        ],
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Seed the database with synthetic NeoFi data.")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--events-per-user", type=float, default=20)
+    parser.add_argument("--recurring-ratio", type=float, default=0.1)
+    parser.add_argument("--shares-per-event", type=float, default=2, help="mean recipients per event")
+    parser.add_argument("--share-alpha", type=float, default=1.1, help="power-law exponent of recipient popularity")
+    parser.add_argument("--versions-per-event", type=float, default=1.5, help="mean versions per event")
+    parser.add_argument("--description-words", type=int, default=50)
+    parser.add_argument("--window-days", type=int, default=365)
+    parser.add_argument("--username-prefix", default="bench_user_")
+    parser.add_argument("--password", default="benchmark-password")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--manifest", default="benchmarks/seed_manifest.json")
+    parser.add_argument("--manifest-events", type=int, default=50, help="owned event ids kept per user")
+    parser.add_argument("--create-schema", action="store_true", help="create tables first (SQLite/dev only)")
+    args = parser.parse_args(argv)
+
+    manifest = seed(args)
+    with open(args.manifest, "w") as out:
+        json.dump(manifest, out, indent=2)
+    print(json.dumps({"counts": manifest["counts"], "timings_seconds": manifest["timings_seconds"]}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Production server settings.
+
+    $ gunicorn app.main:app
+
+The app is imported once in the master (`preload_app`) and forked into
+uvicorn workers, which use uvloop and httptools when they are installed.
+Each worker warms up (OpenAPI schema, connection pool, bcrypt threads) in
+its lifespan startup before it accepts connections.
+"""
+import glob
+import logging
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+accesslog = os.getenv("ACCESS_LOG") or None
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+logger = logging.getLogger("gunicorn.error")
+
+
+def on_starting(server):
+    # Metric files of the previous run would otherwise be aggregated forever
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(multiproc_dir, "*.db")):
+            os.remove(path)
+
+    if server.cfg.workers > 1:
+        from app.core.cache import RESPONSE_CACHE_BACKEND
+        from app.core.idempotency import IDEMPOTENCY_BACKEND
+        from app.core.ratelimit import RATE_LIMIT_BACKEND
+
+        backends = {
+            "RESPONSE_CACHE_BACKEND": RESPONSE_CACHE_BACKEND,
+            "IDEMPOTENCY_BACKEND": IDEMPOTENCY_BACKEND,
+            "RATE_LIMIT_BACKEND": RATE_LIMIT_BACKEND,
+        }
+        for setting, backend in backends.items():
+            if backend == "memory":
+                logger.warning("%s=memory keeps its state per worker; use a shared backend with %d workers", setting, server.cfg.workers)
+        if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            logger.warning("PROMETHEUS_MULTIPROC_DIR is not set; /metrics only reports the worker that answers")
+
+
+def post_fork(server, worker):
+    # Never share pooled connections opened in the master with the workers
+    from app.db.database import engine
+    from app.db.replicas import replica_set
+    from app.db.shards import shard_router
+
+    engine.dispose(close=False)
+    for shard in shard_router.shards:
+        if shard.engine is not engine:
+            shard.engine.dispose(close=False)
+    for replica in replica_set.replicas:
+        replica.engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from app.core.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)